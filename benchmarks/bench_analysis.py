@@ -0,0 +1,52 @@
+# Benchmark of the network measures of crawler_analysis.py on a big made-up graph.
+# The graph is shaped like a crawl: a minority of nodes (the sites visited) have links out, and the targets of the links follow a
+# power law - a few pages are linked from almost everywhere. Reports the seconds taken by each measure.
+# Run from the repository root:   python benchmarks/bench_analysis.py --num-nodes 1000000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import scipy.sparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import crawler_analysis
+
+# 1. The made-up graph.
+def make_graph(num_nodes, num_edges, visited_fraction, seed):
+    rng = np.random.default_rng(seed)
+    num_visited = max(1, int(num_nodes * visited_fraction))
+    sources = rng.integers(0, num_visited, num_edges)
+    # Zipf-distributed targets, shuffled so that popular pages aren't all at the start.
+    targets = np.minimum(rng.zipf(1.8, num_edges) - 1, num_nodes - 1)
+    targets = rng.permutation(num_nodes)[targets]
+    matrix = scipy.sparse.csr_matrix((np.ones(num_edges), (sources, targets)), shape = (num_nodes, num_nodes))
+    matrix.sum_duplicates()
+    return matrix
+
+# 2. Time each measure.
+def main():
+    parser = argparse.ArgumentParser(description = 'Time the network measures of crawler_analysis.py.')
+    parser.add_argument('--num-nodes', type = int, default = 1000000)
+    parser.add_argument('--edges-per-node', type = float, default = 10)
+    parser.add_argument('--visited-fraction', type = float, default = 0.2, help = 'Fraction of nodes with links out.')
+    parser.add_argument('--seed', type = int, default = 0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    matrix = make_graph(args.num_nodes, int(args.num_nodes * args.edges_per_node), args.visited_fraction, args.seed)
+    print('%d nodes, %d edges - made in %.2f s' % (matrix.shape[0], matrix.nnz, time.perf_counter() - start))
+    measures = [('degrees', lambda: crawler_analysis.degrees(matrix)),
+                ('pagerank', lambda: crawler_analysis.pagerank(matrix)),
+                ('hits', lambda: crawler_analysis.hits(matrix)),
+                ('strong components', lambda: crawler_analysis.strongly_connected_components(matrix)),
+                ('bow-tie', lambda: crawler_analysis.bow_tie(matrix))]
+    for name, measure in measures:
+        start = time.perf_counter()
+        measure()
+        print('%-20s %8.2f s' % (name, time.perf_counter() - start))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+# Benchmark of a whole crawl, end to end, against a made-up web served on this machine (synthetic_web.py) - no network, the same pages every run.
+# The real Crawler is used, with every check it makes (robots.txt, ToS, crawl-delays, redirects, errors). Only three things are changed:
+#   - the questions about robots comments and terms are answered by a CrawlPolicy, so nothing waits for the user,
+#   - every crawl-delay (the 15 second default, and the Crawl-delay of robots files) is multiplied by --delay-scale,
+#   - nothing is printed during the crawl (unless --verbose).
+# Reports sites visited per second, the time to the headers of each request (p50/p99), the CPU time used (this process, and parse worker
+# processes), the peak memory (RSS) of this process and the time spent in each phase of the crawl (crawler_timing.py). The web is served by another process, so none of its work is counted.
+# Run from the repository root:   python benchmarks/bench_crawl.py --engine threads --fetch-workers 8 --pages 500
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from crawlerMainDraw import Crawler, AsyncCrawler, ThreadedCrawler
+from crawler_links import ParsePool
+from crawler_policy import CrawlPolicy
+from crawler_scheduler import HostScheduler
+from synthetic_web import SyntheticWeb, SyntheticWebProcess, ROBOTS_DENY_TEXT, TOS_DENY_TEXT
+
+try:
+    import resource                                                         # Not on Windows - CPU time of child processes and peak RSS are then not shown.
+except ImportError:
+    resource = None
+
+# 1. Crawl-delays, scaled down.
+class ScaledScheduler(HostScheduler):
+    """
+    HostScheduler with every crawl-delay multiplied by 'scale' - eg 0.01 turns the default 15 seconds into 0.15, and 'Crawl-delay: 2' into 0.02.
+    Inputs: default_delay (float): as for HostScheduler, before scaling.
+            scale (float)
+    """
+    def __init__(self, default_delay=15, scale=0.01):
+        super().__init__(default_delay = default_delay)
+        self.scale = scale
+
+    def delay(self, root_url):
+        return super().delay(root_url) * self.scale
+
+# 2. Measurements.
+def percentile(values, fraction):
+    # The value below which 'fraction' of the values lie (nearest rank). nan for no values.
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+def peak_rss_mb():
+    # Highest RSS of this process so far. ru_maxrss is in kilobytes on Linux, bytes on macOS.
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+def children_cpu():
+    # CPU seconds of child processes that have finished (the parse pool, once it is closed).
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+# 3. One crawl.
+def make_crawler(args, start_site):
+    if args.engine == 'async':
+        crawler = AsyncCrawler(start_site, args.pages, True, [], max_in_flight = args.max_in_flight)
+    elif args.engine == 'threads':
+        crawler = ThreadedCrawler(start_site, args.pages, True, [], fetch_workers = args.fetch_workers)
+    else:
+        crawler = Crawler(start_site, args.pages, True, [])
+    crawler.scheduler = ScaledScheduler(scale = args.delay_scale)
+    # Turn away the hosts that the synthetic web says don't want crawlers, and let every other one in.
+    crawler.policy = CrawlPolicy(robots_rules = [(ROBOTS_DENY_TEXT, 'N')], tos_rules = [(TOS_DENY_TEXT, 'N')], default = 'Y')
+    return crawler
+
+def run(args, start_site):
+    """
+    Function to crawl the synthetic web once.
+    Inputs: args (argparse.Namespace), start_site (str): the homepage of a host.
+    Output: results (dict)
+    """
+    crawler = make_crawler(args, start_site)
+    if args.parse_workers > 0:
+        crawler.parse_pool = ParsePool(args.parse_workers)
+    # Time to the headers of every request (robots.txt, homepage, ToS and targets) - requests' response hook sees each one as it arrives.
+    latencies = []
+    statuses = Counter()
+    def on_response(response, *hook_args, **hook_kwargs):
+        latencies.append(response.elapsed.total_seconds())
+        statuses[response.status_code] += 1
+    crawler.session.hooks['response'].append(on_response)
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    cpu_start = time.process_time()
+    children_start = children_cpu()
+    start = time.perf_counter()
+    with output:
+        if args.engine == 'async':
+            asyncio.run(crawler.crawl_async())
+        else:
+            crawler.crawl()
+    seconds = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    if crawler.parse_pool is not None:
+        crawler.parse_pool.close()
+    return {'visited': len(crawler.sites_visited),
+            'attempts': crawler.counter_attempts,
+            'requests': len(latencies),
+            'seconds': seconds,
+            'p50': percentile(latencies, 0.5),
+            'p99': percentile(latencies, 0.99),
+            'cpu': cpu,
+            'cpu_children': children_cpu() - children_start,
+            'rss': peak_rss_mb(),
+            'statuses': statuses,
+            'timing': crawler.timing.report()}
+
+# 4. Serve the web, crawl it, report.
+def main():
+    parser = argparse.ArgumentParser(description = 'Time a whole crawl against a made-up web served on this machine.')
+    parser.add_argument('--engine', choices = ['serial', 'async', 'threads'], default = 'serial', help = 'As for the crawler scripts.')
+    parser.add_argument('--max-in-flight', type = int, default = 8, help = 'With --engine async.')
+    parser.add_argument('--fetch-workers', type = int, default = 8, help = 'With --engine threads.')
+    parser.add_argument('--parse-workers', type = int, default = 0, help = 'Processes to parse pages in (0: in the fetching thread). Not with --engine serial.')
+    parser.add_argument('--pages', type = int, default = 300, help = 'Sites to visit. A crawl stops after 1000 visits, whatever this is.')
+    parser.add_argument('--delay-scale', type = float, default = 0.01, help = 'Every crawl-delay is multiplied by this.')
+    parser.add_argument('--hosts', type = int, default = 50)
+    parser.add_argument('--pages-per-host', type = int, default = 200)
+    parser.add_argument('--degree-exponent', type = float, default = 2.1, help = 'Exponent of the power law of the number of links on a page.')
+    parser.add_argument('--latency-ms', type = float, default = 20, help = 'Median time the web waits before each response.')
+    parser.add_argument('--error-rate', type = float, default = 0.05, help = 'Share of pages that are a 4xx/5xx.')
+    parser.add_argument('--redirect-rate', type = float, default = 0.03, help = 'Share of pages that redirect.')
+    parser.add_argument('--page-bytes', type = int, default = 4000, help = 'About how much text each page has, besides its links.')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--verbose', action = 'store_true', help = 'Show everything the crawler prints.')
+    args = parser.parse_args()
+    if args.parse_workers > 0 and args.engine == 'serial':
+        parser.error('--parse-workers needs --engine async or threads, as for the crawler scripts.')
+
+    web = SyntheticWeb(num_hosts = args.hosts, pages_per_host = args.pages_per_host, degree_exponent = args.degree_exponent,
+                       latency_ms = args.latency_ms, error_rate = args.error_rate, redirect_rate = args.redirect_rate,
+                       page_bytes = args.page_bytes, seed = args.seed)
+    served = SyntheticWebProcess(web)
+    try:
+        results = run(args, served.origins[0])
+    finally:
+        served.close()
+
+    print('engine %s, %d hosts, delays x%g, latency %g ms' % (args.engine, args.hosts, args.delay_scale, args.latency_ms))
+    print('%10s %10s %10s %10s %10s %10s %10s %10s %10s' % ('visited', 'attempts', 'requests', 'seconds', 'pages/sec', 'p50 ms', 'p99 ms', 'CPU s', 'RSS MB'))
+    print('%10d %10d %10d %10.2f %10.1f %10.1f %10.1f %10.2f %10.1f' % (results['visited'], results['attempts'], results['requests'], results['seconds'],
+                                                                     results['visited'] / results['seconds'], 1000 * results['p50'], 1000 * results['p99'],
+                                                                     results['cpu'] + results['cpu_children'], results['rss']))
+    print('CPU: %.2f s in this process, %.2f s in parse workers (%.0f%% of one core overall)'
+          % (results['cpu'], results['cpu_children'], 100 * (results['cpu'] + results['cpu_children']) / results['seconds']))
+    print('Responses by status: ' + ', '.join('%d: %d' % (status, count) for status, count in sorted(results['statuses'].items())))
+    # Where the time went, phase by phase (crawler_timing.py).
+    print(results['timing'])
+
+if __name__ == '__main__':
+    main()
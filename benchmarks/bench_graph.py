@@ -0,0 +1,69 @@
+# Benchmark of building the graph of a crawl (crawler2graph in crawlerMainDraw.py) - everything crawler2networkx does before Graphviz lays it out.
+# A crawl is made up: 'num_pages' sites visited, each with 'links_per_page' links. Most links go to a pool of popular urls (menus, shared
+# pages - some linked from thousands of pages), some to other visited sites, and a few are repeated on the same page, None or '#...'.
+# Reports the time to build the graph, and links per second - which should stay about the same as the crawl grows.
+# Run from the repository root:   python benchmarks/bench_graph.py --sizes 1000 10000 100000
+
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from crawlerMainDraw import crawler2graph
+from crawler_records import CrawlRecord
+from crawler_urls import UrlIndex
+
+# 1. A made-up crawl. Only sites_visited, sites_dict and the url index of its records are needed to build the graph.
+def make_crawl(num_pages, links_per_page, seed):
+    rng = random.Random(seed)
+    visited = ['https://www.host%d.com/page-%d' % (i % 2000, i) for i in range(num_pages)]
+    pool = ['https://www.shared%d.com/item-%d' % (i % 500, i) for i in range(num_pages * 5)]
+    sites_dict = {}
+    url_index = UrlIndex()
+    number = 0
+    for url in visited:
+        links = []
+        for j in range(links_per_page):
+            choice = rng.random()
+            if choice < 0.6:
+                # Popular pages are linked from many sites (roughly a power law).
+                links.append(pool[min(int(rng.paretovariate(1.0)) - 1, len(pool) - 1)] if choice < 0.3 else rng.choice(pool))
+            elif choice < 0.8:
+                links.append(rng.choice(visited))
+            elif choice < 0.95 and links:
+                links.append(rng.choice(links))
+            elif choice < 0.98:
+                links.append('#section-%d' % j)
+            else:
+                links.append(None)
+        # Attempts that are not visits are in sites_dict too.
+        number += 1
+        sites_dict[number] = CrawlRecord(url_index, 'mailto:someone@host%d.com' % number, nogo = True)
+        number += 1
+        sites_dict[number] = CrawlRecord(url_index, url, links = links, status = 200, redirect = False, duration = 0.1)
+    return SimpleNamespace(sites_visited = visited, sites_dict = sites_dict, url_index = url_index)
+
+# 2. Build the graph once per size.
+def main():
+    parser = argparse.ArgumentParser(description = 'Time the building of the graph of a crawl.')
+    parser.add_argument('--sizes', type = int, nargs = '+', default = [1000, 10000, 100000], help = 'Numbers of visited pages.')
+    parser.add_argument('--links-per-page', type = int, default = 10)
+    parser.add_argument('--seed', type = int, default = 0)
+    args = parser.parse_args()
+
+    # The first call also imports networkx and numpy - don't time that.
+    crawler2graph(make_crawl(10, args.links_per_page, args.seed))
+    print('%10s %12s %10s %10s %12s' % ('pages', 'links', 'nodes', 'seconds', 'links/sec'))
+    for num_pages in args.sizes:
+        crawl = make_crawl(num_pages, args.links_per_page, args.seed)
+        num_links = num_pages * args.links_per_page
+        start = time.perf_counter()
+        G = crawler2graph(crawl)
+        seconds = time.perf_counter() - start
+        print('%10d %12d %10d %10.2f %12.0f' % (num_pages, num_links, G.number_of_nodes(), seconds, num_links / seconds))
+
+if __name__ == '__main__':
+    main()
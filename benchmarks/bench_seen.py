@@ -0,0 +1,70 @@
+# Benchmark of the two ways the Frontier can remember seen urls: a Python set, and the SeenUrlStore of crawler_seen.py.
+# Reports the memory each takes (tracemalloc - Python allocations only, so the sqlite page cache is not counted; its file size is shown instead)
+# and lookups per second, for urls that were added (hits) and urls that were not (misses).
+# Run from the repository root:   python benchmarks/bench_seen.py --num-urls 1000000
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from crawler_seen import SeenUrlStore
+
+# 1. Urls that look like the ones a crawl finds: a few thousand hosts, long paths.
+def make_urls(num_urls, prefix):
+    return ['https://www.host%d.com/%s/section/page-%d?id=%d' % (i % 5000, prefix, i, i * 7) for i in range(num_urls)]
+
+# 2. Add every url, then look up 'num_lookups' urls that were added and as many that were not.
+# tracemalloc slows every allocation down, so the store is built twice: once to measure memory and once to time it.
+# The urls are made beforehand, so only memory taken by the store itself is counted. Note a set also keeps every url string alive - the store does not.
+def run(name, make_store, added, absent, num_lookups):
+    tracemalloc.start()
+    store = make_store()
+    for url in added:
+        store.add(url)
+    memory, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if hasattr(store, 'close'):
+        store.close()
+
+    store = make_store()
+    start = time.perf_counter()
+    for url in added:
+        store.add(url)
+    add_rate = len(added) / (time.perf_counter() - start)
+    hits = added[:num_lookups]
+    start = time.perf_counter()
+    found = sum(1 for url in hits if url in store)
+    hit_rate = len(hits) / (time.perf_counter() - start)
+    misses = absent[:num_lookups]
+    start = time.perf_counter()
+    false_positives = sum(1 for url in misses if url in store)
+    miss_rate = len(misses) / (time.perf_counter() - start)
+
+    print('%-6s  memory %8.1f MB (peak %8.1f MB)  adds/s %10.0f  hit lookups/s %10.0f  miss lookups/s %10.0f  found %d/%d  false positives %d'
+          % (name, memory / 1e6, peak / 1e6, add_rate, hit_rate, miss_rate, found, len(hits), false_positives))
+    return store
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Compare a set with the Bloom filter + sqlite seen-url store.')
+    parser.add_argument('--num-urls', type = int, default = 200000)
+    parser.add_argument('--num-lookups', type = int, default = 100000)
+    parser.add_argument('--error-rate', type = float, default = 0.001)
+    args = parser.parse_args()
+
+    added = make_urls(args.num_urls, 'seen')
+    absent = make_urls(args.num_lookups, 'unseen')
+    print('%d urls, %d lookups of each kind' % (args.num_urls, args.num_lookups))
+
+    run('set', set, added, absent, args.num_lookups)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'seen.sqlite')
+        store = run('bloom', lambda: SeenUrlStore(path, initial_capacity = max(1000, args.num_urls // 4), error_rate = args.error_rate, keep_existing = False),
+                    added, absent, args.num_lookups)
+        store.close()
+        print('bloom   bit arrays %.1f MB in %d filters, sqlite file %.1f MB, disk lookups %d'
+              % (store.bloom.nbytes() / 1e6, len(store.bloom.filters), os.path.getsize(path) / 1e6, store.disk_lookups))
@@ -0,0 +1,246 @@
+# A made-up web, served on this machine - so that a crawl can be benchmarked offline, and gives the same pages every run (used by bench_crawl.py).
+# Each host is an HTTP server on its own port of 127.0.0.1 ('http://127.0.0.1:<port>'), so the crawler treats them as different sites:
+# each has its own /robots.txt, homepage, ToS page and crawl-delay.
+#   pages       - '/p/<n>'. The number of links on a page follows a power law (most pages have a few, some have hundreds), as does how often each page
+#                 is linked to. Most links stay on the same host; the rest go to other hosts. A few are '#top', 'mailto:' or under '/private/'.
+#   robots.txt  - 'Disallow: /private/' and, for some hosts, a Crawl-delay. Some hosts have none (404), and some say in a comment that crawlers aren't welcome.
+#   ToS         - the homepage links to '/terms'. Some hosts' terms forbid crawlers.
+#   errors      - some pages are a 4xx or 5xx, and some redirect (301) to another page.
+#   latency     - every response waits a while first (log-normal, around latency_ms).
+# Everything is decided by the seed: page n of host h is the same in every run. Host 0 is where a crawl starts, so it always lets crawlers in,
+# and a homepage is never an error.
+# To look at it by hand:   python benchmarks/synthetic_web.py --hosts 5      (then open one of the urls it prints)
+
+import argparse
+import math
+import multiprocessing
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# What bench_crawl.py's policy looks for in the robots comments and the terms (see CrawlPolicy in crawler_policy.py).
+ROBOTS_DENY_TEXT = 'Crawlers are not welcome here'
+TOS_DENY_TEXT = 'Automated crawlers and robots are not permitted on this site.'
+ERROR_STATUSES = (404, 410, 500, 503)
+FILLER = 'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore magna aliqua '
+
+# 1. The pages.
+class SyntheticWeb():
+    """
+    The made-up web: what each host sends back for each path. Only numbers are kept, so it can be sent to another process.
+    Inputs: num_hosts (int), pages_per_host (int)
+            min_links (int): fewest links on a page. The number of links is min_links * (a Pareto variable), up to max_links.
+            degree_exponent (float): exponent of the power law of the number of links on a page, p(k) ~ k^-degree_exponent. More than 1.
+            max_links (int)
+            local_rate (float): share of links that stay on the same host.
+            private_rate (float): share of links under '/private/' (disallowed by robots.txt).
+            error_rate (float): share of pages that are a 4xx/5xx. redirect_rate (float): share that redirect.
+            robots_missing_rate (float): share of hosts without a robots.txt (404). robots_deny_rate (float): share whose robots comments turn crawlers away.
+            tos_deny_rate (float): share of hosts whose terms forbid crawlers.
+            crawl_delay_rate (float): share of hosts whose robots.txt gives a Crawl-delay (of 1 or 2 seconds - bench_crawl.py scales it down).
+            latency_ms (float): median wait before each response. latency_sigma (float): spread of the waits (sigma of the log).
+            page_bytes (int): about how much text (besides the links) each page has.
+            seed (int)
+    """
+    def __init__(self, num_hosts=50, pages_per_host=200, min_links=3, degree_exponent=2.1, max_links=500, local_rate=0.7, private_rate=0.03,
+                 error_rate=0.05, redirect_rate=0.03, robots_missing_rate=0.1, robots_deny_rate=0.05, tos_deny_rate=0.05, crawl_delay_rate=0.2,
+                 latency_ms=20, latency_sigma=0.5, page_bytes=4000, seed=0):
+        if degree_exponent <= 1:
+            raise ValueError('degree_exponent must be more than 1, not %r' % (degree_exponent,))
+        self.num_hosts = num_hosts
+        self.pages_per_host = pages_per_host
+        self.min_links = min_links
+        self.degree_exponent = degree_exponent
+        self.max_links = max_links
+        self.local_rate = local_rate
+        self.private_rate = private_rate
+        self.error_rate = error_rate
+        self.redirect_rate = redirect_rate
+        self.robots_missing_rate = robots_missing_rate
+        self.robots_deny_rate = robots_deny_rate
+        self.tos_deny_rate = tos_deny_rate
+        self.crawl_delay_rate = crawl_delay_rate
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.page_bytes = page_bytes
+        self.seed = seed
+        self.origins = []                                                   # origins[h] = 'http://127.0.0.1:<port>' of host h, once it is being served
+
+    def rng(self, *key):
+        # A random number generator for one part of the web. Seeded with a string, so it is the same in every run (and every process).
+        return random.Random('-'.join(str(part) for part in (self.seed,) + key))
+
+    # 1.1. Hosts: robots.txt and the terms.
+    def robots(self, host):
+        rng = self.rng('robots', host)
+        if rng.random() < self.robots_missing_rate and host != 0:
+            return 404, {}, 'Not found'
+        comment = ROBOTS_DENY_TEXT if rng.random() < self.robots_deny_rate and host != 0 else 'Crawlers are welcome'
+        lines = ['# Synthetic host %d' % host, '# ' + comment, '', 'User-agent: *', 'Disallow: /private/']
+        if rng.random() < self.crawl_delay_rate:
+            lines.append('Crawl-delay: %d' % rng.choice((1, 2)))
+        return 200, {}, '\n'.join(lines) + '\n'
+
+    def terms(self, host):
+        rng = self.rng('terms', host)
+        verdict = TOS_DENY_TEXT if rng.random() < self.tos_deny_rate and host != 0 else 'Robots and crawlers are welcome to read this site.'
+        return 200, {}, 'Terms of use of synthetic host %d\n\nYou may read these pages.\n\n%s\n\nThat is all.\n' % (host, verdict)
+
+    # 1.2. Pages.
+    def num_links(self, rng):
+        # Pareto: p(k) ~ k^-(alpha + 1) - so alpha is one less than the exponent of the power law.
+        return min(int(self.min_links * rng.paretovariate(self.degree_exponent - 1)), self.max_links)
+
+    def link(self, host, rng):
+        choice = rng.random()
+        # Some pages are linked to far more often than others (a power law again), the rest evenly.
+        page = min(int(rng.paretovariate(1.0)) - 1, self.pages_per_host - 1) if rng.random() < 0.5 else rng.randrange(self.pages_per_host)
+        if choice < 0.01:
+            return '#top'
+        if choice < 0.02:
+            return 'mailto:webmaster@host%d.example' % host
+        if choice < 0.02 + self.private_rate:
+            return '/private/%d' % page
+        if choice < 0.02 + self.private_rate + self.local_rate:
+            return '/p/%d' % page
+        return self.origins[rng.randrange(self.num_hosts)] + '/p/%d' % page
+
+    def page(self, host, number):
+        """
+        Function to get what host 'host' sends back for page 'number'.
+        Inputs: host (int), number (int)
+        Outputs: status (int), headers (dict), body (str)
+        """
+        if not 0 <= number < self.pages_per_host:
+            return 404, {}, 'Not found'
+        rng = self.rng('page', host, number)
+        choice = rng.random() if number != 0 else 1.0
+        if choice < self.error_rate:
+            return rng.choice(ERROR_STATUSES), {}, 'Error'
+        if choice < self.error_rate + self.redirect_rate:
+            return 301, {'Location': '/p/%d' % ((number + 1) % self.pages_per_host)}, 'Moved'
+        links = ['<a href="%s">link %d</a>' % (self.link(host, rng), i) for i in range(self.num_links(rng))]
+        # The homepage is page 0 - with the link to the terms.
+        if number == 0:
+            links.insert(0, '<a href="/terms">Terms of use</a>')
+        filler = FILLER * max(1, int(rng.uniform(0.5, 1.5) * self.page_bytes / len(FILLER)))
+        return 200, {}, ('<html><head><title>Host %d, page %d</title></head><body>\n<p>%s</p>\n%s\n</body></html>\n'
+                         % (host, number, filler, '\n'.join(links)))
+
+    def respond(self, host, path):
+        """
+        Function to get what host 'host' sends back for a path.
+        Inputs: host (int), path (str): eg '/p/12?x=1'
+        Outputs: status (int), headers (dict), body (str)
+        """
+        path = path.split('?', 1)[0].split('#', 1)[0]
+        if path == '/robots.txt':
+            return self.robots(host)
+        if path == '/terms':
+            return self.terms(host)
+        if path in ('', '/'):
+            return self.page(host, 0)
+        for prefix in ('/p/', '/private/'):
+            if path.startswith(prefix) and path[len(prefix):].isdigit():
+                return self.page(host, int(path[len(prefix):]))
+        return 404, {}, 'Not found'
+
+    def latency(self, rng):
+        # Seconds to wait before a response.
+        if self.latency_ms <= 0:
+            return 0.0
+        return rng.lognormvariate(math.log(self.latency_ms / 1000.0), self.latency_sigma)
+
+# 2. Serving it. One ThreadingHTTPServer per host, each with a thread. HTTP/1.1, so the crawler's session can keep connections open.
+class SyntheticHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        web = self.server.web
+        status, headers, body = web.respond(self.server.host, self.path)
+        time.sleep(web.latency(self.server.rng))
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8' if status == 200 and not self.path.endswith('.txt') else 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Don't print a line for every request.
+        pass
+
+class SyntheticServer(ThreadingHTTPServer):
+
+    def handle_error(self, request, client_address):
+        # A crawler closing a kept-alive connection is normal - don't print a traceback for it.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+def serve(web):
+    """
+    Function to start serving every host of a SyntheticWeb, each from its own thread.
+    Input: web (SyntheticWeb): its origins are filled in.
+    Output: servers (list of ThreadingHTTPServer): call shutdown() on each to stop.
+    """
+    servers = [SyntheticServer(('127.0.0.1', 0), SyntheticHandler) for host in range(web.num_hosts)]
+    # Every port is known before any page is served - pages link to the other hosts by their origins.
+    web.origins = ['http://127.0.0.1:%d' % server.server_address[1] for server in servers]
+    for host, server in enumerate(servers):
+        server.web = web
+        server.host = host
+        server.rng = web.rng('latency', host)
+        threading.Thread(target = server.serve_forever, daemon = True).start()
+    return servers
+
+# 3. Serving it from another process - so that the work of the servers isn't counted in the CPU time (or held up by the GIL) of the crawl.
+def serve_until_told(web, pipe):
+    servers = serve(web)
+    pipe.send(web.origins)
+    try:
+        pipe.recv()
+    except EOFError:
+        pass
+    for server in servers:
+        server.shutdown()
+
+class SyntheticWebProcess():
+    """
+    A SyntheticWeb served by another process, until close().
+    Input: web (SyntheticWeb)
+    self.origins gives the origin of each host: the homepage of host 0 is self.origins[0].
+    """
+    def __init__(self, web):
+        context = multiprocessing.get_context('spawn')
+        self.pipe, child_pipe = context.Pipe()
+        self.process = context.Process(target = serve_until_told, args = (web, child_pipe), daemon = True)
+        self.process.start()
+        self.origins = self.pipe.recv()
+
+    def close(self):
+        self.pipe.send('stop')
+        self.process.join()
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Serve a made-up web on this machine.')
+    parser.add_argument('--hosts', type = int, default = 5)
+    parser.add_argument('--pages-per-host', type = int, default = 200)
+    parser.add_argument('--latency-ms', type = float, default = 20)
+    parser.add_argument('--seed', type = int, default = 0)
+    args = parser.parse_args()
+    servers = serve(SyntheticWeb(num_hosts = args.hosts, pages_per_host = args.pages_per_host, latency_ms = args.latency_ms, seed = args.seed))
+    for server in servers:
+        print(server.web.origins[server.host])
+    print('Serving - Ctrl-C to stop.')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -6,89 +6,66 @@
 
 # 1. Defining important functions
 
-def crawler2networkx(crawler):
+def crawler2graph(crawler):
+    """
+    Function to build the networkx graph of a crawl: a node for every site visited and for every link found on them, an edge for every link.
+    Every step is a single pass (Counters, sets and dicts), so the time taken grows linearly with the total number of links.
+    Input: crawler (Crawler): after crawling. Needs sites_visited and sites_dict.
+    Output: G (networkx.DiGraph): nodes are url ids (crawler_urls.py), with the Graphviz attributes used by crawler2networkx.
+    """
     # 1. Import necessary modules. Set up important numbers
-    import matplotlib.pyplot as plt                # I think this is because networkx is built upon matplotlib
     import networkx as nx
-    import math
-    import numpy as np
-    from networkx.drawing.nx_agraph import graphviz_layout, to_agraph
-    import pygraphviz as pgv
+    from collections import Counter
     from sys import exit
+    from crawler_render import domain_palette, leaf_domain
 
     # 2. Now we need to perform some operations on the crawler data.
     # We aren't able to modify Graphviz attributes once the graph is drawn. I cannot find a way to access the Graphviz attributes once added.
     # (https://stackoverflow.com/questions/44337180/graphviz-python-recoloring-a-single-node-after-it-has-been-generated)
     # So I will get all the necessary information first, then construct the nodes.
-    # Empty storage
-    graph_dict = {}
-    listOfLists = []
-    # 2.1. Assemble a dictionary that, for each site_visited, gives the unique links on that site and their multiplicity.
-    for i in range(1, len(crawler.sites_visited) + 1):
-        # empty list which will store the repeat links from this particular site_visited
-        listForRepeats = []
-        graph_dict[i] = {}
-        a = 1
-        for x in range(1, len(crawler.sites_dict.get(i).get('links')) + 1):
-            y = (crawler.sites_dict.get(i).get('links'))[x - 1]
-            # If we already have a link for this site
-            if y in listForRepeats:
-                continue
-            else:
-                # Add it to the dictionary, along with a count of how many times it appears
-                graph_dict.get(i).update({a: [y, crawler.sites_dict.get(i).get('links').count(y)]})
-                listForRepeats.append(y)
-                a += 1
-        listOfLists.append(listForRepeats)
-    # 2.2. Now we have a dictionary in this form: {1:{1:[link, num]}
-                                            #    2:[link, num]}
-    # And a list of lists of all the links.
-    # 2.3.From stackoverflow (https://stackoverflow.com/questions/2116286/python-find-identical-items-in-multiple-lists), we use a function to find repeats between lists:
-    seen = set()                                        # An unordered, unindexed collection with no repeats
-    repeated = set()
-    for l in listOfLists:
-        for ff in set(l):
-            if ff in crawler.sites_visited:             # Small amendment to this - I do not want to include any of the sites_visited here.
-                continue
-            elif ff in seen:
-                repeated.add(ff)
-            else:
-                seen.add(ff)
-    # Now 'repeated' contains a set of elements that are repeated links among all - bar the sites_visited. This is because I don't want the sites_visited to be redrawn.
-
-    # 3. From matplotlib, we say colours have six-digit hex values. Don't want to use white though, so will restrict the range from ffffff to 777777
-    maxColourIndex = int('777777', 16)
-    # 4. Get the number of sites visited in total
+    # 2.1. The record of each site_visited. sites_dict holds every ATTEMPT - no-go sites, repeats, errors... - so its numbers are not the
+    # positions in sites_visited. The sites visited are the records with links (the others have links = None). One pass through sites_dict.
+    # Nodes are url ids, in the url index of sites_dict (crawler_urls.py). Urls are only looked up for tooltips.
+    url_index = crawler.url_index
+    visited_ids = url_index.ids_of(crawler.sites_visited)
+    visited_set = set(visited_ids)
+    visited_records = {}
+    for entry in crawler.sites_dict.values():
+        if entry.link_ids is not None and entry.url_id in visited_set:
+            visited_records[entry.url_id] = entry
+    # 2.2. For each site_visited, the unique links on that site and their multiplicity: {link id: num}.
+    # A Counter keeps the links in the order they first appear on the page.
+    graph_dict = [Counter(visited_records[visId].link_ids) for visId in visited_ids]
+    # 2.3. Find the links that appear on more than one site_visited - bar the sites_visited themselves. This is because I don't want the sites_visited to be redrawn.
+    num_sites_linking = Counter()
+    for link_counts in graph_dict:
+        num_sites_linking.update(link_counts.keys())
+    repeated = set(linkId for linkId, num in num_sites_linking.items() if num > 1 and linkId not in visited_set)
+
+    # 3. Get the number of sites visited in total
     numSites = len(crawler.sites_visited)
-    # 5. Set up colours
-    # 5.1. We will use this to scale up colours, so they are far apart. Subtract 1 because we include 0.
-    multiplierToScale = math.floor(maxColourIndex/(numSites - 1))
-    # 5.2. Array of consecutive integers up to 1 below the number of sites (1 below since we include 0)
-    numSitesArray = range(0,numSites)
-    # 5.3. Numbers are now spread equally over our range - to cover all possible colours in the range.
-    coloursDecimal = np.multiply(numSitesArray, multiplierToScale)
+    # 4. Set up colours, once: one per site_visited, for its node, the nodes only it links to and its edges.
+    # Sites of the same domain share a hue, and domains are spread round the colour wheel (crawler_render.py). Never white - that is for repeated nodes.
+    # 5. Text colour for each: white on dark colours, so that we can read it.
+    hexColours, writeColours = domain_palette(leaf_domain(url) for url in crawler.sites_visited)
     # 6. (Loop Start)
     # Create empty directed graph.
     G = nx.DiGraph()
     # 6. In a loop over the sites visited, add the sites_visited nodes to the graph:
-    # 6.1. Storage of nodes:
-    nodeStorage = []
+    # 6.1. Storage of nodes (a set - checking it doesn't scan every node so far):
+    nodeStorage = set()
     for visIndex in range(1, numSites + 1):
         # get colour for this site_visited in hex.
-        hex_colour = '#{:06x}'.format(coloursDecimal[visIndex-1])
-        # If our colour is black, write in white text (so we can see it.)
-        if hex_colour == '#000000':
-            writeColor = 'white'
-        else:
-            writeColor = 'black'
-        # This should really never happen because of the checks in crawler_f1.py. Including just in case.
-        if crawler.sites_dict.get(visIndex).get('url') in nodeStorage:
+        hex_colour = hexColours[visIndex-1]
+        writeColor = writeColours[visIndex-1]
+        # This should really never happen because of the checks in Crawler.visit. Including just in case.
+        visId = visited_ids[visIndex-1]
+        if visId in nodeStorage:
             exit("A site in the visited_sites has been repeated. That shouldn't have happened!")
         else:
-            # Add these nodes to the graph and then to the list of nodes not to add again
-            G.add_node(crawler.sites_dict.get(visIndex).get('url'), style = 'filled', fillcolor = hex_colour, label = str(visIndex), tooltip = crawler.sites_dict.get(visIndex).get('url'), shape = 'box', fontcolor = writeColor)
-            nodeStorage.append(crawler.sites_dict.get(visIndex).get('url'))
-
+            # Add these nodes to the graph and then to the set of nodes not to add again
+            G.add_node(visId, style = 'filled', fillcolor = hex_colour, label = str(visIndex), tooltip = url_index.url(visId), shape = 'box', fontcolor = writeColor)
+            nodeStorage.add(visId)
 
     # 7. Now we go over the rest of the nodes.
     # KEY: FillColor - white: a node with links from more than one of the sites_visited
@@ -97,61 +74,38 @@ def crawler2networkx(crawler):
                 #- triangle: 'None' link
                 #- diamond: Link starts with a '#' (linking content on same page)
     # We add weights and use those values as edge tooltips too.
-    # node tooltips are urls.
+    # node tooltips are urls (nodes themselves are url ids - see crawler_urls.py).
     # For each node, add: ID (how you identify node) style (filled in), color, tooltip (message when you hover), label (what is displayed on the node), fontcolor and shape
     # For each edge, add: from node, to node (first two args), tooltip (when hovering), weight, color
     for r in range(1, numSites + 1):
-        hex_colour = '#{:06x}'.format(coloursDecimal[r-1])
-        # 7.1. If the colour of the node is black, set the text to be white so that we can read it.
-        if hex_colour == '#000000':
-            writeColor = 'white'
-        else:
-            writeColor = 'black'
-        # 7.2. For each visited site, go over all of the links.
+        # 7.1. The colours of this site_visited (from 4. and 5.).
+        hex_colour = hexColours[r-1]
+        writeColor = writeColours[r-1]
+        # 7.2. For each visited site, go over all of its unique links.
         a = 1
-
-        for iterator in range(1, len(graph_dict.get(r)) + 1):
-            # 7.3. List of form [link, multiplicity]
-            linkyList = graph_dict.get(r).get(iterator)
-            # 7.4. get link
-            linkHere = linkyList[0]
-            # 7.5. If we already have a node for this link, add an edge BUT NOT another node. Edge from the current site_visited we are on to this link
-            if linkHere in nodeStorage:
-                if linkHere is None:
-                    G.add_edge(crawler.sites_dict.get(r).get('url'), 'None', tooltip = linkyList[1], weight = linkyList[1], color = hex_colour)
+        fromId = visited_ids[r-1]
+        for linkHere, multiplicity in graph_dict[r-1].items():
+            # 7.3. If we don't already have a node for this link, add one. Only the url is needed for the tooltip and the shape.
+            if linkHere not in nodeStorage:
+                linkUrl = url_index.url(linkHere)
+                # 7.4. A node that will be repeated is white. Otherwise this link is unique to this site_visited, and its fillcolor matches the site_visited.
+                if linkHere in repeated:
+                    fillColour, fontColour = 'white', 'black'
                 else:
-                    G.add_edge(crawler.sites_dict.get(r).get('url'), linkHere, tooltip = linkyList[1], weight = linkyList[1], color = hex_colour)
-                nodeStorage.append(linkHere)
-            # 7.6. If we don't already have a node, but this node will be repeated - add the node but in the colour white.
-            elif linkHere in repeated:
-                if linkHere is None:
-                    # Special case as None needs to be written as a string. (triangle)
-                    G.add_node('None', style = 'filled', fillcolor = 'white', tooltip = linkHere, label = str(r) + '.' + str(a), fontcolor = 'black', shape = 'triangle')
-                    G.add_edge(crawler.sites_dict.get(r).get('url'), 'None', tooltip = linkyList[1], weight = linkyList[1], color = hex_colour)
-                elif linkHere.startswith('#'):
-                    # special case - diamond shape
-                    G.add_node(linkHere, style = 'filled', fillcolor = 'white', tooltip = linkHere, label = str(r) + '.' + str(a), fontcolor = 'black', shape = 'diamond')
-                    G.add_edge(crawler.sites_dict.get(r).get('url'), linkHere, tooltip = linkyList[1], weight = linkyList[1], color = hex_colour)
+                    fillColour, fontColour = hex_colour, writeColor
+                # 7.5. Shape. None needs to be written as a string.
+                if linkUrl is None:
+                    linkUrl, shape = 'None', 'triangle'
+                elif linkUrl.startswith('#'):
+                    shape = 'diamond'
                 else:
-                    G.add_node(linkHere, style = 'filled', fillcolor = 'white', tooltip = linkHere, label = str(r) + '.' + str(a), fontcolor = 'black', shape = 'circle')
-                    G.add_edge(crawler.sites_dict.get(r).get('url'), linkHere, tooltip = linkyList[1], weight = linkyList[1], color = hex_colour)
+                    shape = 'circle'
+                G.add_node(linkHere, style = 'filled', fillcolor = fillColour, tooltip = linkUrl, label = str(r) + '.' + str(a), fontcolor = fontColour, shape = shape)
                 a += 1
-                nodeStorage.append(linkHere)
-            # 7.7. if we don't have a node already and it is not repeated - this link is unique to this site_visited. All that is different from above is the fillcolor - which now matches the site_visited.
-            else:
-                if linkHere is None:
-                    G.add_node('None', style = 'filled', fillcolor = hex_colour, tooltip = linkHere, label = str(r) + '.' + str(a), fontcolor = writeColor, shape = 'triangle')
-                    G.add_edge(crawler.sites_dict.get(r).get('url'), 'None', tooltip = linkyList[1], weight = linkyList[1], color = hex_colour)
-                elif linkHere.startswith('#'):
-                    G.add_node(linkHere, style = 'filled', fillcolor = hex_colour, tooltip = linkHere, label = str(r) + '.' + str(a), fontcolor = writeColor, shape = 'diamond')
-                    G.add_edge(crawler.sites_dict.get(r).get('url'), linkHere, tooltip = linkyList[1], weight = linkyList[1], color = hex_colour)
-                else:
-                    G.add_node(linkHere, style = 'filled', fillcolor = hex_colour, tooltip = linkHere, label = str(r) + '.' + str(a), fontcolor = writeColor, shape = 'circle')
-                    G.add_edge(crawler.sites_dict.get(r).get('url'), linkHere, tooltip = linkyList[1], weight = linkyList[1], color = hex_colour)
-                a += 1
-                nodeStorage.append(linkHere)
-                # 7.8. setting a default.
-    strTitle = 'Title: Network representation of the web: starting from {} and visiting {} sites (known as \'sitesVisited\').'.format(crawler.sites_visited[0], len(crawler.sites_visited))
+                nodeStorage.add(linkHere)
+            # 7.6. Edge from the current site_visited we are on to this link
+            G.add_edge(fromId, linkHere, tooltip = multiplicity, weight = multiplicity, color = hex_colour)
+    strTitle = 'Title: Network representation of the web: starting from {} and visiting {} sites (known as \'sitesVisited\').'.format(crawler.sites_visited[0] if crawler.sites_visited else 'None', len(crawler.sites_visited))
     str1 = 'Node legend:\n\tWhite: Nodes that may be reached from more than one of the sitesVisited.'
     str2 = 'Circle: standard node.'
     str3 = 'Diamond: link starts with \'#\' -- to content on the same siteVisited.'
@@ -163,12 +117,48 @@ def crawler2networkx(crawler):
     G.graph['labelloc'] = "t"
     # justification/alignment of label
     G.graph['nojustify'] = "true"
-    # 8. This now makes our graphviz object
-    A = to_agraph(G)
-    #print(A)
-    A.layout('dot')
-    # the filename for the graph - in scalable vector graphics format (supports tooltips.)
-    A.draw('myGraph.svg')
+    return G
+
+def crawler2networkx(crawler, layout='auto', aggregate=False, max_draw_nodes=100000, path='myGraph.svg'):
+    """
+    Function to draw the graph of a crawl. How it is drawn depends on its size - see crawler_render.py.
+    Inputs: crawler (Crawler): after crawling.
+            layout (str): 'auto', 'dot', 'sfdp' or 'force'. 'auto' uses 'dot' for small graphs and 'sfdp' for the rest.
+            aggregate (Bool): True to merge the links that weren't visited into one node per domain.
+            max_draw_nodes (int): graphs with more nodes than this aren't drawn - their edges are written to a .tsv file instead.
+            path (str): the file to draw to - in scalable vector graphics format (supports tooltips.)
+    Output: None
+    """
+    # 1. Import necessary modules.
+    from crawler_render import aggregate_leaves, choose_layout, force_layout, write_svg, write_edge_table, raw_path
+    # 2. Build the graph (crawler2graph, above). Optionally, merge the links that weren't visited by domain.
+    G = crawler2graph(crawler)
+    if aggregate:
+        G = aggregate_leaves(G, set(crawler.url_index.ids_of(crawler.sites_visited)), crawler.url_index.url)
+    # 3. Decide how to draw it. 'dot' and 'sfdp' need Graphviz (pygraphviz) - without it, use the NumPy layout.
+    prog = choose_layout(G.number_of_nodes(), layout, max_draw_nodes)
+    if prog in ('dot', 'sfdp'):
+        try:
+            from networkx.drawing.nx_agraph import to_agraph
+            import pygraphviz as pgv
+        except ImportError:
+            print("pygraphviz is not installed, so the graph is laid out with the NumPy force layout instead of '" + prog + "'.")
+            prog = 'force'
+    # 4. Draw.
+    if prog == 'raw':
+        write_edge_table(G, raw_path(path), crawler.url_index.url)
+        print("The graph has %d nodes - too many to draw (--max-draw-nodes %d). Its edges were written to %s instead."
+              % (G.number_of_nodes(), max_draw_nodes, raw_path(path)))
+    elif prog == 'force':
+        write_svg(G, force_layout(G), path)
+    else:
+        # This now makes our graphviz object
+        A = to_agraph(G)
+        if prog == 'sfdp':
+            # Don't let nodes overlap, straight edges (routing splines is the slowest part for big graphs), edges under the nodes.
+            A.graph_attr.update(overlap = 'prism', splines = 'false', outputorder = 'edgesfirst')
+        A.layout(prog)
+        A.draw(path)
 
 # 1.1. This is a generator, we can call this multiple times to give the sublists we want.
 # From: https://stackoverflow.com/questions/54372218/how-to-split-a-list-into-sublists-based-on-a-separator-similar-to-str-split
@@ -191,17 +181,17 @@ def list_splitter(list_to_split, delimiter):
 
 # 1.2. This function gives an output based the status of the website we are trying to access.
 # https://developers.google.com/search/reference/robots_txt
-def getSiteStatus(req_obj, crawl_instance):
+def getSiteStatus(req_obj, url):
     """
     Function to make sense of the status code from accessing a website.
     Input: requests.response object: contains status code
-           crawl_instance: crawler instance, contains URL target
+           url: (str), the URL we are working on. Used in the messages.
     Output: str_status_code: string containing status code.
     """
     str_status_code = str(req_obj.status_code)
     # We expect status codes to be 3 digits in length
     if len(str_status_code) != 3:
-        print('Status code problem, url:', crawl_instance.current_target)
+        print('Status code problem, url:', url)
         return str_status_code
 
     if str_status_code[0] == '2':
@@ -210,67 +200,35 @@ def getSiteStatus(req_obj, crawl_instance):
 
     elif str_status_code[0] == '3':
         # We have been redirected.
-        print('Redirect, url:', crawl_instance.current_target)
+        print('Redirect, url:', url)
         return str_status_code
 
     elif str_status_code[0] == '4':
         # Not able to find the file, eg: error 404. Based on guidance from Google dev site, go ahead with crawl.
-        print("Client error. Assuming no robots file exists, full crawling can proceed, url:", crawl_instance.current_target )
+        print("Client error. Assuming no robots file exists, full crawling can proceed, url:", url)
         return str_status_code
 
     elif str_status_code[0] == '5':
         # Some problem on the server-side. Don't crawl. eg, error 502: Bad Gateway.
-        print('Server error. Assume a temporary error, no crawling shall proceed - url:', crawl_instance.current_target)
+        print('Server error. Assume a temporary error, no crawling shall proceed - url:', url)
         return str_status_code
 
     else:
-        print("Some other error, url:", crawl_instance.current_target)
+        print("Some other error, url:", url)
         return str_status_code
 
-# 1.3. This function takes a relative url (usually from a page as a link) and gives an absolute form. Then we will be able to do 'requests.get' on it.
-def getAbsUrl(crtVerOfLink, doubleSlashSplitList, rootUrl, real_url_end):
-#https://www.w3.org/TR/WD-html40-970917/htmlweb.html
-#https://stackoverflow.com/questions/2005079/absolute-vs-relative-urls
+# 1.3. This function gives the root of a url (scheme + host). The /robots.txt file, the homepage and the crawl-delay all belong to the root.
+def getRootUrl(url):
     """
-    Function to get the absolute URL provided with some starting URL.
-    Inputs: currentVersionOfLink: (str), our current URL string - be it relative/absolute etc.
-            doubleSlashSplitList: (list), our list of the Target site URL, split by '//'
-            rootUrl: (str), the root url of our target site.
-            real_url_end: (str), the 'true' URL of the site we are visiting. This comes from the response.url command - and ends in '/' if the target is a directory.
-    Output: newLink (str), our absolute URL.
+    Function to get the root url of a site.
+    Input: url (str): eg 'https://www.abcd.com/1/2/3'. May be None or a 'mailto' link.
+    Output: root_url (str): eg 'https://www.abcd.com'. Won't end with '/'. None if the url has no '//'.
     """
-    # Note: Links on pages may be absolute or relative. For absolute links, nothing needs to be done.
-    # For relative links there are a few forms. //new, /new or new, for example.
-    # The last is the most noteworthy. If the page we are currently on (on which the link has been found) is a directory, the link is beneath it in hierarchy.
-    # However if the page is not a directory, then the link is on the same hierarchical level.
-    # How do we know if the page we are on is a directory? We have stripped '/' which hurts us here. But even without that, directory links might appear without a slash on pages.
-    # Therefore we use response.url attribute. This seems to give us what we want. Remember - we are interested in the .url of the page ON WHICH the link was found.
-
-    # Policy here is only modify if necessary. 'None' and other problematic entries can be dealt with later.
-    # Test this separately as '.startswith' method won't work on NoneType.
-    if crtVerOfLink == None:
-        newLink = crtVerOfLink
-    elif crtVerOfLink.startswith('//'):
-        newLink = doubleSlashSplitList[0] + crtVerOfLink                        # eg, 'https:' + '//www.google.com'
-    elif crtVerOfLink.startswith('/'):                                          # /new
-        newLink = root_url + crtVerOfLink                                       # https://www.mainsite.com/new
-    elif crtVerOfLink.startswith('http'):                                       # includes both http and https
-        newLink = crtVerOfLink
-    elif crtVerOfLink.startswith('mailto') or crtVerOfLink.startswith('ftp') or crtVerOfLink.startswith('#'):
-        newLink = crtVerOfLink                                                  # Don't change this entry. We will deal with it later.
-    else:
-        # A link such as: new. There are 2 possibilites: either the page is an end, or a directory.
-        # In the former we have something like: https://www.main.com/here/there.html. The link resolves to: https://www.main.com/here/new
-        # In the latter, we may be on a page: https://www.main.com/here/where. The link should resolve to: https://www.main.com/here/where/new
-        # Here, note that doubleSlashSplitList comes from the page we are currently on - whose url will NOT end with a slash. So we don't get a '' in the list.
-        FsingleSlashList_split = doubleSlashSplitList[1].split('/')              #['www.base.com','a','b','c']
-        if real_url_end.endswith('/'):
-            newLink = doubleSlashSplitList[0] + '//' + doubleSlashSplitList[1] + '/' + crtVerOfLink
-        else:
-            # Get all elements up to one level from current page. Then add slash and current link.
-            newLink = doubleSlashSplitList[0] + '//' + '/'.join(FsingleSlashList_split[:-1]) + '/' + crtVerOfLink
-
-    return newLink
+    if url is None or '//' not in url:
+        return None
+    site_pieces = url.split('//',1)                                             # ['https:','www.abcd.com/1/2/3']
+    second_list = site_pieces[1].split('/',1)                                   # ['www.abcd.com','1/2/3']
+    return site_pieces[0] + '//' + second_list[0]
 
 # 2. Class definition
 
@@ -278,66 +236,126 @@ class Crawler():
 
     # 2.1. Initialisation. Need 4 arguments.
     def __init__(self, starting_site, num_to_visit, secured, no_goes):
-        self.sites_to_visit = [starting_site]                                   # list of sites yet to visit. Starts with seed
+        self.sites_dict = {}                                                    # Dictionary that gives sites, with information. Will include all sites the program TRIES to visit.
+        self.memory_index = UrlIndex()                                          # Numbers the urls of the records while sites_dict is a dictionary. A RecordLog has its own. See url_index
+        self.sites_to_visit = Frontier([starting_site], seen = UrlIdSet(lambda: self.url_index))   # Queue of sites yet to visit. Starts with seed. Each url is only ever added once - its id is kept (see crawler_frontier.py)
         self.current_target = None                                              # Current target site
-        self.sites_visited = []                                                 # List of sites that have been visited
+        self.sites_visited = []                                                 # List of sites that have been visited, in the order they were visited
+        self.sites_visited_set = UrlIdSet(lambda: self.url_index)               # The ids of the same sites, hashed - so checking for a repeat doesn't scan the list
         self.num_to_visit = num_to_visit                                        # Total number of sites that should be visited
         self.secured = secured                                                  # True if sites that are NOT secured should be visited
         self.no_goes = no_goes                                                  # List of sites that should NOT be visited
         self.cusHeaders = {'User-Agent':'CustomCrawler(+https://www.mycustomcrawlerexplanations.com)'}          #identifying string passed to server when HTTP request (in header) is made.
-        self.sites_dict = {}                                                    # Dictionary that gives sites, with information. Will include all sites the program TRIES to visit.
         self.counter_attempts = 0                                               # Counter to give the current progress of the search.  Gives the number of all sites ATTEMPTED.
         self.counter_total = 0                                                  # Counter to give progress of search. Tracks only sites that have been visited.
-        self.crawl_delay = 15                                                   # Number of seconds to wait between requests.
+        self.status_counts = Counter()                                          # Number of responses with each HTTP status code - robots.txt, homepage and ToS requests included
+        self.bytes_downloaded = 0                                               # Bytes of the bodies of every response, as they came over the network
+        self.scheduler = HostScheduler(default_delay = 15)                      # Seconds to wait between requests to the same site, if its robots file doesn't say. See crawler_scheduler.py
+        self.robots_cache = RobotsCache()                                       # Parsed /robots.txt files, one per origin (scheme + host). See crawler_robots.py
+        self.tos_cache = ToSCache()                                             # ToS verdicts, one per origin. Can be kept in a file between runs. See crawler_tos.py
+        self.urls = UrlCanonicalizer()                                          # Resolves and normalises links (RFC 3986), so each page has one url. See crawler_urls.py
+        self.timing = PhaseTimer()                                              # Histograms of the time spent waiting, requesting, parsing, ... - per host and in all. See crawler_timing.py
+        self.parse_pool = None                                                  # ParsePool of processes that find the links of pages. None to find them in the thread that fetched the page. See crawler_links.py
+        self.checkpoint = None                                                  # CrawlCheckpoint that every attempt, visit and new link is appended to. None for no checkpoints.
+        self.policy = CrawlPolicy()                                             # Answers to the robots/ToS questions given up front. By default, every question is asked. See crawler_policy.py
+        self.proportion_answer = 1                                              # 1 if all links from a site are added to sites_to_visit. Otherwise a percentage.
+        self.lock = threading.Lock()                                            # Held while storing results - several sites may be attempted at once (AsyncCrawler).
+        self.prompt_lock = threading.Lock()                                     # Held while asking the user a question, so that questions don't overlap.
+        self.session = make_session(self.cusHeaders)                            # Shared by every request, so connections to a host are kept open and re-used. See crawler_http.py
+        self.timeout = DEFAULT_TIMEOUT                                          # (connect, read) seconds for each request
+
+    # 2.1.1. The url index that the records in sites_dict number their urls in (crawler_urls.py). A RecordLog keeps its own, on disk - so it
+    # follows sites_dict when that is replaced by a RecordLog (eg, by a checkpoint).
+    @property
+    def url_index(self):
+        return getattr(self.sites_dict, 'index', self.memory_index)
 
     # 2.2. Function that examines robots.txt file. Makes code cleaner.
-    def robots_check(self):
+    def robots_check(self, target):
         """
         Function to check whether we are prohibited from visiting a site based on /robots.txt restrictions.
-        Inputs: object of class Crawler. Need: current_target, cusHeaders
+        Inputs: object of class Crawler. Need: cusHeaders, robots_cache
+                target (str): url of the site we want to visit.
         Outputs: crawlable (Bool), True if we can crawl. False otherwise.
                  str_status (int), For the dictionary
         """
 
         # 2.2.1. Get root of site url.
-        site_pieces = self.current_target.split('//',1)                         # https://www.google.co.uk/themain/site -> ['https:', 'www.google.co.uk/themain/site']
+        site_pieces = target.split('//',1)                                      # https://www.google.co.uk/themain/site -> ['https:', 'www.google.co.uk/themain/site']
         # Because the trailing '/' was removed from the url, there will be no mishaps with: https://www.mytest.com/ -> [www.mytest.com, '']
         second_list = site_pieces[1].split('/',1)                               # www.google.co.uk/themain/site -> ['www.google.co.uk', 'themain/site']
         # root_url will NOT end with a slash. We just split based on that.
         root_url = site_pieces[0] + '//' + second_list[0]                       # https: + // + www.google.co.uk
 
-        # 2.2.2. Try to 'get' the robots file.
-        robots_url = root_url + '/robots.txt'
-        robots_req_obj = requests.get(robots_url, headers = self.cusHeaders)
+        # 2.2.2. Get the parsed robots file for this origin. It is only downloaded (robots_fetch) if we don't already have a fresh copy in the cache.
+        # Thousands of URLs may share the same host - this saves an HTTP round trip and a parse for all but the first of them.
+        robots_entry = self.robots_cache.get(root_url)
+        if robots_entry is None:
+            robots_entry = self.robots_fetch(root_url)
 
-        # 2.2.3. To get the extension of the site to visit. This will be used in the RegEx checking later:
-        # tExtension = self.current_target - root_url
+        # 2.2.3. To get the extension of the site to visit. This will be checked against the robots rules later:
+        # tExtension = target - root_url
         try:
             tExtension = '/' + second_list[1]               # something like: /themain/site
         # If our target was the root, second_list only has 1 element. We make an exception and give the extension just as '/'. (This is likely to be unnecessary. Because for the case where the target URL is the root, I have made exceptions.)
         except IndexError:
             tExtension = '/'                                # No reason to have a space at the end of the string.
 
-        # 2.2.4. Status codes with string conversion
-        str_status = getSiteStatus(robots_req_obj, self)
-        # There are many possible digits that 'str_status' could begin with. Those possibilities have been addressed in getSiteStatus
-        if str_status[0] != '2':
+        # 2.2.4. Status codes. getSiteStatus was called on the response when the robots file was downloaded.
+        if str(robots_entry.status)[0] != '2':
             crawlable = False
             # Stop the function and return both the fact that we can't crawl, and the problematic status code of the .robots file.
+            return crawlable, robots_entry.status
+
+        # 2.2.5. Keep the crawl-delay from the 'UA: *' record, if there was one. The scheduler applies it to every request to this site.
+        self.scheduler.set_delay(root_url, robots_entry.crawl_delay)
+
+        # 2.2.6. Based on the comments in the robots file, the user chose whether or not to continue with this site. This is only asked once per site.
+        if not robots_entry.comments_ok:
+            crawlable = False
+            return crawlable, robots_entry.status
+
+        # 2.2.7. Check the URL against the rules of the 'UA: *' record. RobotsMatcher (crawler_robots.py) was built once for this site, when the robots file was parsed.
+        # The most specific (longest) matching rule decides. If an Allow and a Disallow are equally specific, the least restrictive (Allow) is used.
+        # According to: http://www.robotstxt.org/robotstxt.html, 'everything not explicitly disallowed is considered fair game'
+        crawlable = robots_entry.matcher.allowed(tExtension)                    # F: Prohibited, T: allowed
+        return crawlable, robots_entry.status                                   # True: allowed, False: prohibited
+
+    # 2.3. Function that downloads and parses the robots.txt file of a site. The result is kept in the robots cache, so this is done once per site.
+    def robots_fetch(self, root_url):
+        """
+        Function to download and parse the /robots.txt file of a site. Only called when robots_cache has no fresh copy.
+        Inputs: object of class Crawler. Need: cusHeaders, robots_cache
+                root_url (str): scheme + host of the site, eg 'https://www.abcd.com'. Won't end with '/'
+        Outputs: robots_entry (RobotsEntry): status code, allow/disallow rules and crawl-delay. Also stored in the cache.
+        """
+        # 2.3.1. Try to 'get' the robots file.
+        robots_url = root_url + '/robots.txt'
+        robots_req_obj = self.polite_get(robots_url, phase = 'robots')
+
+        # 2.3.2. Status codes with string conversion
+        str_status = getSiteStatus(robots_req_obj, robots_url)
+        # There are many possible digits that 'str_status' could begin with. Those possibilities have been addressed in getSiteStatus
+        if str_status[0] != '2':
+            robots_entry = RobotsEntry(int(str_status))
+            # Server errors are assumed to be temporary - so they are not kept. Any other failure is kept like a normal robots file.
+            if str_status[0] != '5':
+                self.robots_cache.put(root_url, robots_entry, robots_req_obj.headers)
             robots_req_obj.close()
-            return crawlable, int(str_status)
+            return robots_entry
 
-        # 2.2.5. Split the text of the robots file into a list, delimited by newline characters.
+        # 2.3.3. Split the text of the robots file into a list, delimited by newline characters.
         robots_list = robots_req_obj.text.split('\n')
 
-        # 2.2.6. CLOSE object now that we are done with it (terminate connxn with server so we don't stress it)
+        # 2.3.4. CLOSE object now that we are done with it (terminate connxn with server so we don't stress it)
+        robots_headers = robots_req_obj.headers
         robots_req_obj.close()
 
-        # 2.2.7. The 'robots_list' has all the content of the robots file, split by newlines.
+        # 2.3.5. The 'robots_list' has all the content of the robots file, split by newlines.
             # Now we split this list into a number of other lists, all separated by ''. We have a generator iterator.
         generator_robots_list = list_splitter(robots_list,'')
 
-        # 2.2.8. Extract rules from each sublist
+        # 2.3.6. Extract rules from each sublist
 
         # Documentation: We iterate over each 'record' (defined between empty lines)
             # We get a 'list' for each of these. We iterate over each element in the list (split by newlines from before)
@@ -345,6 +363,8 @@ class Crawler():
             # If the line starts with a '#', we add the content to a comment string.
             # If the line starts with user and ends with '*', we know that this is the record that we are interested in.
         # Store of commands from /robots.txt file.
+        # crawl-delay from the 'UA: *' record. None if the record doesn't give one.
+        robots_delay = None
         final_dict = {}
         # Used for numbering final_dict entries. See end of for loop.
         dict_title = 0
@@ -387,7 +407,7 @@ class Crawler():
                         elif element.startswith('crawl') or element.startswith('Crawl'):
                             delayEntry = element.split(':')
                             # Get the seconds, remove spaces and '.'s, and make it an integer.
-                            self.crawl_delay = int(delayEntry[1].strip(' .'))
+                            robots_delay = int(delayEntry[1].strip(' .'))
                             # Don't want to add crawl-delay to the final_dict.
                             continue
 
@@ -407,14 +427,17 @@ class Crawler():
 
                     # UA:* shouldn't occur more than once in a robots file. But if it does, this still works. dict_title is initialised OOTL.
                     # So for a second occurrence of UA:*, more entries are added to the final_dict - existing entries remain unmodified.
-        # 2.2.9. Display comments in the /robots.txt file
-        print('These are the comments from the .robots.txt file:', comment_string)
-        shallWeContinue = input('Based on the comments from the robots file, do you wish to continue? (Y/N): ')
+        # 2.3.7. Display comments in the /robots.txt file
+        shallWeContinue = self.ask_user('These are the comments from the .robots.txt file: ' + comment_string,
+                                        'Based on the comments from the robots file, do you wish to continue? (Y/N): ',
+                                        ROBOTS, root_url)
+        # The answer is stored with the rest of the robots file - we won't ask again for this site.
         if 'N' in shallWeContinue:
-            crawlable = False
-            return crawlable, int(str_status)
+            robots_entry = RobotsEntry(int(str_status), crawl_delay = robots_delay, comments_ok = False)
+            self.robots_cache.put(root_url, robots_entry, robots_headers)
+            return robots_entry
 
-        # 2.2.10. Make sure that the entries are all 'allow' or 'disallow' commands and store.
+        # 2.3.8. Make sure that the entries are all 'allow' or 'disallow' commands and store.
         disallow_list = []
         allow_list = []
 
@@ -434,196 +457,60 @@ class Crawler():
             else:
                 final_dict.pop(i)
 
-        # 2.2.11 RegExps
-        # We use Regular Expressions to match the extension of our current_target to sites in the /robots.txt file. This tells us if we can visit current_target.
-        # First we need to convert the /robots.txt commands to RegExps. Then we will do the search.
-
-        # This section is the most complex part of this whole script - and is the first place to check for bugs.
-        # See: https://docs.python.org/3/howto/regex.html#regex-howto for a great explanation on Python RegEx's.
-
-        allow_list_regex = []
-        disallow_list_regex = []
-        # Do the following process for disallow commands first, then allow commands (arbitrary)
-        # this will not change the content in the disallow_list and allow_list themselves
-        # Lists might be mutable, but the strings they contain aren't
-        # This section works by appending the changed elements to a new list.
-
-        for ii in range(1,3):
-            if ii == 1:
-                list_r = disallow_list
-            else:
-                list_r = allow_list
-
-            # Now for the tricky part.
-            # Remember: aim is to see if the extension of our current_target matches any of the paths in the Robots file - and decide whether or not to crawl accordingly.
-            # This will be done by turning the robots paths into RegEx's.
-            # The links in that Robots file contain certain characters (*,$,etc.) to represent 'patterns' and whole groups of paths in a few lines.
-            # As explained in the documentation link above, RegEx's in a simple form match text easily.
-            # However some RegEx's contain 'metacharacters' - which modify the RegExp. These, ordinarily, are interpreted by the RegEx engine to mean something special
-            # The danger is that some of the paths may contain these metacharacters - and the RegEx engine will not seek to match the characters but will interpret them as metacharacters
-            # The solution is to escape the metacharacters - so that the RegEx engine realises that we are trying to match those characters and not use them as metacharacters
-            # This could be done with [], but we are better off with a '\' to escape.
-            # We use raw strings so that Python understands we want to replace metacharacters with an backslash preceding them - not with an escape sequence.
-
-            # entries in this list are from the /robots.txt file. They are relative paths that will be allowed/disallowed.
-            for el in list_r:
-                # First check for any metacharacters: ., ^, $, *, +, ?, {, }, [, ], \, |, (, ) - protect them.
-                # Backslashes '\' or carets '^' are unlikely to appear in URLs. Include for completeness
-
-                # replace a single slash with a double. Need to do this first because everywhere else we use slashes.
-                el = el.replace("\\", r"\\")
-
-                el = el.replace('.', r'\.')
-                el = el.replace('^', r'\^')
-                # If '$' is the last character, we don't want to replace it. It has some meaning.
-                if '$' in el:
-                    num_dollar = el.count('$')
-                    # If the dollar is the final element
-                    if '$' == el[-1]:
-                        # Escape all instances of 'dollar' but the last one
-                        el = el.replace('$', r'\$', num_dollar - 1)
-                    else:
-                        # Escape all instances of 'dollar'
-                        el = el.replace('$', r'\$', num_dollar)
-                # '*' dealt with later
-                el = el.replace('+', r'\+')
-                el = el.replace('?', r'\?')
-                el = el.replace('{', r'\{')
-                el = el.replace('}', r'\}')
-                el = el.replace('[', r'\[')
-                el = el.replace(']', r'\]')
-                el = el.replace('|', r'\|')
-                el = el.replace('(', r'\(')
-                el = el.replace(')', r'\)')
-
-                # Then replace any '*' with '.*'. This is for the RegExp. This allows us to match the command '*', which means any string.
-                # Important that we do this AFTER protection of '.'. Otherwise the '.' that we add gets protected and loses the RegEx meaning - which we want in this case.
-                # we are NOT escaping this symbol here.
-                el = el.replace('*', '.*')
-
-                # Then add '^' at the start
-                el = '^' + el
-
-                # Strip off trailing * (when behind a slash). It has no affect whatsoever.
-                if el.endswith('/.*'):
-                    el = el[:-2]
-
-                # If we end with a slash and are on the disallow list (eg, el = ^/collect/)
-                if el.endswith('/'):
-                    if ii == 1:
-                    # Disallow the base (^/collect$) and also anything beneath (^/collect/)
-                        elNew = el[:-1]
-                        elNew = elNew + '$'
-
-                        disallow_list_regex.append(el)
-                        disallow_list_regex.append(elNew)
-                    # if we end with a slash and are on the allow list (eg, el = ^/collect/)
-                    else:
-                        allow_list_regex.append(el)
-
-
-
-                # We've addressed any path ending with '/.*' or '/'
-                # Now for paths with .* at end (eg: ^/collect.*)
-                elif el.endswith('.*'):
-                    el = el[:-2]
-                    if ii == 1:
-                        disallow_list_regex.append(el)
-                    else:
-                        allow_list_regex.append(el)
-
-                # Finally, perhaps most importantly, paths that end with neither /.*, / or .*
-                # eg, ^/collect
-                else:
-                    if not el.endswith('$'):
-                        el = el + '$'
-                    if ii == 1:
-                        disallow_list_regex.append(el)
-                    else:
-                        allow_list_regex.append(el)
-
-        # 2.2.11. Check the URL against each of the rules.
-        # If it passes the test, continue. Otherwise - exit, add the URL to the dictionary and explain the ROBOTS issue.
-        # We'll have to check both lists. For example, you might disallow all but allow a few sites. So we need to check for that.
-        # First check for exceptional circumstances. These are the: ' ' and '/' entries.
-        # According to: http://www.robotstxt.org/robotstxt.html, 'everything not explicitly disallowed is considered fair game'
+        # 2.3.9. Compile the rules. Each path from the robots file is added to a RobotsMatcher once here - rather than being turned into a RegExp again for every URL.
+        # See crawler_robots.py for how '*', '$' and trailing '/' are treated.
+        robots_matcher = RobotsMatcher(allow_list, disallow_list)
 
-            # Another issue is with trailing '/'. For consistency, we have removed trailing slashes from URLs.
-            # But this means a link we find, ending with a slash, will have its trailing character removed as it becomes current target.
-            # Then if the robots file lists /.../dir/, our link may be accepted even though it shouldn't be.
-            # In addition, in some places online a link that ought to end with a '/' may not have one. (%*)
-            # We think that response.url gives us the true URL. But we can't use that as the purpose of the robots check is to determine if a requests.get is allowed.
-            # We could simply avoid stripping trailing slashes. But that leads to inconsistencies in data storage and the problem in (%*).
-            # Solution: strip trailing slashes from robots commands too. This does lead to some extra restrictions: certain sites that are (in theory) crawlable won't be crawled.
-            # In practice this is not an issue. The number of extra prohibited sites is just equal to the number of disallows in the UA:* of the robots file.
-            # I won't extend this to 'allows' - I will be more restrictive given the ambiguity.
-            # eg, Disallow: /ex/dir/. If we have https://www.site.com/ex/dir, we don't know if it was dir/ before. But making
-            # Disallow: /ex/dir prevents crawling if it was dir/ or just dir
-        crawlable = True                                                        # F: Prohibited, T: allowed
-
-        for el in disallow_list_regex:
-            # A statement: 'Disallow: ' -> '^'. Disallowing nothing
-            # We stripped spaces away. ' ' -> '' -> '^'
-            if el == '^':
-                pass
-            # A statement: 'Disallow: /' -> '^/'. Disallowing everything        For the case where tExtension = '/'.
-            elif el == '^/':
-                crawlable = False
-            else:
-                x = re.search(el, tExtension)
-                # If there is a match - our target url appears in disallow
-                if x:
-                    crawlable = False
-
-        # Now we have been prohibited, lets check allow list
-        if crawlable == False:
-            for el in allow_list_regex:
-                # A statement: 'Allow: ' -> '^'. Allow nothing
-                if el == '^':
-                    pass                                                        # Since we are currently prohibited, and nothing is allowed
-                # A statement: 'Allow: /' -> '^/'. Allow everything.
-                # From: 'https://developers.google.com/search/reference/robots_txt', In case of conflicting rules, including those with wildcards, the least restrictive rule is used.
-                elif el == '^/':
-                    crawlable = True
-                else:
-                    x = re.search(el, tExtension)
-                    if x:
-                        crawlable = True
-        return crawlable, int(str_status)                                       # True: allowed, False: prohibited
+        # 2.3.10. Store the parsed file, so that other URLs on this site don't need to download it again.
+        robots_entry = RobotsEntry(int(str_status), robots_matcher, robots_delay)
+        self.robots_cache.put(root_url, robots_entry, robots_headers)
+        return robots_entry
 
-    # 2.3. Function that examines the terms of service. Sees if we can crawl
-    def ToS_check(self):
+    # 2.4. Function that examines the terms of service. Sees if we can crawl
+    def ToS_check(self, target):
         """
         Function to check the Terms of Service on the webpage.
-        Check both the root site and the ToS page, if they can be found.
+        Check both the root site and the ToS page, if they can be found. This is only done once per site - see ToS_fetch.
         Inputs: crawler instance.
+                target (str): url of the site we want to visit.
         Outputs: okContinue (Y/N) (str): can the crawl progress or are we prohibited?
                  ToS_status (int): status code of request [either for the Homepage or T&C's page]
         """
-        # We will first go to the homepage of the target url. From there we will search for any links to a 'terms' site.
-        # We will go to the 'terms' site and search for any reference to 'robots' - printing this for the user.
-        # The user can then decide whether or not it is appropriate to crawl.
-
-        # 2.3.1. Get root of site url.
-        site_pieces = self.current_target.split('//',1)                         # ['https:','www.abcd.com....etc']
+        # 2.4.1. Get root of site url.
+        site_pieces = target.split('//',1)                                      # ['https:','www.abcd.com....etc']
         second_list = site_pieces[1].split('/',1)                               # ['www.abcd.com','a','b','c']
         root_url = site_pieces[0] + '//' + second_list[0]                       # 'https://www.abcd.com'. Won't end with '/'
 
-        # 2.3.2. Having just visited the robots page, we shall wait a certain amount of time before moving forward.
-        # Time may have been updated from the /robots.txt file. Otherwise a standard 15s wait is used.
-        time.sleep(self.crawl_delay)
+        # 2.4.2. The terms are the same for every URL on a site. Only check them (ToS_fetch) if we haven't already - in this run, or in an earlier run
+        # if the verdicts are kept in a file (tos_cache, see crawler_tos.py). For every other URL on the site, this is just a dictionary lookup.
+        tos_verdict = self.tos_cache.get(root_url)
+        if tos_verdict is None:
+            tos_verdict = self.ToS_fetch(root_url)
+        return tos_verdict.verdict, int(tos_verdict.status)
 
-        # 2.3.3. Visit root site (homepage)
-        root_req_obj = requests.get(root_url, headers = self.cusHeaders)
-        # for getAbsUrl
+    # 2.5. Function that downloads the homepage and ToS page of a site, and asks the user about the terms. Only called the first time a site is checked.
+    def ToS_fetch(self, root_url):
+        """
+        Function to check the Terms of Service of a site and store the verdict in tos_cache.
+        Input: root_url (str): eg 'https://www.abcd.com'
+        Output: tos_verdict (ToSVerdict): verdict ('Y'/'N'), status code and the url of the ToS page if one was found.
+        """
+        # We will first go to the homepage of the target url. From there we will search for any links to a 'terms' site.
+        # We will go to the 'terms' site and search for any reference to 'robots' - printing this for the user.
+        # The user can then decide whether or not it is appropriate to crawl.
+
+        # 2.5.1. Visit root site (homepage). Having just visited the robots page, polite_get waits for the crawl-delay of this site first.
+        root_req_obj = self.polite_get(root_url, phase = 'tos')
+        # Links on the homepage are relative to the url it was actually served from.
         actual_url_home = root_req_obj.url
-        root_status = getSiteStatus(root_req_obj, self)
+        root_status = getSiteStatus(root_req_obj, root_url)
         # If we are unable to access the homepage (and therefore check the ToS - don't crawl.)
         if root_status[0] != '2':
-            okContinue = 'N'
             print("Problem establishing connxn with Homepage")
             root_req_obj.close()
-            return okContinue, int(root_status)
+            tos_verdict = ToSVerdict('N', int(root_status))
+            self.tos_cache.put(root_url, tos_verdict)
+            return tos_verdict
 
         homepage_soup = BeautifulSoup(root_req_obj.text, 'lxml')
         # CLOSE connxn so that we don't stress server.
@@ -640,50 +527,446 @@ class Crawler():
             except TypeError:
                 pass                                                            # In case the link is NoneType, link.string won't work.
 
-        # 2.3.4. Head to the 'terms' page and search for 'robots'/'crawler'/'spider'
+        # 2.5.2. Head to the 'terms' page and search for 'robots'/'crawler'/'spider'
         # If no 'terms' link was found - go ahead with the crawl.
         if (ToS_link != '') and (ToS_link != None) and (not ToS_link.startswith('#')):
-            # Some URLs are relative!!! getAbsUrl gives us the form of the link to access the site.
-            ToS_link_full = getAbsUrl(ToS_link, site_pieces, root_url, actual_url_home)
-            # Wait again - do this before each 'get' request.
-            time.sleep(self.crawl_delay)
-            terms_req_obj = requests.get(ToS_link_full, headers = self.cusHeaders)
-            tos_status = getSiteStatus(terms_req_obj, self)
+            # Some URLs are relative!!! The canonicaliser (crawler_urls.py) gives us the form of the link to access the site.
+            ToS_link_full = self.urls.resolve(ToS_link, actual_url_home)
+            # polite_get waits again - this is done before each 'get' request.
+            terms_req_obj = self.polite_get(ToS_link_full, phase = 'tos')
+            tos_status = getSiteStatus(terms_req_obj, ToS_link_full)
             # If we know that there is a ToS page but we are not able to access it - don't crawl.
             if tos_status[0] != '2':
-                okContinue = 'N'
                 print("Problem establishing connxn with ToS page")
                 terms_req_obj.close()
-                return okContinue, int(tos_status)
+                tos_verdict = ToSVerdict('N', int(tos_status), ToS_link_full)
+                self.tos_cache.put(root_url, tos_verdict)
+                return tos_verdict
             # Get list of T&C's content
             listOf_TandCs = (terms_req_obj.text).split('\n')
             # CLOSE connxn now that we are done with it - so that we don't stress the server
             terms_req_obj.close()
             # Use the generator to loop over T&C's content - get a separate list separated by ''
+            relevant_terms = []
             for sublist_TandCs in list_splitter(listOf_TandCs,''):
                 pageStr = ' '.join(sublist_TandCs)
                 if ('robot' in pageStr) or ('Robots' in pageStr) or ('crawler' in pageStr) or ('Crawler' in pageStr) or ('spider' in pageStr) or ('Spider' in pageStr):
-                    # Show the user the 'terms'. If they read it and wish to continue, they may do so. Otherwise not.
-                    print(pageStr)
-            okContinue = input("Based on the above, will you continue with the crawl? Do the T&C's allow it? (Y/N) ")
+                    relevant_terms.append(pageStr)
+            # Show the user the 'terms'. If they read it and wish to continue, they may do so. Otherwise not.
+            okContinue = self.ask_user('\n'.join(relevant_terms), "Based on the above, will you continue with the crawl? Do the T&C's allow it? (Y/N) ",
+                                       TOS, root_url)
         # If no 'terms' page was found, continue with the crawl.
         else:
             okContinue = 'Y'
             tos_status = 0
+            ToS_link_full = None
+
+        # 2.5.3. Keep the verdict, so no other URL on this site needs to check again.
+        tos_verdict = ToSVerdict(okContinue, int(tos_status), ToS_link_full)
+        self.tos_cache.put(root_url, tos_verdict)
+        return tos_verdict
+
+    # 2.6. Function that makes a request, once the site is due. Every request the crawler makes goes through here.
+    def polite_get(self, url, stream=False, phase='get'):
+        """
+        Function to 'get' a url, waiting first if the crawl-delay of its site hasn't passed since the last request to that site.
+        Requests to other sites don't wait. Sites we skip without a request don't wait either.
+        Every request goes through self.session, so robots.txt, the homepage, the ToS page and the target of one site share a connection.
+        Inputs: url (str): absolute url.
+                stream (Bool): True to return as soon as the headers arrive - the body is then read by the caller (eg, with iter_links).
+                               The caller should call scheduler.finished once it has read the body, so the crawl-delay counts from then.
+                phase (str): what the request is for - 'robots', 'tos' or 'get' (the site itself). The time it takes is added to that phase
+                             of self.timing, and the time spent waiting for the site to be due to 'wait'.
+        Output: requests.Response object
+        """
+        root_url = getRootUrl(url)
+        self.timing.add('wait', self.scheduler.wait(root_url), root_url)
+        request_start = time.perf_counter()
+        try:
+            response = self.session.get(url, timeout = self.timeout, stream = stream)
+        finally:
+            self.timing.add(phase, time.perf_counter() - request_start, root_url)
+            # The crawl-delay counts from the end of this request.
+            self.scheduler.finished(root_url)
+        # Counted for the metrics (crawler_metrics.py). A streamed body hasn't been read yet - the caller counts it once it has.
+        with self.lock:
+            self.status_counts[response.status_code] += 1
+            if not stream:
+                self.bytes_downloaded += body_bytes(response)
+        return response
+
+    # 2.7. Function that asks the user a question - unless the policy (crawler_policy.py) already gives the answer.
+    # With the AsyncCrawler, several sites may want to ask at the same time - so only one question is asked at once.
+    def ask_user(self, text, question, kind=None, origin=None):
+        """
+        Function to show the user some text and then ask them a question about it.
+        Inputs: text (str): what to show first, eg the comments from a robots file.
+                question (str): the question.
+                kind (str): ROBOTS or TOS - what the text is. Used by the policy.
+                origin (str): root url of the site the question is about. Used by the policy.
+        Output: answer (str): what the user typed, or the verdict of the policy ('Y'/'N').
+        """
+        verdict, reason = self.policy.decide(kind, origin, text)
+        with self.prompt_lock:
+            print(text)
+            if verdict is not None:
+                # Decided without asking. Say so, so that the log shows why a site was (or wasn't) crawled.
+                print(question + verdict + '  [policy - ' + reason + ']')
+                return verdict
+            # Time spent waiting for the answer is kept apart from the rest - it can be far longer than anything else.
+            with self.timing.span('ask', origin):
+                return input(question)
+
+    # 2.8. Function that stores the outcome of an attempt in sites_dict.
+    def record_attempt(self, site_entry):
+        """
+        Function to add an attempt to sites_dict. Attempts are numbered from 1 in the order they finish.
+        Input: site_entry (CrawlRecord): see 'Format for sites_dict' below.
+        Output: None
+        """
+        with self.lock:
+            self.counter_attempts += 1
+            self.sites_dict.update({self.counter_attempts:site_entry})
+            # sites_dict may be a RecordLog (crawler_records.py) - then the entry is appended to its file straight away, and not kept in memory.
+            if self.checkpoint is not None:
+                self.checkpoint.attempt(self.counter_attempts)
+
+    # 2.9. Function that checks if we WANT to visit a target. No request is made for these - so there is never any need to wait for them.
+    def is_no_go(self, target):
+        """
+        Function to check if a target should be skipped without any request.
+        Input: target (str): url of the site. May be None.
+        Output: Bool, True if the site should not be visited.
+        """
+        # What shall we exclude? (1) Sites we just don't want to visit, (2) 'mailto' or 'ftp' schemes, (3) None sites, (4) # sites (seen on https://www.riotgames.com, for example.), (5) other schemes
+        # or (6) sites on the deny list of the policy (crawler_policy.py) - so they aren't sent a single request, not even for robots.txt or the ToS.
+        # (3) is checked first - None has no '.startswith' method.
+        if target is None:
+            return True
+        # This bit excludes (1) sites we just don't want to visit:
+        for preventIterator in range(0, len(self.no_goes)):                    # All elements in a list
+            if target.startswith(self.no_goes[preventIterator]):
+                return True
+        if 'mailto' in target or 'ftp' in target or target.startswith('#'):
+            return True
+        # (5) Anything else that can't be requested - 'javascript:', 'tel:', ... Links are made absolute by the canonicaliser, so every other link starts with http(s).
+        if not (target.startswith('http://') or target.startswith('https://')):
+            return True
+        return self.policy.denies(getRootUrl(target))
+
+    # 2.9.1. Function that records an attempt whose request failed - a timeout, a refused connection, a connection reset while reading the page, ...
+    # The crawl goes on to the next site: one slow or broken server shouldn't stop it.
+    def request_failed(self, target, error, response=None):
+        """
+        Function to store an attempt that failed with a requests exception, with no status code.
+        Inputs: target (str): url of the site.
+                error (requests.RequestException)
+                response (requests.Response): the response whose body was being read, if any. It is closed.
+        Output: visited (Bool): always False.
+        """
+        print('Request for ' + target + ' failed: ' + repr(error))
+        if response is not None:
+            response.close()
+        # The crawl-delay of this site counts from now - and its slot is free for the next attempt.
+        self.scheduler.finished(getRootUrl(target))
+        self.record_attempt(CrawlRecord(self.url_index, target))
+        return False
+
+    # 2.9.2. Function that says whether an attempt on a target would make a request. No-go sites and repeats never do - so they never wait.
+    def makes_request(self, target, root_url):
+        return root_url is not None and not self.is_no_go(target) and target not in self.sites_visited_set
+
+    # 2.10. Function that makes one attempt on a target. This was the body of the main loop: all the checks, the request itself and storing the outcome.
+    def visit(self, target):
+        """
+        Function to attempt one site taken from sites_to_visit. The outcome is always stored in sites_dict.
+        If the site is visited, its links are added to sites_to_visit and the site is added to sites_visited.
+        Inputs: object of class Crawler.
+                target (str): url of the site. May be None, or a 'mailto'/'ftp'/'#' link.
+        Output: visited (Bool): True if the site was visited. False if it was skipped or prohibited.
+        """
+        # 2.10.1. Check if we WANT to visit it. (if not, we can record it as an ending stub in the diagram)
+        # If we don't want to visit the site, record it in the dictionary and set 'nogo': True. Then move onto the next site.
+        if self.is_no_go(target):
+            self.record_attempt(CrawlRecord(self.url_index, target, nogo = True))
+            # Skip the rest of this code and move onto the next site.
+            return False
+
+        # 2.10.2. Check if we have already visited it. This is why it is important to have links stored consistently. A trailing slash could prevent a desired match.
+        # If we already visited, skip and set 'Repeat':True. (sites_to_visit never takes the same url twice, so this should be rare.)
+        if target in self.sites_visited_set:
+            self.record_attempt(CrawlRecord(self.url_index, target, Repeat = True))
+            # Skip the rest of this code and move onto the next site.
+            return False
+
+        # 2.10.3. Check if we are PERMITTED to visit it (robots file)
+        # Returns a bool TRUE if we can crawl. Also get the status of the Robots file (though we aren't currently using that)
+        # Every request from here on may fail (timeout, refused or reset connection) - the attempt is then stored without a status (request_failed).
+        try:
+            m_crawlable, robot_status = self.robots_check(target)
+        except requests.RequestException as error:
+            return self.request_failed(target, error)
+        # If we are prevented from crawling by Robots file, move onto the next and set 'robots':True.
+        if not m_crawlable:
+            self.record_attempt(CrawlRecord(self.url_index, target, robots = True))
+            # Skip the rest of this code and move onto the next site.
+            return False
+
+        # 2.10.4. Check if the TERMS allow us to access the desired site
+        # Since we are not completely probited from crawling, it stands to reason that we can visit the Homepage -> T&C's to check homepage.
+        # We get ToS_outcome: bool on whether we can crawl. Also get tos_code for either homepage or ToS page.
+        try:
+            ToS_outcome, tos_code = self.ToS_check(target)
+        except requests.RequestException as error:
+            return self.request_failed(target, error)
+        # Only occurs if we didn't access ToS page.
+        if tos_code == 0:
+            print('No ToS page found. Going ahead with crawl...')
+        # If ToS prohibits us, add URL to dict and set ToS:True.
+        if ToS_outcome != 'Y':
+            self.record_attempt(CrawlRecord(self.url_index, target, ToS = True))
+            # Skip the rest of this code and move onto the next site.
+            return False
+
+        # 2.10.5. Now we know that we can visit the site.
+        # Get root url
+        root_url = getRootUrl(target)                                           # Gives 'https://www.abcd.com'
+        main_link_list = []
+        #### Visit the desired site and extract content. polite_get waits for the crawl-delay of this site again.
+        # stream = True: only the headers have arrived when polite_get returns. The page itself is read (and its links found) a piece at a time below.
+        try:
+            main_siteContentStuff = self.polite_get(target, stream = True)
+        except requests.RequestException as error:
+            return self.request_failed(target, error)
+        # Links are relative to the url the page was actually served from (after redirects). It ends in '/' if the page is a directory.
+        actual_url_main = main_siteContentStuff.url
+        main_code = getSiteStatus(main_siteContentStuff, target)
+        # If we are not able to properly access the site, set 'status' to our code and move on.
+        if main_code[0] != '2':
+            self.record_attempt(CrawlRecord(self.url_index, target, status = int(main_code)))
+            # Close this here because we will not reach the close statement properly.
+            main_siteContentStuff.close()
+            return False
+
+        # 2.10.6. Get links from page.
+        # iter_links (crawler_links.py) gives the 'href' of every <a> tag as the page is downloaded - without building a tree of the whole page.
+        # For all links, get their canonical absolute form (crawler_urls.py) - this also strips the trailing '/' for uniformity. Then add to our store.
+        # The time resolving links is added up as we go, and kept apart from the time reading and parsing the page.
+        parse_start = time.perf_counter()
+        resolve_time = 0.0
+        # The body can still time out, or the connection be reset, while it is being read.
+        try:
+            if self.parse_pool is None:
+                for link_to_add in iter_links(main_siteContentStuff):
+                    # Resolved against the true form of the URL of current page - so we know if we are on a directory or not.
+                    resolve_start = time.perf_counter()
+                    main_link_list.append(self.urls.resolve(link_to_add, actual_url_main))
+                    resolve_time += time.perf_counter() - resolve_start
+            else:
+                # With a parse pool, the whole page is downloaded here, and a worker process finds and resolves the links (in the same way).
+                # Resolving is then part of 'parse'.
+                main_link_list = self.parse_pool.links(main_siteContentStuff.content, main_siteContentStuff.encoding, actual_url_main,
+                                                       self.urls.sort_query)
+        except requests.RequestException as error:
+            return self.request_failed(target, error, main_siteContentStuff)
+        self.timing.add('parse', time.perf_counter() - parse_start - resolve_time, root_url)
+        if self.parse_pool is None:
+            self.timing.add('resolve', resolve_time, root_url)
+        with self.lock:
+            self.bytes_downloaded += body_bytes(main_siteContentStuff)
+        # Now every link that is added will have a full, absolute web address (apart from None, '#...' and non-http links, which are kept as they are).
+        # The whole page has been read - the crawl-delay of this site counts from now.
+        self.scheduler.finished(root_url)
+
+        # 2.10.7. Now double-check that the url we have reached is the same as our target:
+        # The target is canonical (no trailing slash, lower-case host, ...) - so compare it with the canonical form of the url we reached.
+        weird_urlVal = self.urls.canonical(actual_url_main) != target
+        # If they differ, a strange redirect has occured, may not have been picked up by status_code. https://www.riotgames.com had an example of this.
+
+        # 2.10.8. Store the information:
+        self.record_attempt(CrawlRecord(self.url_index, target,
+                                        links = main_link_list,
+                                        status = main_siteContentStuff.status_code,
+                                        redirect = main_siteContentStuff.is_redirect,
+                                        duration = (main_siteContentStuff.elapsed).total_seconds(),
+                                        weird_url = weird_urlVal))
+
+        # 2.10.9. Close connection with site (done for each as soon as we are done with the command - so that connxn is open for minimum time)
+        main_siteContentStuff.close()
+
+        # 2.10.10. Decide on a percentage of links to add to the final store.
+        # We use random.sample() to sample without replacement.
+        if len(main_link_list) <= 10 or self.proportion_answer == 1:
+            proportionToAdd = main_link_list
+
+        elif len(main_link_list) in range(11,400):
+            # Here use 10 links plus 10 percent of the number of links we have.
+            num_fraction = round(len(main_link_list)/10) + 10
+            proportionToAdd = random.sample(main_link_list, num_fraction)
+
+        else:
+            proportionToAdd = random.sample(main_link_list, 50)
+
+        # 2.10.11. Add links to the sites we have left to visit and add our current site to visited_sites list.
+        # Links that have been added to sites_to_visit before are dropped by the Frontier.
+        # Under the lock - with the AsyncCrawler, several sites are visited at once.
+        with self.lock:
+            added = [link for link in proportionToAdd if self.sites_to_visit.append(link)]
+            self.sites_visited.append(target)
+            self.sites_visited_set.add(target)
+            self.counter_total += 1
+            if self.checkpoint is not None:
+                self.checkpoint.enqueue(added)
+                self.checkpoint.visited(target)
+        return True
+
+    # 2.11. The serial crawl: one site at a time. This used to be the main loop of the script.
+    def crawl(self):
+        """
+        Function to crawl until num_to_visit sites have been visited, or we run out of sites to visit.
+        Sites are attempted one at a time, in the order they were added to sites_to_visit.
+        Input: object of class Crawler.
+        Output: None. The results are in sites_dict and sites_visited.
+        """
+        wMainLoopSafety = 0
+        while len(self.sites_visited) < self.num_to_visit:
+            # 2.11.1. Take a starting website
+            try:
+                self.current_target = self.sites_to_visit.popleft()
+            except IndexError:
+                print("Finished.")
+                return
+            # 2.11.2. Make the attempt.
+            # No need to wait here - each request waits for its own site to be due (polite_get). Sites that are skipped make no request, so never wait.
+            visited = self.visit(self.current_target)
+            if visited:
+                # This variable prevents infinite while loops.
+                wMainLoopSafety += 1
+                if wMainLoopSafety >= 1000:
+                    break
+
+# 2.12. The same crawler, but with many sites in flight at once.
+# The serial crawl waits for each site in turn - and sleeps for the crawl-delay even between requests to completely different hosts.
+# Here an asyncio event loop keeps up to max_in_flight attempts going at the same time, each on a different host. 'requests' is blocking,
+# so each attempt (Crawler.visit) runs in a worker thread while the event loop schedules the rest.
+# Only one attempt per host runs at a time, and the next attempt on a host waits until the crawl-delay of that host has passed (HostScheduler).
+class AsyncCrawler(Crawler):
+
+    # 2.12.1. Initialisation. The same 4 arguments as Crawler, plus the number of attempts to keep going at once.
+    def __init__(self, starting_site, num_to_visit, secured, no_goes, max_in_flight = 8):
+        super().__init__(starting_site, num_to_visit, secured, no_goes)
+        self.max_in_flight = max_in_flight                                      # Number of sites (each on a different host) attempted at the same time
+
+    # 2.12.2. Function that waits until the host of a target is due, then makes the attempt in a worker thread.
+    async def visit_when_due(self, target, root_url, executor):
+        """
+        Function to make one attempt, holding its host to the crawl-delay.
+        Inputs: target (str): url of the site.
+                root_url (str): root of the target, as given by getRootUrl. None for 'mailto' links etc.
+                executor (ThreadPoolExecutor): the worker threads that make the requests.
+        Output: visited (Bool): as returned by Crawler.visit.
+        """
+        loop = asyncio.get_running_loop()
+        # Wait here, rather than in a worker thread, until the host is due. No-go sites and repeats are never requested - so they never wait.
+        if self.makes_request(target, root_url):
+            wait = self.scheduler.wait_time(root_url)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                self.timing.add('wait', wait, root_url)
+        return await loop.run_in_executor(executor, self.visit, target)
+
+    # 2.12.3. The crawl itself.
+    async def crawl_async(self):
+        """
+        Function to crawl until num_to_visit sites have been visited, or we run out of sites to visit.
+        Sites on different hosts are attempted at the same time. Sites on the same host are attempted in order, one at a time.
+        Input: object of class AsyncCrawler.
+        Output: None. The results are in sites_dict and sites_visited.
+        """
+        # Which targets to start, and which wait for their host (crawler_scheduler.py). An attempt waits for its crawl-delay itself (visit_when_due).
+        dispatcher = HostDispatcher(self.sites_to_visit, self.lock, getRootUrl, self.makes_request, self.sites_visited, self.num_to_visit, self.max_in_flight)
 
-        return okContinue, int(tos_status)
+        with ThreadPoolExecutor(max_workers = self.max_in_flight) as executor:
+
+            def start(target, root_url):
+                return asyncio.ensure_future(self.visit_when_due(target, root_url, executor))
+
+            while True:
+                # 2.12.3.1. Start targets on hosts that are free, in the order they were added to sites_to_visit.
+                dispatcher.dispatch(start)
+                # 2.12.3.2. Nothing left in flight: either we have visited enough sites, or there is nothing left to visit.
+                if not dispatcher.in_flight:
+                    break
+                # 2.12.3.3. Wait for at least one attempt to finish. Its host is then free for the next target.
+                done, pending = await asyncio.wait(list(dispatcher.in_flight), return_when = asyncio.FIRST_COMPLETED)
+                dispatcher.finished(done)
+        print("Finished.")
+
+# 2.13. The same crawler, with the requests made by a pool of worker threads - no asyncio.
+# The serial crawl leaves the CPU idle while each request waits on the network. Here the main thread hands sites on different hosts to
+# fetch_workers threads (concurrent.futures), and waits for any of them to finish. Crawler.visit stores its results under self.lock,
+# so the threads can share sites_dict, sites_visited and sites_to_visit.
+# As with the AsyncCrawler, only one attempt per host runs at a time. A site is only handed to a thread once its host is due (HostScheduler) -
+# so no thread sits asleep through a crawl-delay while sites on other hosts are waiting.
+class ThreadedCrawler(Crawler):
+
+    # 2.13.1. Initialisation. The same 4 arguments as Crawler, plus the number of worker threads.
+    def __init__(self, starting_site, num_to_visit, secured, no_goes, fetch_workers = 8):
+        super().__init__(starting_site, num_to_visit, secured, no_goes)
+        self.fetch_workers = fetch_workers                                      # Number of sites (each on a different host) attempted at the same time
+
+    # 2.13.2. The crawl itself. Called in place of Crawler.crawl.
+    def crawl(self):
+        """
+        Function to crawl until num_to_visit sites have been visited, or we run out of sites to visit.
+        Sites on different hosts are attempted at the same time, by worker threads. Sites on the same host are attempted in order, one at a time.
+        Input: object of class ThreadedCrawler.
+        Output: None. The results are in sites_dict and sites_visited.
+        """
+        # Which targets to start, and which wait for their host (crawler_scheduler.py). A host is only handed to a thread once it is due.
+        dispatcher = HostDispatcher(self.sites_to_visit, self.lock, getRootUrl, self.makes_request, self.sites_visited, self.num_to_visit,
+                                    self.fetch_workers, scheduler = self.scheduler)
+
+        with ThreadPoolExecutor(max_workers = self.fetch_workers) as executor:
+
+            def start(target, root_url):
+                return executor.submit(self.visit, target)
+
+            while True:
+                # 2.13.2.1. Start targets on hosts that are free and due, in the order they were added to sites_to_visit.
+                dispatcher.dispatch(start)
+                # 2.13.2.2. Nothing in flight: either we are finished, or every target left is waiting for its host to be due.
+                timeout = dispatcher.next_due()
+                if not dispatcher.in_flight:
+                    if timeout is None or not dispatcher.can_start():
+                        break
+                    # Every host left is held up by its crawl-delay - a wait for the whole crawl, not for one host.
+                    # Not added to the 'wait' phase (crawler_timing.py): that is the time attempts spend waiting for their host, and this
+                    # sleep is not an attempt - counting it too would make the crawl-delays look longer than they are.
+                    time.sleep(timeout)
+                    continue
+                # 2.13.2.3. Wait for at least one attempt to finish (its host is then free), or for a waiting host to be due.
+                # If nothing more can be started anyway (every worker is busy), a host being due doesn't matter - only wait for an attempt.
+                if not dispatcher.can_start():
+                    timeout = None
+                done, pending = wait(list(dispatcher.in_flight), timeout = timeout, return_when = FIRST_COMPLETED)
+                dispatcher.finished(done)
+        print("Finished.")
 
 # 3. Setup for main script.
 # 3.1. Structure of dictionary in which we store site data.
 
 #-0-0--0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0--0-0-0-0-0-0--0-0-0-0-0-0-0-0-0-0-0
 #-0-0--0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0--0-0-0-0-0-0--0-0-0-0-0-0-0-0-0-0-0
-# Format for sites_dict:
+# Format for sites_dict: {attempt number: CrawlRecord} (crawler_records.py). Every attempt is made with the one constructor, CrawlRecord(url_index, url, ...).
+# The old dictionary keys still work as record.get(key) / record[key]:
 # {'url':(string),              - The url of this site, in string form.
-# 'links':(NoneType),           - The links from this site. Will be a list of strings.
+# 'links':(NoneType),           - The links from this site. Will be a tuple of strings.
 # 'status':(NoneType),          - The HTTP status code, 2xx, 3xx, 4xx, 5xx etc. Integers
+#                                 None, with every flag False, if a request failed (timeout, refused or reset connection) - see request_failed.
 # 'redirect':(NoneType),        - Whether or not we have been redirected. Bool, True if redirected
 # 'duration':(NoneType),        - Returns a float with the time, in seconds, elapsed between making and receiving request contents.
+# The rest are bits of record.flags:
 # 'robots':(Bool),              - Are we prohibited from crawling due to the /robots.txt file? True if prohibited
 # 'ToS':(Bool),                 - Are we prohibited from crawling due to the ToS? True if prohibited
 # 'Repeat':(Bool),              - Is this site a repeat of a previous one? True if so
@@ -692,274 +975,233 @@ class Crawler():
 #-0-0--0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0--0-0-0-0-0-0--0-0-0-0-0-0-0-0-0-0-0
 #-0-0--0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0-0--0-0-0-0-0-0--0-0-0-0-0-0-0-0-0-0-0
 
-# 3.2. Import modules: regExp, web requests, styling web content, exit and time (for delays)
-import re
-import requests
+# 3.2. Import modules: styling web content, exit, the robots cache/rules, the per-site scheduler, the queue of sites to visit, the shared web session, what we need to attempt several sites at once and writing the graph for other tools
 from bs4 import BeautifulSoup
 from sys import exit
-import time
 import random
-
-# 3.3. Ask user for inputs and check if they are appropriate.
-print("""\
+import argparse
+import asyncio
+import requests
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import time
+from crawler_robots import RobotsCache, RobotsEntry, RobotsMatcher
+from crawler_scheduler import HostScheduler, HostDispatcher
+from crawler_frontier import Frontier
+from crawler_seen import SeenUrlStore
+from crawler_http import make_session, body_bytes, DEFAULT_TIMEOUT
+from crawler_tos import ToSCache, ToSVerdict
+from crawler_policy import CrawlPolicy, load_policy, ROBOTS, TOS
+from crawler_links import iter_links, ParsePool
+from crawler_timing import PhaseTimer, StatsPrinter
+from crawler_metrics import MetricsServer, MetricsFile
+from crawler_urls import UrlCanonicalizer, UrlIndex, UrlIdSet
+import crawler_checkpoint
+from crawler_checkpoint import CrawlCheckpoint
+from crawler_records import RecordLog, CrawlRecord
+from crawler_export import export_graph, EXPORT_FORMATS
+
+if __name__ == '__main__':
+    # 3.3. Options from the command line. The crawl itself is still set up by answering the questions below.
+    parser = argparse.ArgumentParser(description = 'Crawl a small portion of the web to develop a network representation.')
+    parser.add_argument('--engine', choices = ['serial', 'async', 'threads'], default = 'serial',
+                        help = "'serial' (default) attempts one site at a time. 'async' attempts sites on different hosts at the same time, from an asyncio event loop. 'threads' does the same with a pool of worker threads (no asyncio).")
+    parser.add_argument('--max-in-flight', type = int, default = 8,
+                        help = 'With --engine async: the number of sites, each on a different host, attempted at the same time.')
+    parser.add_argument('--fetch-workers', type = int, default = 8,
+                        help = 'With --engine threads: the number of worker threads - each attempts sites on a different host.')
+    parser.add_argument('--parse-workers', type = int, default = 0,
+                        help = 'With --engine async or threads: number of processes to find the links of pages in, so that parsing uses more than one core. Each fetch worker still waits for its own page to be parsed. 0 (default) finds them in the thread that fetched the page, as it downloads.')
+    parser.add_argument('--stats-every', type = float, default = 0, metavar = 'SECONDS',
+                        help = 'Print a line of progress, and of where the time has gone (waiting for crawl-delays, requests, parsing, ...), every SECONDS. 0 (default) for none. A full table is printed when the crawl ends either way.')
+    parser.add_argument('--metrics-port', type = int, default = None, metavar = 'PORT',
+                        help = 'Serve live numbers of the crawl (pages fetched, bytes, frontier size, status codes, cache hit rates, time in each phase) for Prometheus at http://ADDRESS:PORT/metrics. See crawler_metrics.py.')
+    parser.add_argument('--metrics-address', default = '127.0.0.1',
+                        help = 'With --metrics-port: the address to listen on. By default, only this machine can connect.')
+    parser.add_argument('--metrics-file', default = None, metavar = 'FILE',
+                        help = "Write the same numbers to FILE every --metrics-every seconds instead (eg for node_exporter's textfile collector).")
+    parser.add_argument('--metrics-every', type = float, default = 15,
+                        help = 'With --metrics-file: seconds between writes.')
+    parser.add_argument('--seen-store', choices = ['set', 'bloom'], default = 'set',
+                        help = "Where to remember every url found. 'set' (default) keeps them all in memory. 'bloom' keeps a Bloom filter in memory and hashed urls on disk (see crawler_seen.py) - for very large crawls.")
+    parser.add_argument('--seen-file', default = 'seen_urls.sqlite',
+                        help = 'With --seen-store bloom: the sqlite file for the hashed urls. It is emptied at the start of the crawl.')
+    parser.add_argument('--seen-error-rate', type = float, default = 0.001,
+                        help = 'With --seen-store bloom: false-positive rate of the Bloom filter. A false positive only costs one lookup on disk.')
+    parser.add_argument('--connect-timeout', type = float, default = DEFAULT_TIMEOUT[0],
+                        help = 'Seconds to wait for a connection to a site to be made.')
+    parser.add_argument('--read-timeout', type = float, default = DEFAULT_TIMEOUT[1],
+                        help = 'Seconds to wait for a site to send something, once connected.')
+    parser.add_argument('--tos-cache', default = None,
+                        help = 'JSON file to keep the ToS verdict of each site in. Sites already in the file are not asked about again. Saved when the crawl ends.')
+    parser.add_argument('--policy', default = None,
+                        help = 'JSON file of allow/deny lists, keyword rules and a default verdict that answer the robots/ToS questions without asking (see crawler_policy.py). With "default": "Y" or "N", the crawl never waits for an answer.')
+    parser.add_argument('--sort-query', action = 'store_true',
+                        help = "Sort the parameters of each url's query, so that '?b=2&a=1' and '?a=1&b=2' count as the same page.")
+    parser.add_argument('--checkpoint', default = None, metavar = 'DIR',
+                        help = 'Folder to append a checkpoint of the crawl to as it goes (every attempt, visit and new link), so it can be resumed.')
+    parser.add_argument('--resume', default = None, metavar = 'DIR',
+                        help = 'Carry on with the crawl checkpointed in this folder, from where it stopped. No questions are asked - the settings come from the checkpoint.')
+    parser.add_argument('--records', default = None, metavar = 'FILE',
+                        help = "File to keep the record of every attempt (sites_dict) in, rather than memory - eg crawl_records.jsonl. Written again on each run. Without it, the records are kept in memory. With --checkpoint/--resume, the checkpoint folder is used instead.")
+    parser.add_argument('--export', nargs = '+', choices = EXPORT_FORMATS, default = [], metavar = 'FORMAT',
+                        help = "Write the graph of the crawl, when it ends, in these formats: 'graphml', 'csv' (edge list), 'parquet' (edge list - needs pyarrow) and/or 'npz' (SciPy sparse adjacency matrix). See crawler_export.py.")
+    parser.add_argument('--export-prefix', default = 'crawl_graph',
+                        help = "Start of the names of the exported files: eg 'crawl_graph.csv', and the url of each node id in 'crawl_graph.urls.jsonl'.")
+    # 3.3.1. Options for drawing the graph.
+    parser.add_argument('--layout', choices = ['auto', 'dot', 'sfdp', 'force'], default = 'auto',
+                        help = "How to lay the graph out. 'auto' (default) uses Graphviz 'dot' for small graphs and 'sfdp' for big ones. 'force' is a force-directed layout in NumPy that doesn't need Graphviz.")
+    parser.add_argument('--aggregate-leaves', action = 'store_true',
+                        help = 'Merge the links that were not visited into one node per domain.')
+    parser.add_argument('--max-draw-nodes', type = int, default = 100000,
+                        help = 'Graphs with more nodes than this are not drawn. Their edges are written to a .tsv file beside --graph-file instead.')
+    parser.add_argument('--graph-file', default = 'myGraph.svg',
+                        help = 'SVG file to draw the graph to.')
+    args = parser.parse_args()
+    # With one site attempted at a time, the fetching thread would only wait for a worker process to parse its page - the same work, plus the cost of sending it there.
+    if args.parse_workers > 0 and args.engine == 'serial':
+        exit("--parse-workers only helps with --engine async or threads, which fetch several pages while others are parsed.")
+
+    # 3.4. Ask user for inputs and check if they are appropriate. A resumed crawl (--resume) uses the answers stored in its checkpoint instead.
+    url_canonicalizer = UrlCanonicalizer(sort_query = args.sort_query)
+    if args.resume is not None:
+        resume_settings = crawler_checkpoint.read_settings(args.resume) if crawler_checkpoint.has_checkpoint(args.resume) else None
+        if resume_settings is None:
+            exit("There is no checkpoint to resume in " + args.resume)
+        start_site_string = resume_settings['starting_site']
+        steps_number = resume_settings['num_to_visit']
+        secured_bool = resume_settings['secured']
+        no_go_list = resume_settings['no_goes']
+        propAnswerFinal = resume_settings['proportion_answer']
+    else:
+        print("""\
 This script aims to crawl a small portion of the web to develop a network representation.
 This is so that mathematical techniques can be used to analyse network structure.
 You now need to give some inputs: """)
-# 3.3.1. Ask for seed site, sites you want to avoid, https issues, how many to visit,
-start_site = input("Type the website you wish to start from: ")
-avoid_sites = input("Are there any sites you wish to avoid? Type them here, separated by a pipe (|). All sites in those domains won't be visited, so just type in the root and all sites beneath it will be avoided: ")
-steps = input("How many sites would you like to visit. These are the sites we will actually go to: ")
-secured = input("Enter 'True' if you would like to include sites that are not secured (http). Enter 'False' if not: ")
-proportion_answer = input("Enter '1' if we should visit all links from sites. Otherwise, we will only visit a percentage (sigmoid curve). 1/0?: ")
-
-# 3.3.2. Store all from inputs
-# Note: URLs trailing with a '/' generally means that the page is a directory. That means that other pages will be beneath it.
-# However we will store all URLs in the same format - with no trailing '/'. This makes checking visited sites easier.
-# The distinction between directories and pages will be made later.
-try:
-    start_site_string = str(start_site)
-    # As a rule, strip all trailing '/'
-    if start_site_string.endswith('/'):
-        start_site_string = start_site_string[:-1]
-except:
-    exit("Error while handling starting website string")
-
-try:
-    steps_number = int(steps)
-except ValueError:
-    exit("Error while handling the number of steps. Please enter an integer")
-except:
-    exit("Error while handling the number of steps.")
-
-# Whether or not we will visit unsecured webpages.
-if 'True' in secured:
-    secured_bool = True
-else:
-    secured_bool = False
-
-try:
-    no_go_list = avoid_sites.split('|')
-    # Stripping trailing '/'
-    for k in range(0,len(no_go_list)):
-        if no_go_list[k].endswith('/'):
-            no_go_list[k] = (no_go_list[k])[:-1]
-except:
-    exit("Error when splitting the 'no-go' sites")
-
-try:
-    propAnswerFinal = int(proportion_answer)
-except:
-    exit("Error when interpreting percentage of sites to visit.")
-
-# 3.3.3. Create object
-myCrawler = Crawler(start_site_string, steps_number, secured_bool, no_go_list)
-
-###------------------------------- LOOP START -------------------------------###
-# 4. Main script
-wMainLoopSafety = 0
-while len(myCrawler.sites_visited) < myCrawler.num_to_visit:
-    # 4.1. Reset the delay
-    myCrawler.crawl_delay = 15
-    # 4.2. Take a starting website
-    try:
-        myCrawler.current_target = myCrawler.sites_to_visit.pop(0)
-    except IndexError:
-        exit("Finished.")
-    # 4.3. Check if we WANT to visit it. (if not, we can record it as an ending stub in the diagram)
-    # What shall we exclude? (1) Sites we just don't want to visit, (2) 'mailto' or 'ftp' schemes, (3) None sites or (4) # sites (seen on https://www.riotgames.com, for example.)
-    # This bit excludes (1) sites we just don't want to visit:
-    skip = False
-    for preventIterator in range(0, len(myCrawler.no_goes)):                # All elements in a list
-        if myCrawler.current_target.startswith(myCrawler.no_goes[preventIterator]):
-            skip = True
-
-    # If we don't want to visit the site, record it in the dictionary and set 'nogo': True. Then move onto the next site.
-    if skip or 'mailto' in myCrawler.current_target or 'ftp' in myCrawler.current_target or myCrawler.current_target is None or myCrawler.current_target.startswith('#'):
-        myCrawler.counter_attempts += 1
-        myCrawler.sites_dict.update({myCrawler.counter_attempts:{'url':myCrawler.current_target,
-                                                                 'links':None,
-                                                                 'status':None,
-                                                                 'redirect':None,
-                                                                 'duration':None,
-                                                                 'robots':False,
-                                                                 'ToS':False,
-                                                                 'Repeat':False,
-                                                                 'nogo':True,
-                                                                 'weird_url':False}})
-        # Skip the rest of this code and move onto the next iteration of the loop.
-        time.sleep(myCrawler.crawl_delay)
-        continue
-
-    # 4.4. Check if we have already visited it. This is why it is important to have links stored consistently. A trailing slash could prevent a desired match.
-    # If we already visited, skip and set 'Repeat':True
-    if myCrawler.current_target in myCrawler.sites_visited:
-        myCrawler.counter_attempts += 1
-        myCrawler.sites_dict.update({myCrawler.counter_attempts:{'url':myCrawler.current_target,
-                                                                 'links':None,
-                                                                 'status':None,
-                                                                 'redirect':None,
-                                                                 'duration':None,
-                                                                 'robots':False,
-                                                                 'ToS':False,
-                                                                 'Repeat':True,
-                                                                 'nogo':False,
-                                                                 'weird_url':False}})
-        # Skip the rest of this code and move onto the next iteration of the loop.
-        time.sleep(myCrawler.crawl_delay)
-        continue
-
-    # 4.5. Check if we are PERMITTED to visit it (robots file)
-    # Returns a bool TRUE if we can crawl. Also get the status of the Robots file (though we aren't currently using that)
-    m_crawlable, robot_status = myCrawler.robots_check()
-     # If we are prevented from crawling by Robots file, move onto the next and set 'robots':True.
-    if not m_crawlable:
-        myCrawler.counter_attempts += 1
-        myCrawler.sites_dict.update({myCrawler.counter_attempts:{'url':myCrawler.current_target,
-                                                                 'links':None,
-                                                                 'status':None,
-                                                                 'redirect':None,
-                                                                 'duration':None,
-                                                                 'robots':True,
-                                                                 'ToS':False,
-                                                                 'Repeat':False,
-                                                                 'nogo':False,
-                                                                 'weird_url':False}})
-        # Skip the rest of this code and move onto the next iteration of the loop.
-        time.sleep(myCrawler.crawl_delay)
-        continue
-
-    # 4.6. Check if the TERMS allow us to access the desired site
-    # Since we are not completely probited from crawling, it stands to reason that we can visit the Homepage -> T&C's to check homepage.
-    # We get ToS_outcome: bool on whether we can crawl. Also get tos_code for either homepage or ToS page.
-    ToS_outcome, tos_code = myCrawler.ToS_check()
-    # Only occurs if we didn't access ToS page.
-    if tos_code == 0:
-        print('No ToS page found. Going ahead with crawl...')
-    # If ToS prohibits us, add URL to dict and set ToS:True.
-    if ToS_outcome != 'Y':
-        myCrawler.counter_attempts += 1
-        myCrawler.sites_dict.update({myCrawler.counter_attempts:{'url':myCrawler.current_target,
-                                                                 'links':None,
-                                                                 'status':None,
-                                                                 'redirect':None,
-                                                                 'duration':None,
-                                                                 'robots':False,
-                                                                 'ToS':True,
-                                                                 'Repeat':False,
-                                                                 'nogo':False,
-                                                                 'weird_url':False}})
-         # Skip the rest of this code and move onto the next iteration of the loop.
-        time.sleep(myCrawler.crawl_delay)
-        continue
-
-    # 4.7. Now we know that we can visit the site.
-    main_link_list = []
-    # Wait again:
-    time.sleep(myCrawler.crawl_delay)
-    #### Visit the desired site and extract content
-    main_siteContentStuff = requests.get(myCrawler.current_target, headers = myCrawler.cusHeaders)
-    # For getAbsUrl function.
-    actual_url_main = main_siteContentStuff.url
-    main_code = getSiteStatus(main_siteContentStuff, myCrawler)
-    # If we are not able to properly access the site, set 'status' to our code and move on.
-    if main_code[0] != '2':
-        myCrawler.counter_attempts += 1
-        myCrawler.sites_dict.update({myCrawler.counter_attempts:{'url':myCrawler.current_target,
-                                                                 'links':None,
-                                                                 'status':int(main_code),
-                                                                 'redirect':None,
-                                                                 'duration':None,
-                                                                 'robots':False,
-                                                                 'ToS':False,
-                                                                 'Repeat':False,
-                                                                 'nogo':False,
-                                                                 'weird_url':False}})
-        # Close this here because we will not reach the close statement properly.
-        main_siteContentStuff.close()
-        time.sleep(myCrawler.crawl_delay)
-        continue
-
-    main_soup = BeautifulSoup(main_siteContentStuff.text, 'lxml')
-
-    # 4.8. Get links from page.
-    # Get root url
-    url_split_list = myCrawler.current_target.split('//',1)                     # Should give smth like ['https:','www.abcd.com/1/2/3/4...']
-    domain_split_list = url_split_list[1].split('/',1)                          # Should give smth like ['www.abcd.com','1/2/3/4...']
-    root_url = url_split_list[0] + '//' + domain_split_list[0]                  # Gives 'https://www.abcd.com'
-
-    # For all links, get their absolute form. Then strip trailing '/' for uniformity. Then add to our store.
-    for main_link in main_soup.find_all('a'):
-        # links have lots of attributes. 'href' has the URL.
-        link_to_add = main_link.get('href')
-        # Get the absolute form of that link. Include the true form of the URL of current page - so we know if we are on a directory or not.
-        link_to_add_NOW = getAbsUrl(link_to_add, url_split_list, root_url, actual_url_main)
-        # Strip trailing '/'
+        # 3.4.1. Ask for seed site, sites you want to avoid, https issues, how many to visit,
+        start_site = input("Type the website you wish to start from: ")
+        avoid_sites = input("Are there any sites you wish to avoid? Type them here, separated by a pipe (|). All sites in those domains won't be visited, so just type in the root and all sites beneath it will be avoided: ")
+        steps = input("How many sites would you like to visit. These are the sites we will actually go to: ")
+        secured = input("Enter 'True' if you would like to include sites that are not secured (http). Enter 'False' if not: ")
+        proportion_answer = input("Enter '1' if we should visit all links from sites. Otherwise, we will only visit a percentage (sigmoid curve). 1/0?: ")
+
+        # 3.4.2. Store all from inputs
+        # Note: URLs trailing with a '/' generally means that the page is a directory. That means that other pages will be beneath it.
+        # However we will store all URLs in the same format - with no trailing '/'. This makes checking visited sites easier.
+        # The distinction between directories and pages will be made later.
         try:
-            if link_to_add_NOW.endswith('/'):
-                link_to_add_NOW = link_to_add_NOW[:-1]
-        except AttributeError:
-            pass                                                                # If it's NoneType, [:-1] won't work
-
-        main_link_list.append(link_to_add_NOW)
-    # Now every link that is added will have a full, absolute web address.
-
-    # 4.9. Now double-check that the url we have reached is the same as our target:
-    # An issue is that, because we have stripped the trailing slash, there is a good chance that these will not be equal.
-    # Therefore test against both the current_target and one with an appended '/'
-    weird_urlVal = False
-    if main_siteContentStuff.url.endswith('/'):
-        if main_siteContentStuff.url != myCrawler.current_target + '/':
-            weird_urlVal = True
-    else:
-        if main_siteContentStuff.url != myCrawler.current_target:
-            weird_urlVal = True
-        # This means a strange redirect has occured, may not have been picked up by status_code. https://www.riotgames.com had an example of this.
-
-    # 4.10. Store the information:
-    myCrawler.counter_attempts += 1
-    myCrawler.sites_dict.update({myCrawler.counter_attempts:{'url':myCrawler.current_target,
-                                                             'links':main_link_list,
-                                                             'status':main_siteContentStuff.status_code,
-                                                             'redirect':main_siteContentStuff.is_redirect,
-                                                             'duration':(main_siteContentStuff.elapsed).total_seconds(),
-                                                             'robots':False,
-                                                             'ToS':False,
-                                                             'Repeat':False,
-                                                             'nogo':False,
-                                                             'weird_url':weird_urlVal}})
-
-# 4.11. Close connection with site (done for each as soon as we are done with the command - so that connxn is open for minimum time)
-    main_siteContentStuff.close()
-
-# 4.11.5. Decide on a percentage of links to add to the final store.
-    # We use random.sample() to sample without replacement.
-    if len(main_link_list) <= 10 or propAnswerFinal == 1:
-        proportionToAdd = main_link_list
-
-    elif len(main_link_list) in range(11,400):
-        # Here use 10 links plus 10 percent of the number of links we have.
-        num_fraction = round(len(main_link_list)/10) + 10
-        proportionToAdd = random.sample(main_link_list, num_fraction)
-
-    else:
-        proportionToAdd = random.sample(main_link_list, 50)
-
-
-
-# 4.12. Add links to the sites we have left to visit and add our current site to visited_sites list.
-    myCrawler.sites_to_visit.extend(proportionToAdd)
-    myCrawler.sites_visited.append(myCrawler.current_target)
+            # The same canonical form as every link found later (crawler_urls.py): lower-case host, no default port, no fragment - and, as a rule, no trailing '/'
+            start_site_string = url_canonicalizer.canonical(str(start_site).strip())
+            if start_site_string.endswith('/'):
+                start_site_string = start_site_string[:-1]
+        except:
+            exit("Error while handling starting website string")
 
-# 4.13. Wait again - otherwise there might not be sufficient time between a request to the TARGET and to the next robots page
-    time.sleep(myCrawler.crawl_delay)
-#### 4.14. Delete excess content. Most variables in functions shall be automatically cleared as we leave scope.
-    del main_link_list, main_siteContentStuff, main_soup
-    # This variable prevents infinite while loops.
-    wMainLoopSafety += 1
-    if wMainLoopSafety >= 1000:
-        break
+        try:
+            steps_number = int(steps)
+        except ValueError:
+            exit("Error while handling the number of steps. Please enter an integer")
+        except:
+            exit("Error while handling the number of steps.")
+
+        # Whether or not we will visit unsecured webpages.
+        if 'True' in secured:
+            secured_bool = True
+        else:
+            secured_bool = False
 
-###------------------------------- LOOP END -------------------------------###
+        try:
+            # Canonical form too, so that they match the start of the links found. Empty entries are dropped - every url starts with ''.
+            no_go_list = [url_canonicalizer.canonical(no_go.strip()) for no_go in avoid_sites.split('|') if no_go.strip() != '']
+            # Stripping trailing '/'
+            for k in range(0,len(no_go_list)):
+                if no_go_list[k].endswith('/'):
+                    no_go_list[k] = (no_go_list[k])[:-1]
+        except:
+            exit("Error when splitting the 'no-go' sites")
 
-print("Now that crawling is done, proceed to draw the graph...")
-crawler2networkx(myCrawler)
+        try:
+            propAnswerFinal = int(proportion_answer)
+        except:
+            exit("Error when interpreting percentage of sites to visit.")
+
+    # 3.4.3. Create object
+    if args.engine == 'async':
+        myCrawler = AsyncCrawler(start_site_string, steps_number, secured_bool, no_go_list, max_in_flight = args.max_in_flight)
+    elif args.engine == 'threads':
+        myCrawler = ThreadedCrawler(start_site_string, steps_number, secured_bool, no_go_list, fetch_workers = args.fetch_workers)
+    else:
+        myCrawler = Crawler(start_site_string, steps_number, secured_bool, no_go_list)
+    myCrawler.proportion_answer = propAnswerFinal
+    myCrawler.urls = url_canonicalizer
+    myCrawler.timeout = (args.connect_timeout, args.read_timeout)
+    if args.tos_cache is not None:
+        myCrawler.tos_cache = ToSCache(args.tos_cache)
+    if args.policy is not None:
+        myCrawler.policy = load_policy(args.policy)
+    if args.parse_workers > 0:
+        myCrawler.parse_pool = ParsePool(args.parse_workers)
+    if args.seen_store == 'bloom':
+        seen_store = SeenUrlStore(args.seen_file, error_rate = args.seen_error_rate, keep_existing = False)
+        myCrawler.sites_to_visit = Frontier([start_site_string], seen = seen_store)
+    # Checkpoints (crawler_checkpoint.py). A resumed crawl is rebuilt from its checkpoint, then carries on appending to it.
+    if args.resume is not None:
+        crawler_checkpoint.restore(myCrawler, CrawlCheckpoint(args.resume))
+        print("Resuming: %d sites visited, %d attempts, %d sites left to visit." % (len(myCrawler.sites_visited), myCrawler.counter_attempts, len(myCrawler.sites_to_visit)))
+    elif args.checkpoint is not None:
+        if crawler_checkpoint.has_checkpoint(args.checkpoint):
+            exit("There is already a checkpoint in " + args.checkpoint + ". Use --resume to carry on with it.")
+        CrawlCheckpoint(args.checkpoint).attach(myCrawler)
+        myCrawler.checkpoint.start(start_site_string, steps_number, secured_bool, no_go_list, propAnswerFinal)
+        myCrawler.checkpoint.enqueue([start_site_string])
+    elif args.records is not None:
+        # Not checkpointed, but the records of attempts are still kept on disk rather than in memory.
+        myCrawler.sites_dict = RecordLog(args.records)
+
+    ###------------------------------- CRAWL -------------------------------###
+    # 4. Main script. The loop itself is Crawler.crawl (one site at a time), or AsyncCrawler.crawl_async / ThreadedCrawler.crawl (sites on different hosts at the same time).
+    # The clock of the timing report starts here - not while the questions above were being answered.
+    myCrawler.timing = PhaseTimer()
+    if args.stats_every > 0:
+        stats_printer = StatsPrinter(myCrawler.timing, args.stats_every, lambda: (myCrawler.counter_attempts, len(myCrawler.sites_visited)))
+        stats_printer.start()
+    # Metrics for monitoring (crawler_metrics.py) - read from the crawler whenever they are asked for.
+    if args.metrics_port is not None:
+        metrics_server = MetricsServer(myCrawler, args.metrics_port, args.metrics_address)
+        print("Metrics at http://%s:%d/metrics" % (args.metrics_address, metrics_server.port))
+    if args.metrics_file is not None:
+        metrics_file = MetricsFile(myCrawler, args.metrics_file, args.metrics_every)
+        metrics_file.start()
+    # Whatever stops the crawl (the end, an error, Ctrl-C), the threads are stopped and the files it writes are closed - so the records of the attempts
+    # made so far are all on disk, and can be read back.
+    try:
+        if args.engine == 'async':
+            asyncio.run(myCrawler.crawl_async())
+        else:
+            myCrawler.crawl()
+    finally:
+        if args.stats_every > 0:
+            stats_printer.stop()
+        if args.metrics_port is not None:
+            metrics_server.close()
+        if args.metrics_file is not None:
+            metrics_file.stop()
+        # Where the time went (crawler_timing.py).
+        print(myCrawler.timing.report())
+        if myCrawler.parse_pool is not None:
+            myCrawler.parse_pool.close()
+        if args.seen_store == 'bloom':
+            seen_store.close()
+        # No more records are added. They can still be read - for the export and the graph below.
+        if myCrawler.checkpoint is not None:
+            myCrawler.checkpoint.close()
+        elif args.records is not None:
+            myCrawler.sites_dict.close()
+        myCrawler.tos_cache.save()
+    # Write the graph of the crawl for other tools (crawler_export.py) - straight from sites_dict, without building a networkx graph.
+    if args.export:
+        export_graph(myCrawler.sites_dict, args.export_prefix, args.export, myCrawler.url_index)
+
+    print("Now that crawling is done, proceed to draw the graph...")
+    crawler2networkx(myCrawler, layout = args.layout, aggregate = args.aggregate_leaves, max_draw_nodes = args.max_draw_nodes, path = args.graph_file)
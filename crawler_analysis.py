@@ -0,0 +1,233 @@
+# Network measures of the graph of a crawl (the reason for the crawler - see Newman's 'Networks' in the README).
+# Works on the adjacency matrix written by crawler_export.py ('--export npz'): A[i, j] = weight of the link from url i to url j.
+# Everything is done with whole-array NumPy/SciPy operations on the sparse matrix - there is no loop in Python over the nodes, so crawls
+# of millions of nodes take seconds. networkx is never used.
+#   degree distributions    - in/out degree of every node, how many nodes have each degree, and the power-law exponent of the tail
+#   PageRank                - power iteration, with the rank of pages without links (most of a crawl) shared out evenly
+#   HITS                    - hub and authority scores, power iteration
+#   bow-tie                 - strongly connected components, and where each node sits relative to the largest one (Broder et al. 2000)
+# Run it on an export:   python crawler_analysis.py crawl_graph.npz --urls crawl_graph.urls.jsonl
+
+import argparse
+
+import numpy as np
+import scipy.sparse
+from scipy.sparse import csgraph
+
+# Bow-tie regions, as stored in the array bow_tie() returns.
+CORE = 0                                                                    # The largest strongly connected component
+IN = 1                                                                      # Can reach the core, but can't be reached from it
+OUT = 2                                                                     # Can be reached from the core, but can't reach it
+TUBES = 3                                                                   # Reached from IN and reaching OUT, without going through the core
+TENDRILS = 4                                                                # Reached from IN, or reaching OUT - but not both
+DISCONNECTED = 5                                                            # None of the above
+REGIONS = ('core', 'in', 'out', 'tubes', 'tendrils', 'disconnected')
+
+# 1. Degrees.
+def degrees(matrix, weighted=False):
+    """
+    Function to get the in and out degree of every node.
+    Inputs: matrix (scipy.sparse matrix): adjacency matrix, A[i, j] for the link i -> j.
+            weighted (Bool): True to add up the weights of the links (the number of times each appears) rather than count them.
+    Outputs: in_degree (numpy array), out_degree (numpy array)
+    """
+    matrix = scipy.sparse.csr_matrix(matrix)
+    if weighted:
+        return np.asarray(matrix.sum(axis = 0)).ravel(), np.asarray(matrix.sum(axis = 1)).ravel()
+    num_nodes = matrix.shape[0]
+    return np.bincount(matrix.indices, minlength = num_nodes), np.diff(matrix.indptr)
+
+def degree_distribution(degree):
+    """
+    Function to count the nodes with each degree.
+    Input: degree (numpy array of int)
+    Output: counts (numpy array): counts[k] is the number of nodes with degree k.
+    """
+    return np.bincount(np.asarray(degree, dtype = np.int64))
+
+def power_law_exponent(degree, k_min=1):
+    """
+    Function to estimate the exponent alpha of a power-law tail, p(k) ~ k^-alpha for k >= k_min. Maximum likelihood estimate for
+    integer degrees (Newman, 'Networks', 2nd Ed, section 10.4): alpha = 1 + n / sum(ln(k / (k_min - 1/2))).
+    Inputs: degree (numpy array)
+            k_min (int): the smallest degree in the tail.
+    Output: alpha (float). nan if no node has a degree of k_min or more.
+    """
+    tail = np.asarray(degree, dtype = float)
+    tail = tail[tail >= k_min]
+    if len(tail) == 0:
+        return float('nan')
+    return float(1.0 + len(tail) / np.log(tail / (k_min - 0.5)).sum())
+
+# 2. PageRank.
+def transition_matrix(matrix, weighted=False):
+    # Each row divided by its total, so row i gives the chance of following each link out of i. Rows of nodes without links stay empty.
+    matrix = scipy.sparse.csr_matrix(matrix, dtype = float)
+    if not weighted:
+        matrix = matrix.copy()
+        matrix.data[:] = 1.0
+    out_total = np.asarray(matrix.sum(axis = 1)).ravel()
+    scale = np.divide(1.0, out_total, out = np.zeros_like(out_total), where = out_total > 0)
+    return scipy.sparse.diags(scale) @ matrix, out_total == 0
+
+def pagerank(matrix, damping=0.85, weighted=False, tol=1e-10, max_iterations=200):
+    """
+    Function to get the PageRank of every node, by power iteration. A random surfer follows a link with chance 'damping', and otherwise
+    jumps to any node. Nodes without links out (most of a crawl - every link that wasn't visited) share their rank out evenly.
+    Inputs: matrix (scipy.sparse matrix): adjacency matrix.
+            damping (float)
+            weighted (Bool): True to follow links in proportion to the number of times they appear on the page.
+            tol (float): stop when the ranks change by less than this in total.
+            max_iterations (int)
+    Output: rank (numpy array): adds up to 1.
+    """
+    num_nodes = matrix.shape[0]
+    if num_nodes == 0:
+        return np.zeros(0)
+    transition, dangling = transition_matrix(matrix, weighted)
+    transition_t = transition.T.tocsr()
+    rank = np.full(num_nodes, 1.0 / num_nodes)
+    for iteration in range(max_iterations):
+        new_rank = damping * (transition_t @ rank)
+        new_rank += (damping * rank[dangling].sum() + 1.0 - damping) / num_nodes
+        change = np.abs(new_rank - rank).sum()
+        rank = new_rank
+        if change < tol:
+            break
+    return rank / rank.sum()
+
+# 3. HITS. A good hub links to good authorities; a good authority is linked to by good hubs.
+def hits(matrix, tol=1e-10, max_iterations=200):
+    """
+    Function to get the hub and authority scores of every node, by power iteration: authority = A^T hub, hub = A authority.
+    Inputs: matrix (scipy.sparse matrix): adjacency matrix. Only whether a link exists counts, not its weight.
+            tol (float), max_iterations (int): as for pagerank.
+    Outputs: hubs (numpy array), authorities (numpy array): each adds up to 1.
+    """
+    matrix = scipy.sparse.csr_matrix(matrix, dtype = float, copy = True)
+    matrix.data[:] = 1.0
+    matrix_t = matrix.T.tocsr()
+    num_nodes = matrix.shape[0]
+    hubs = np.full(num_nodes, 1.0 / max(num_nodes, 1))
+    authorities = hubs
+    for iteration in range(max_iterations):
+        authorities = matrix_t @ hubs
+        authorities /= max(authorities.sum(), 1e-300)
+        new_hubs = matrix @ authorities
+        new_hubs /= max(new_hubs.sum(), 1e-300)
+        change = np.abs(new_hubs - hubs).sum()
+        hubs = new_hubs
+        if change < tol:
+            break
+    return hubs, authorities
+
+# 4. Components and the bow-tie.
+def reachable(matrix, sources):
+    """
+    Function to find every node that can be reached from any of the sources, by one breadth-first search (in C, via csgraph).
+    A new node with a link to every source is added, and the search starts from it.
+    Inputs: matrix (scipy.sparse matrix): adjacency matrix.
+            sources (numpy array of bool): True for the sources.
+    Output: numpy array of bool: True for every node reached (including the sources).
+    """
+    num_nodes = matrix.shape[0]
+    found = np.zeros(num_nodes, dtype = bool)
+    if not sources.any():
+        return found
+    start_row = scipy.sparse.csr_matrix((np.ones(sources.sum()), (np.zeros(sources.sum(), dtype = np.int64), np.nonzero(sources)[0])),
+                                        shape = (1, num_nodes))
+    augmented = scipy.sparse.vstack([scipy.sparse.hstack([matrix, scipy.sparse.csr_matrix((num_nodes, 1))]),
+                                     scipy.sparse.hstack([start_row, scipy.sparse.csr_matrix((1, 1))])]).tocsr()
+    order = csgraph.breadth_first_order(augmented, num_nodes, directed = True, return_predecessors = False)
+    found[order[order < num_nodes]] = True
+    return found
+
+def strongly_connected_components(matrix):
+    """
+    Function to label the strongly connected components.
+    Input: matrix (scipy.sparse matrix)
+    Outputs: num_components (int)
+             labels (numpy array): the component of each node.
+    """
+    return csgraph.connected_components(matrix, directed = True, connection = 'strong')
+
+def bow_tie(matrix):
+    """
+    Function to put every node in a region of the bow-tie: CORE, IN, OUT, TUBES, TENDRILS or DISCONNECTED (see the top of this file).
+    Input: matrix (scipy.sparse matrix): adjacency matrix.
+    Output: region (numpy array of int8): the region of each node.
+    """
+    matrix = scipy.sparse.csr_matrix(matrix)
+    num_nodes = matrix.shape[0]
+    region = np.full(num_nodes, DISCONNECTED, dtype = np.int8)
+    if num_nodes == 0:
+        return region
+    num_components, labels = strongly_connected_components(matrix)
+    core = labels == np.argmax(np.bincount(labels))
+    transpose = matrix.T.tocsr()
+    # OUT: reached from the core. IN: reach the core (reached from it, following links backwards).
+    out_part = reachable(matrix, core) & ~core
+    in_part = reachable(transpose, core) & ~core
+    rest = ~(core | out_part | in_part)
+    from_in = reachable(matrix, in_part) & rest
+    to_out = reachable(transpose, out_part) & rest
+    region[core] = CORE
+    region[in_part] = IN
+    region[out_part] = OUT
+    region[from_in & to_out] = TUBES
+    region[from_in ^ to_out] = TENDRILS
+    return region
+
+# 5. A summary of all of the above.
+def analyse(matrix, urls=None, top=10, damping=0.85):
+    """
+    Function to compute every measure and gather a summary.
+    Inputs: matrix (scipy.sparse matrix): adjacency matrix.
+            urls (list): urls[i] is the url of node i (crawler_export.read_url_index). None to show ids.
+            top (int): how many of the best nodes to list for each score.
+            damping (float): for PageRank.
+    Output: summary (dict)
+    """
+    matrix = scipy.sparse.csr_matrix(matrix)
+    name = (lambda i: urls[i]) if urls is not None else (lambda i: int(i))
+    best = lambda scores: [(name(i), float(scores[i])) for i in np.argsort(-scores, kind = 'stable')[:top]]
+    in_degree, out_degree = degrees(matrix)
+    rank = pagerank(matrix, damping = damping)
+    hubs, authorities = hits(matrix)
+    num_components, labels = strongly_connected_components(matrix)
+    regions = np.bincount(bow_tie(matrix), minlength = len(REGIONS))
+    return {'nodes': matrix.shape[0],
+            'edges': int(matrix.nnz),
+            'in_degree': {'mean': float(in_degree.mean()) if len(in_degree) else 0.0, 'max': int(in_degree.max(initial = 0)),
+                          'alpha': power_law_exponent(in_degree)},
+            'out_degree': {'mean': float(out_degree.mean()) if len(out_degree) else 0.0, 'max': int(out_degree.max(initial = 0)),
+                           'alpha': power_law_exponent(out_degree)},
+            'pagerank': best(rank),
+            'hubs': best(hubs),
+            'authorities': best(authorities),
+            'strong_components': int(num_components),
+            'bow_tie': {REGIONS[i]: int(regions[i]) for i in range(len(REGIONS))}}
+
+# 6. From the command line, on a matrix written by crawler_export.py.
+def main():
+    from crawler_export import load_adjacency
+    parser = argparse.ArgumentParser(description = 'Network measures of an exported crawl graph.')
+    parser.add_argument('matrix', help = "The .npz adjacency matrix written by '--export npz'.")
+    parser.add_argument('--urls', default = None, help = 'The .urls.jsonl url index written with it - to show urls rather than ids.')
+    parser.add_argument('--top', type = int, default = 10, help = 'How many of the best nodes to list for each score.')
+    parser.add_argument('--damping', type = float, default = 0.85, help = 'Damping factor of PageRank.')
+    args = parser.parse_args()
+    matrix, urls = load_adjacency(args.matrix, args.urls)
+    summary = analyse(matrix, urls, top = args.top, damping = args.damping)
+    print('%d nodes, %d edges, %d strongly connected components' % (summary['nodes'], summary['edges'], summary['strong_components']))
+    for direction in ('in_degree', 'out_degree'):
+        stats = summary[direction]
+        print('%s: mean %.2f, max %d, power-law exponent %.2f' % (direction.replace('_', ' '), stats['mean'], stats['max'], stats['alpha']))
+    print('Bow-tie: ' + ', '.join('%s %d' % (region, count) for region, count in summary['bow_tie'].items()))
+    for score in ('pagerank', 'hubs', 'authorities'):
+        print(score + ':')
+        for node, value in summary[score]:
+            print('    %.6f  %s' % (value, node))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+# Checkpoints of a crawl, so that it can be resumed (used by crawler_f3.py and crawlerMainDraw.py).
+# Everything the crawler finds - sites_dict, sites_visited and sites_to_visit - used to live only in memory until the crawl ended.
+# If the process died on attempt 40,000, all of it was lost.
+# Instead, every change is appended to a file of events as it happens (one JSON object per line). Nothing already written is ever rewritten,
+# so a checkpoint costs the same on attempt 40,000 as on attempt 1. Replaying the events rebuilds the crawler as it was.
+#   {"e": "start", ...}                      the settings of the crawl - written once, when it starts
+#   {"e": "enqueue", "ids": [...]}           urls added to sites_to_visit (each url is only ever added once)
+#   {"e": "attempt", "n": 7}                 entry 7 of sites_dict was made
+#   {"e": "visited", "id": 12}               url appended to sites_visited
+# Urls are written as their ids in the url index (crawler_urls.py) of the RecordLog, which keeps it in the same folder.
+# The entries of sites_dict themselves are in a RecordLog (crawler_records.py) in the same folder - it is sites_dict, for a checkpointed crawl.
+
+import json
+import os
+import threading
+import time
+
+from crawler_records import RecordLog
+
+EVENTS_FILE = 'events.jsonl'
+RECORDS_FILE = 'records.jsonl'
+
+# 1. Writing events.
+def trim_partial_line(path, chunk_size=65536):
+    """
+    Function to remove a last line cut short by a crash (one without a '\n') from the end of a file - so that whatever is appended next
+    starts on a line of its own, rather than being glued onto the piece that was left. The file is read backwards from its end.
+    Inputs: path (str)
+            chunk_size (int): bytes read at a time.
+    Output: None
+    """
+    with open(path, 'r+b') as trimmed:
+        end = trimmed.seek(0, os.SEEK_END)
+        complete = 0
+        position = end
+        while position > 0:
+            start = max(0, position - chunk_size)
+            trimmed.seek(start)
+            newline = trimmed.read(position - start).rfind(b'\n')
+            if newline >= 0:
+                complete = start + newline + 1
+                break
+            position = start
+        if complete < end:
+            trimmed.truncate(complete)
+
+class CrawlCheckpoint():
+    """
+    Append-only log of the changes made to a Crawler. Events are buffered, and written out (flushed and synced to disk) every
+    flush_seconds, or sooner if flush_every events are waiting - at most that much work is lost if the process dies.
+    The records of attempts are kept in self.records (a RecordLog), which should be used as the crawler's sites_dict - see attach().
+    Inputs: folder (str): folder for the checkpoint. Created if it doesn't exist.
+            flush_every (int): number of waiting events that forces a write.
+            flush_seconds (float): longest time an event waits before it is written.
+    """
+    def __init__(self, folder, flush_every=1000, flush_seconds=10):
+        os.makedirs(folder, exist_ok = True)
+        self.path = os.path.join(folder, EVENTS_FILE)
+        if os.path.exists(self.path):
+            trim_partial_line(self.path)
+        self.file = open(self.path, 'a', encoding = 'utf-8')
+        self.records = RecordLog(os.path.join(folder, RECORDS_FILE), keep_existing = True)
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self.waiting = []                                                   # Lines not yet written
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()                                        # The AsyncCrawler records attempts from several threads.
+
+    def write(self, event):
+        line = json.dumps(event, separators = (',', ':'))
+        with self.lock:
+            self.waiting.append(line)
+            if len(self.waiting) >= self.flush_every or time.monotonic() - self.last_flush >= self.flush_seconds:
+                self.flush_locked()
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        # Records (and the url index) first: every 'attempt' event on disk then has its record on disk too, and every id its url.
+        self.records.flush(sync = True)
+        if self.waiting:
+            self.file.write('\n'.join(self.waiting) + '\n')
+            self.waiting = []
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_flush = time.monotonic()
+
+    def start(self, starting_site, num_to_visit, secured, no_goes, proportion_answer):
+        self.write({'e': 'start', 'starting_site': starting_site, 'num_to_visit': num_to_visit, 'secured': secured,
+                    'no_goes': no_goes, 'proportion_answer': proportion_answer})
+
+    def enqueue(self, urls):
+        if urls:
+            self.write({'e': 'enqueue', 'ids': self.records.index.ids_of(urls)})
+
+    def attempt(self, number):
+        self.write({'e': 'attempt', 'n': number})
+
+    def visited(self, url):
+        self.write({'e': 'visited', 'id': self.records.index.id(url)})
+
+    def attach(self, crawler):
+        """
+        Function to start checkpointing a crawler: its attempts are stored in self.records, and every change is appended here.
+        Input: crawler (Crawler)
+        Output: None
+        """
+        crawler.sites_dict = self.records
+        crawler.checkpoint = self
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        self.records.close()
+
+# 2. Reading events back.
+def read_events(folder):
+    """
+    Generator that yields the events of a checkpoint, in the order they were written.
+    Input: folder (str)
+    Output: yields event (dict). A last line cut short by a crash is skipped (and removed when the checkpoint is next opened for writing).
+    """
+    with open(os.path.join(folder, EVENTS_FILE), encoding = 'utf-8') as events_file:
+        for line in events_file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Only the last line can be incomplete: CrawlCheckpoint removes such a line before it appends anything, so every earlier line was written in full.
+                pass
+
+def has_checkpoint(folder):
+    return os.path.exists(os.path.join(folder, EVENTS_FILE))
+
+def read_settings(folder):
+    """
+    Function to get the settings of a checkpointed crawl - the answers to the questions asked when it started.
+    Input: folder (str)
+    Output: settings (dict): the 'start' event. None if there isn't one.
+    """
+    for event in read_events(folder):
+        if event['e'] == 'start':
+            return event
+    return None
+
+# 3. Rebuilding a crawler.
+def restore(crawler, checkpoint):
+    """
+    Function to put a newly made Crawler back into the state it was in at the last checkpoint, and carry on checkpointing it.
+    sites_to_visit is rebuilt in its original order. Urls that had been taken off it but not yet attempted (eg, by the AsyncCrawler) are put back.
+    Inputs: crawler (Crawler): made with the settings from read_settings(folder), not yet crawled.
+            checkpoint (CrawlCheckpoint): opened on the folder of the checkpoint.
+    Output: None
+    """
+    url_index = checkpoint.records.index
+    enqueued = []
+    num_attempts = 0
+    for event in read_events(os.path.dirname(checkpoint.path)):
+        kind = event['e']
+        if kind == 'enqueue':
+            enqueued.extend(event['ids'])
+        elif kind == 'attempt':
+            num_attempts = max(num_attempts, event['n'])
+        elif kind == 'visited':
+            url = url_index.url(event['id'])
+            crawler.sites_visited.append(url)
+            crawler.sites_visited_set.add(url)
+    # Records written after the last event that reached the disk belong to attempts the checkpoint doesn't know about. Those are attempted again.
+    records = checkpoint.records
+    records.forget_after(num_attempts)
+    checkpoint.attach(crawler)
+    crawler.counter_attempts = len(records)
+    crawler.counter_total = len(crawler.sites_visited)
+    attempted = set(entry.url_id for entry in records.values())
+    # The crawler was made with only the starting site to visit - and that is the first url of the first 'enqueue' event. It is already in
+    # 'seen', so both are emptied first: otherwise a starting site that was never attempted would not go back on the queue.
+    frontier = crawler.sites_to_visit
+    frontier.clear()
+    for url_id in enqueued:
+        url = url_index.url(url_id)
+        if url_id in attempted:
+            frontier.seen.add(url)
+        else:
+            frontier.append(url)
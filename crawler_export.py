@@ -0,0 +1,215 @@
+# Writing the graph of a crawl to files that other tools can load (used by crawler_f3.py and crawlerMainDraw.py).
+# The only output of a crawl used to be myGraph.svg - a picture. For network analysis (degrees, PageRank, components, ...) the graph itself
+# is needed, and rebuilding a networkx DiGraph of millions of edges just to save it is slow and takes a lot of memory.
+# Instead, the edges are read straight from sites_dict (one record at a time - it may be a RecordLog on disk) and written as they come:
+#   graphml - GraphML (XML), for Gephi, Cytoscape, networkx.read_graphml, ...
+#   csv     - an edge list: source id, target id, weight.
+#   parquet - the same edge list as Parquet (needs pyarrow).
+#   npz     - the adjacency matrix, as a SciPy CSR sparse matrix (scipy.sparse.save_npz) - load_adjacency() loads it back in seconds.
+# Nodes are the url ids of the url index of the crawl (crawler_urls.py - Crawler.url_index). Every format but graphml comes with the index itself, '<prefix>.urls.jsonl':
+# line i is the url (JSON) with id i. The weight of an edge is the number of times the link appears on the page.
+
+import csv
+import json
+from array import array
+from collections import Counter
+from functools import partial
+from xml.sax.saxutils import escape
+
+EXPORT_FORMATS = ('graphml', 'csv', 'parquet', 'npz')
+
+# 1. The edges of a crawl.
+def iter_edges(sites_dict):
+    """
+    Generator that gives every edge of the graph of a crawl: one per unique link on each site visited.
+    Input: sites_dict (dict or RecordLog): {attempt number: CrawlRecord}. The sites visited are the records with links.
+    Output: yields (source id, target id, weight)
+    """
+    for entry in sites_dict.values():
+        if entry.link_ids is None:
+            continue
+        source = entry.url_id
+        # A Counter keeps the links in the order they first appear on the page.
+        for target, weight in Counter(entry.link_ids).items():
+            yield source, target, weight
+
+def visited_ids(sites_dict):
+    # The url ids of the sites visited (the records with links).
+    return set(entry.url_id for entry in sites_dict.values() if entry.link_ids is not None)
+
+# 2. The url index.
+def write_url_index(path, url_index):
+    """
+    Function to write the url of every id: line i is the url with id i, as JSON (None is 'null').
+    Inputs: path (str)
+            url_index (UrlIndex or DiskUrlIndex)
+    Output: None
+    """
+    url_index.flush()
+    with open(path, 'w', encoding = 'utf-8') as urls_file:
+        for url in url_index:
+            urls_file.write(json.dumps(url) + '\n')
+
+def read_url_index(path):
+    """
+    Function to read a file written by write_url_index.
+    Input: path (str)
+    Output: urls (list): urls[i] is the url with id i.
+    """
+    with open(path, encoding = 'utf-8') as urls_file:
+        return [json.loads(line) for line in urls_file]
+
+# 3. Edge list, as CSV.
+def write_edges_csv(sites_dict, path):
+    """
+    Function to write the edges of a crawl to a CSV file, one edge per row as it is read: source,target,weight (url ids).
+    Inputs: sites_dict (dict or RecordLog)
+            path (str)
+    Output: num_edges (int)
+    """
+    num_edges = 0
+    with open(path, 'w', newline = '') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(('source', 'target', 'weight'))
+        for edge in iter_edges(sites_dict):
+            writer.writerow(edge)
+            num_edges += 1
+    return num_edges
+
+# 4. Edge list, as Parquet. pyarrow is optional - it is only imported here.
+def write_edges_parquet(sites_dict, path, batch_size=1000000):
+    """
+    Function to write the edges of a crawl to a Parquet file, in row groups of batch_size edges - only one batch is in memory at a time.
+    Inputs: sites_dict (dict or RecordLog)
+            path (str)
+            batch_size (int)
+    Output: num_edges (int). Raises ImportError if pyarrow isn't installed.
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([('source', pa.int64()), ('target', pa.int64()), ('weight', pa.int64())])
+    # The arrays are handed to pyarrow through NumPy without copying them.
+    batch = lambda columns: pa.table([np.frombuffer(column, dtype = np.int64) for column in columns], schema = schema)
+    num_edges = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        sources, targets, weights = array('q'), array('q'), array('q')
+        for source, target, weight in iter_edges(sites_dict):
+            sources.append(source)
+            targets.append(target)
+            weights.append(weight)
+            if len(sources) >= batch_size:
+                writer.write_table(batch((sources, targets, weights)))
+                num_edges += len(sources)
+                sources, targets, weights = array('q'), array('q'), array('q')
+        if sources or not num_edges:
+            writer.write_table(batch((sources, targets, weights)))
+            num_edges += len(sources)
+    return num_edges
+
+# 5. The adjacency matrix, as a SciPy CSR matrix. Row i holds the links from url i: A[i, j] = weight of the edge i -> j.
+def adjacency_matrix(sites_dict, num_nodes=None):
+    """
+    Function to build the sparse adjacency matrix of a crawl. The edges are gathered into compact arrays (8 bytes a number) as they are read.
+    Inputs: sites_dict (dict or RecordLog)
+            num_nodes (int): size of the matrix - the number of urls in the url index, so every url is a node. By default, just big enough for every edge.
+    Output: scipy.sparse.csr_matrix (num_nodes x num_nodes)
+    """
+    import numpy as np
+    import scipy.sparse
+    sources, targets, weights = array('q'), array('q'), array('q')
+    for source, target, weight in iter_edges(sites_dict):
+        sources.append(source)
+        targets.append(target)
+        weights.append(weight)
+    if num_nodes is None:
+        num_nodes = max(max(sources, default = -1), max(targets, default = -1)) + 1
+    # The arrays are used as they are - no copy.
+    matrix = scipy.sparse.csr_matrix((np.frombuffer(weights, dtype = np.int64),
+                                      (np.frombuffer(sources, dtype = np.int64), np.frombuffer(targets, dtype = np.int64))),
+                                     shape = (num_nodes, num_nodes))
+    # Entries for the same edge (a site with two records that have links) are added together.
+    matrix.sum_duplicates()
+    return matrix
+
+def write_adjacency(sites_dict, path, num_nodes=None):
+    """
+    Function to save the adjacency matrix of a crawl (scipy.sparse.save_npz, compressed).
+    Inputs: sites_dict (dict or RecordLog)
+            path (str): should end in '.npz'.
+            num_nodes (int): as for adjacency_matrix.
+    Output: num_edges (int)
+    """
+    import scipy.sparse
+    matrix = adjacency_matrix(sites_dict, num_nodes)
+    scipy.sparse.save_npz(path, matrix, compressed = True)
+    return matrix.nnz
+
+def load_adjacency(path, urls_path=None):
+    """
+    Function to load an adjacency matrix saved by write_adjacency, and optionally its url index.
+    Inputs: path (str): the .npz file.
+            urls_path (str): the url index written with it. None to skip it.
+    Outputs: matrix (scipy.sparse.csr_matrix)
+             urls (list or None): urls[i] is the url of row/column i.
+    """
+    import scipy.sparse
+    matrix = scipy.sparse.load_npz(path).tocsr()
+    urls = read_url_index(urls_path) if urls_path is not None else None
+    return matrix, urls
+
+# 6. GraphML. Written by hand, a line at a time, rather than through a networkx graph. Nodes carry their url and whether they were visited.
+def write_graphml(sites_dict, path, url_index):
+    """
+    Function to write the graph of a crawl as GraphML. Node ids are 'n<url id>'.
+    Inputs: sites_dict (dict or RecordLog)
+            path (str)
+            url_index (UrlIndex or DiskUrlIndex): the index the url ids of sites_dict are in. Every url in it is a node.
+    Output: num_edges (int)
+    """
+    visited = visited_ids(sites_dict)
+    num_edges = 0
+    with open(path, 'w', encoding = 'utf-8') as graphml:
+        graphml.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                      '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                      '  <key id="url" for="node" attr.name="url" attr.type="string"/>\n'
+                      '  <key id="visited" for="node" attr.name="visited" attr.type="boolean"/>\n'
+                      '  <key id="weight" for="edge" attr.name="weight" attr.type="int"/>\n'
+                      '  <graph id="crawl" edgedefault="directed">\n')
+        url_index.flush()
+        for url_id, url in enumerate(url_index):
+            graphml.write('    <node id="n%d"><data key="url">%s</data><data key="visited">%s</data></node>\n'
+                          % (url_id, escape('None' if url is None else url), 'true' if url_id in visited else 'false'))
+        for source, target, weight in iter_edges(sites_dict):
+            graphml.write('    <edge source="n%d" target="n%d"><data key="weight">%d</data></edge>\n' % (source, target, weight))
+            num_edges += 1
+        graphml.write('  </graph>\n</graphml>\n')
+    return num_edges
+
+# 7. Everything asked for, with one prefix.
+def export_graph(sites_dict, prefix, formats, url_index):
+    """
+    Function to write the graph of a crawl in each of the formats asked for: '<prefix>.graphml', '<prefix>.csv', '<prefix>.parquet',
+    '<prefix>.npz' - and, with any but graphml, the url index '<prefix>.urls.jsonl'.
+    Inputs: sites_dict (dict or RecordLog)
+            prefix (str)
+            formats (list of str): from EXPORT_FORMATS.
+            url_index (UrlIndex or DiskUrlIndex): the index the url ids of sites_dict are in (Crawler.url_index).
+    Output: written (list of str): the files written. A format whose optional module (pyarrow) is missing is skipped, with a message.
+    """
+    writers = {'graphml': partial(write_graphml, url_index = url_index), 'csv': write_edges_csv, 'parquet': write_edges_parquet,
+               'npz': partial(write_adjacency, num_nodes = len(url_index))}
+    written = []
+    for export_format in formats:
+        path = prefix + '.' + export_format
+        try:
+            num_edges = writers[export_format](sites_dict, path)
+        except ImportError as error:
+            print('Could not export the graph as ' + export_format + ': ' + str(error))
+            continue
+        print('Exported %d edges to %s' % (num_edges, path))
+        written.append(path)
+    if any(not path.endswith('.graphml') for path in written):
+        write_url_index(prefix + '.urls.jsonl', url_index)
+        written.append(prefix + '.urls.jsonl')
+    return written
@@ -0,0 +1,69 @@
+# The queue of sites still to visit (used by crawler_f3.py and crawlerMainDraw.py).
+# sites_to_visit used to be a plain list: .pop(0) moves every remaining element along by one, and the same link found on many pages
+# was added again every time. With hundreds of thousands of links waiting, both go quadratic.
+
+from collections import deque
+
+# 1. First-in, first-out queue of urls, where each url can only ever be added once.
+class Frontier():
+    """
+    Queue of urls still to visit. Urls come out in the order they were added (so the visit order is unchanged).
+    A url that has been added before - even if it has since been taken off the queue - is not added again.
+    Inputs: urls (iterable): urls to start with, eg [starting_site]
+            seen (set-like): where to keep every url ever added. Needs 'in' and .add(). A set by default -
+                             for very large crawls, a SeenUrlStore (crawler_seen.py) keeps memory bounded.
+    """
+    def __init__(self, urls=(), seen=None):
+        self.queue = deque()                                                # urls waiting to be visited, oldest first
+        self.seen = seen if seen is not None else set()                     # every url ever added. Hashed, so checking it is O(1)
+        self.extend(urls)
+
+    def append(self, url):
+        """
+        Function to add a url to the back of the queue, unless it has been added before.
+        Input: url (str): may also be None - links without an 'href' are kept so they can be recorded.
+        Output: added (Bool): False if the url was a duplicate.
+        """
+        if url in self.seen:
+            return False
+        self.seen.add(url)
+        self.queue.append(url)
+        return True
+
+    def extend(self, urls):
+        """
+        Function to add several urls, in order. Duplicates (of each other or of earlier urls) are dropped.
+        Input: urls (iterable)
+        Output: num_added (int)
+        """
+        num_added = 0
+        for url in urls:
+            if self.append(url):
+                num_added += 1
+        return num_added
+
+    def clear(self):
+        """
+        Function to empty the queue and forget every url ever added (eg, before it is rebuilt from a checkpoint).
+        The seen store needs a .clear() - both a set and a SeenUrlStore have one.
+        Output: None
+        """
+        self.queue.clear()
+        self.seen.clear()
+
+    def popleft(self):
+        """
+        Function to take the oldest url off the queue. O(1).
+        Output: url (str). Raises IndexError if the queue is empty - like list.pop(0).
+        """
+        return self.queue.popleft()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def __contains__(self, url):
+        # True if the url has ever been added - not just if it is still waiting.
+        return url in self.seen
+
+    def __iter__(self):
+        return iter(self.queue)
@@ -0,0 +1,43 @@
+# The HTTP client of the crawler (used by crawler_f3.py and crawlerMainDraw.py).
+# Every request used to be a bare requests.get - a new TCP connection (and TLS handshake) each time, even for
+# robots.txt -> homepage -> ToS page -> target, one after the other on the same host.
+# A requests.Session keeps connections open (keep-alive) and re-uses them for the next request to the same host.
+# https://requests.readthedocs.io/en/latest/user/advanced/#session-objects
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 1. Seconds to wait for a connection to be made, and then for the server to send something. No timeout at all used to mean a stuck server stopped the crawl.
+DEFAULT_TIMEOUT = (10, 30)
+
+# 2. Make the session.
+def make_session(headers=None, pool_connections=100, pool_maxsize=2, pool_block=True):
+    """
+    Function to make a requests.Session with a pool of open connections per host.
+    Inputs: headers (dict): sent with every request, eg {'User-Agent': ...}
+            pool_connections (int): number of hosts to keep a pool of connections for. The least recently used host's pool is closed after that.
+            pool_maxsize (int): most connections kept open to any one host.
+            pool_block (Bool): True - never open more than pool_maxsize connections to one host; wait for one to be free instead.
+                               We only ever send a host one request at a time (crawler_scheduler.py), so this is a limit that shouldn't be reached.
+    Output: session (requests.Session)
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections = pool_connections, pool_maxsize = pool_maxsize, pool_block = pool_block)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if headers is not None:
+        session.headers.update(headers)
+    return session
+
+# 3. How many bytes of a response have come over the network so far - compressed, if the site compressed them.
+def body_bytes(response):
+    """
+    Function to get the number of bytes of the body of a response read so far.
+    Input: response (requests.Response): read in full, or streamed and read by the caller.
+    Output: num_bytes (int)
+    """
+    try:
+        return response.raw.tell()
+    except AttributeError:
+        # No raw stream (eg a response made up for a test) - count the body itself.
+        return len(response.content or b'')
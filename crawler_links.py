@@ -0,0 +1,182 @@
+# Link extraction for the crawler (used by crawler_f3.py and crawlerMainDraw.py).
+# Crawler.visit used to build a whole BeautifulSoup tree of every page - only to call find_all('a') and read each 'href'.
+# For big pages, building that tree took most of the CPU time and memory of a visit.
+# Instead, the page is fed to an event-driven parser (html.parser) a piece at a time as it is downloaded, and the links come out as they are found.
+# No tree is ever built.
+# Parsing is still CPU work, and Python threads run it one at a time (the GIL) - however many threads fetch pages. With --parse-workers, the
+# bytes of each page are sent to a pool of processes instead (section 4), which find and resolve the links on as many cores as they are given.
+# The thread that fetched a page still waits for its links - so the pool only helps when several threads fetch at once (--engine async/threads).
+
+import codecs
+import html
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from html.entities import html5
+from html.parser import HTMLParser, attrfind_tolerant, tagfind_tolerant
+
+from crawler_urls import UrlCanonicalizer
+
+# 1. The parser. html.parser calls handle_starttag for every opening tag - we only keep the 'href' of each <a>.
+# Elements whose content is text, not tags (HTML5 'raw text' and 'RCDATA' elements, and <plaintext>). An <a> inside them is not a link -
+# lxml never returned one. html.parser itself only knows about <script> and <style>.
+RAW_TEXT_ELEMENTS = frozenset(('script', 'style', 'title', 'textarea', 'xmp', 'iframe', 'noembed', 'noframes', 'plaintext'))
+
+# Character references, as html.unescape finds them: '&#38;', '&#x26;', '&amp;' - or a name without its ';' ('&amp').
+CHARACTER_REFERENCE = re.compile(r'&(#[0-9]+;?|#[xX][0-9a-fA-F]+;?|[^\t\n\f <&#;]{1,32};?)')
+
+def replace_reference(match):
+    # Like html.unescape, but with the rule of HTML5 for attribute values: a name without its ';' that is followed by '=' or a letter or digit
+    # is left as it is. So '?q=1&sect=2' stays as it is (not '?q=1§=2'), while '&amp;' and '&copy ' are still decoded.
+    reference = match.group(1)
+    if reference[0] == '#':
+        return html.unescape(match.group(0))
+    if reference in html5:
+        return html5[reference]
+    # The longest name at the start that is known without its ';' ('amp' in 'ampx').
+    for length in range(len(reference) - 1, 1, -1):
+        if reference[:length] in html5:
+            following = reference[length]
+            if following == '=' or following.isalnum():
+                return match.group(0)
+            return html5[reference[:length]] + reference[length:]
+    return match.group(0)
+
+def unescape_attribute(value):
+    """
+    Function to decode the character references of an attribute value, as a browser (and lxml) does.
+    Input: value (str): as written in the page, without its quotes.
+    Output: value (str)
+    """
+    if '&' not in value:
+        return value
+    return CHARACTER_REFERENCE.sub(replace_reference, value)
+
+class LinkExtractor(HTMLParser):
+    """
+    Incremental parser that collects the 'href' of every <a> tag, in the order they appear - the same as BeautifulSoup's find_all('a') and .get('href') with lxml.
+    An <a> without an 'href' gives None. An 'href' with no value (<a href>) gives ''. Character references (eg '&amp;') are decoded as in
+    an attribute (unescape_attribute). Tags inside <title>, <textarea>, <script>, ... (RAW_TEXT_ELEMENTS) are text, not links.
+    Use: feed() text as it arrives, take the links found so far with take_links(), and close() at the end.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs = True)
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in RAW_TEXT_ELEMENTS:
+            # Everything up to the matching end tag is text.
+            self.set_cdata_mode(tag)
+            return
+        if tag != 'a':
+            return
+        self.links.append(self.href())
+
+    def href(self):
+        # The 'href' of the tag just started. html.parser has already decoded 'attrs' with html.unescape, which decodes '&sect=' inside a url -
+        # so the attributes are split again from the tag as written (in the same way), and only the 'href' is decoded, by unescape_attribute.
+        text = self.get_starttag_text()
+        position = tagfind_tolerant.match(text, 1).end()
+        while position < len(text):
+            match = attrfind_tolerant.match(text, position)
+            if not match:
+                break
+            name, rest, value = match.group(1, 2, 3)
+            # If 'href' is given more than once, the first one counts (as with lxml).
+            if name.lower() == 'href':
+                if not rest:
+                    return ''
+                if value[:1] == '\'' == value[-1:] or value[:1] == '"' == value[-1:]:
+                    value = value[1:-1]
+                return unescape_attribute(value)
+            position = match.end()
+        return None
+
+    def take_links(self):
+        """
+        Function to take the links found since the last call.
+        Output: links (list)
+        """
+        links = self.links
+        self.links = []
+        return links
+
+# 2. Decoding. Bytes arrive in chunks, and a multi-byte character can be split between two chunks - an incremental decoder keeps the unfinished part.
+def make_decoder(encoding):
+    """
+    Function to make an incremental decoder for the encoding of a response.
+    Input: encoding (str): eg response.encoding. May be None or unknown - then UTF-8 is used.
+    Output: decoder (codecs.IncrementalDecoder). Badly encoded bytes are replaced, as response.text does.
+    """
+    try:
+        decoder_class = codecs.getincrementaldecoder(encoding or 'utf-8')
+    except LookupError:
+        decoder_class = codecs.getincrementaldecoder('utf-8')
+    return decoder_class(errors = 'replace')
+
+# 3. The links of a response, as it is downloaded.
+def iter_links(response, chunk_size=16384):
+    """
+    Generator that yields the 'href' of every <a> tag of a page as the page arrives.
+    Inputs: response (requests.Response): ideally requested with stream=True, so the body hasn't been read yet.
+            chunk_size (int): bytes to read at a time.
+    Output: yields href (str or None), in the order they appear in the page.
+    """
+    decoder = make_decoder(response.encoding)
+    parser = LinkExtractor()
+    for chunk in response.iter_content(chunk_size = chunk_size):
+        parser.feed(decoder.decode(chunk))
+        yield from parser.take_links()
+    parser.feed(decoder.decode(b'', final = True))
+    parser.close()
+    yield from parser.take_links()
+
+# 4. Parsing in other processes. Only bytes and strings go to a worker and only a list of urls comes back - all of it can be pickled.
+# Each worker process keeps its own canonicaliser (it can't share the crawler's), made the first time it is needed.
+WORKER_CANONICALIZERS = {}                                                  # sort_query -> UrlCanonicalizer, in a worker process
+
+def extract_links(body, encoding, base_url, sort_query=False):
+    """
+    Function to get the links of a whole page, resolved and normalised (crawler_urls.py) - as Crawler.visit does with iter_links and
+    UrlCanonicalizer.resolve. Runs in a worker process of a ParsePool.
+    Inputs: body (bytes): the page, as downloaded.
+            encoding (str): eg response.encoding. May be None.
+            base_url (str): the url the page was served from, that links are relative to.
+            sort_query (Bool): as for UrlCanonicalizer.
+    Output: links (list): in the order they appear in the page.
+    """
+    canonicalizer = WORKER_CANONICALIZERS.get(sort_query)
+    if canonicalizer is None:
+        canonicalizer = WORKER_CANONICALIZERS[sort_query] = UrlCanonicalizer(sort_query = sort_query)
+    parser = LinkExtractor()
+    parser.feed(make_decoder(encoding).decode(body, final = True))
+    parser.close()
+    return [canonicalizer.resolve(link, base_url) for link in parser.take_links()]
+
+class ParsePool():
+    """
+    Pool of worker processes that find the links of pages (extract_links), shared by every thread that fetches pages.
+    links() waits for the result, so a thread that fetched a page waits while it is parsed - the pool lets the pages of several fetching threads
+    be parsed at once, on several cores. With only one fetching thread (the serial crawl), it would only add the cost of sending pages to a worker.
+    At most max_waiting pages are with the pool at once (waiting, or being parsed). A thread with another page then waits until one is done -
+    so if fetching outruns parsing, fetching slows down to match, rather than pages piling up in memory.
+    Inputs: workers (int): number of processes.
+            max_waiting (int): pages with the pool at once. By default, two per worker - so a worker never waits for its next page.
+    """
+    def __init__(self, workers, max_waiting=None):
+        # 'spawn': the workers start from a fresh interpreter, not a copy of this process (and of the locks held by its other threads).
+        self.executor = ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context('spawn'))
+        self.slots = threading.BoundedSemaphore(max_waiting or 2 * workers)
+
+    def links(self, body, encoding, base_url, sort_query=False):
+        """
+        Function to get the links of a page from a worker process. Waits for a free slot, then for the result.
+        Inputs: as for extract_links.
+        Output: links (list)
+        """
+        with self.slots:
+            return self.executor.submit(extract_links, body, encoding, base_url, sort_query).result()
+
+    def close(self):
+        self.executor.shutdown()
@@ -0,0 +1,174 @@
+# Live numbers of a crawl, for monitoring (used by crawler_f3.py and crawlerMainDraw.py).
+# Crawler.counter_attempts and the rest only lived inside the process - nothing outside could see how a long crawl was going.
+# They are now published in the Prometheus text format (https://prometheus.io/docs/instrumenting/exposition_formats/), either:
+#   - from a small HTTP server, at http://<address>:<port>/metrics (MetricsServer - '--metrics-port'), or
+#   - in a file rewritten every few seconds (MetricsFile - '--metrics-file'), eg for node_exporter's textfile collector.
+# Nothing is counted here: every number is read from the crawler when the metrics are asked for, so a crawl that nobody watches pays nothing.
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from crawler_timing import BUCKET_BOUNDS, PHASES
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 1. The text format.
+def format_labels(labels):
+    # {'status': '200'} -> '{status="200"}'. Backslashes, quotes and newlines in values are escaped.
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join('%s="%s"' % (name, value) for name, value in zip(labels, escaped)) + '}'
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class MetricsWriter():
+    """
+    Builds a page of metrics in the Prometheus text format: a '# HELP' and '# TYPE' line for each metric, then its samples.
+    """
+    def __init__(self):
+        self.lines = []
+
+    def metric(self, name, kind, help_text, samples):
+        """
+        Function to add a metric.
+        Inputs: name (str), kind (str): 'counter', 'gauge' or 'histogram'.
+                help_text (str)
+                samples (list of (suffix, labels, value)): eg [('_total', {'status': '200'}, 12)].
+        Output: None
+        """
+        self.lines.append('# HELP %s %s' % (name, help_text))
+        self.lines.append('# TYPE %s %s' % (name, kind))
+        for suffix, labels, value in samples:
+            self.lines.append('%s%s%s %s' % (name, suffix, format_labels(labels), format_value(value)))
+
+    def histogram(self, name, help_text, histograms, label):
+        """
+        Function to add a histogram metric from crawler_timing Histograms.
+        Inputs: name (str), help_text (str)
+                histograms (dict): {label value: Histogram}
+                label (str): name of the label that tells them apart.
+        Output: None
+        """
+        samples = []
+        for value, histogram in histograms.items():
+            # Prometheus buckets count everything up to their bound ('le').
+            cumulative = 0
+            for bound, count in zip(BUCKET_BOUNDS, histogram.counts):
+                cumulative += count
+                samples.append(('_bucket', {label: value, 'le': format_value(bound)}, cumulative))
+            samples.append(('_bucket', {label: value, 'le': '+Inf'}, histogram.count))
+            samples.append(('_sum', {label: value}, histogram.total))
+            samples.append(('_count', {label: value}, histogram.count))
+        self.metric(name, 'histogram', help_text, samples)
+
+    def text(self):
+        return '\n'.join(self.lines) + '\n'
+
+# 2. The metrics of a crawler.
+def render_metrics(crawler):
+    """
+    Function to read the numbers of a crawler and write them out in the Prometheus text format.
+    Input: crawler (Crawler)
+    Output: text (str)
+    """
+    writer = MetricsWriter()
+    with crawler.lock:
+        attempts = crawler.counter_attempts
+        visited = crawler.counter_total
+        num_bytes = crawler.bytes_downloaded
+        statuses = sorted(crawler.status_counts.items())
+    writer.metric('crawler_attempts', 'counter', 'Sites attempted - visited, skipped or prohibited.', [('_total', {}, attempts)])
+    writer.metric('crawler_pages_fetched', 'counter', 'Sites visited: downloaded, with their links found.', [('_total', {}, visited)])
+    writer.metric('crawler_bytes_downloaded', 'counter', 'Bytes of response bodies, as they came over the network.', [('_total', {}, num_bytes)])
+    writer.metric('crawler_responses', 'counter', 'HTTP responses, by status code (robots.txt, homepage and ToS requests included).',
+                  [('_total', {'status': status}, count) for status, count in statuses])
+    # The frontier: what is left to visit, and every url ever found (the set or SeenUrlStore that stops a url being added twice).
+    frontier = crawler.sites_to_visit
+    writer.metric('crawler_frontier_urls', 'gauge', 'Urls waiting to be attempted.', [('', {}, len(frontier))])
+    writer.metric('crawler_seen_urls', 'gauge', 'Urls ever added to the frontier.', [('', {}, len(frontier.seen))])
+    for name, cache in (('robots', crawler.robots_cache), ('tos', crawler.tos_cache)):
+        hits, misses = cache.hits, cache.misses
+        writer.metric('crawler_%s_cache_lookups' % name, 'counter', 'Lookups in the %s cache, by whether they were answered from it.' % name,
+                      [('_total', {'result': 'hit'}, hits), ('_total', {'result': 'miss'}, misses)])
+        writer.metric('crawler_%s_cache_hit_ratio' % name, 'gauge', 'Share of lookups in the %s cache answered from it.' % name,
+                      [('', {}, hits / (hits + misses) if hits + misses else 0.0)])
+    # Time in each phase (crawler_timing.py). 'get' is the latency of fetching the sites we attempt, to their headers.
+    timing = crawler.timing
+    with timing.lock:
+        writer.histogram('crawler_phase_seconds', 'Time spent in each phase of the crawl: wait, robots, tos, ask, get (fetch latency), parse, resolve.',
+                         {phase: timing.phases[phase] for phase in PHASES}, 'phase')
+    writer.metric('crawler_uptime_seconds', 'gauge', 'Seconds since the crawl started.', [('', {}, timing.elapsed())])
+    return writer.text()
+
+# 3. Serving them over HTTP.
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render_metrics(self.server.crawler).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Don't print a line every time the metrics are scraped.
+        pass
+
+class MetricsServer():
+    """
+    HTTP server that gives the metrics of a crawler at /metrics, from a thread of its own, until close().
+    Inputs: crawler (Crawler)
+            port (int): 0 for any free port - see self.port.
+            address (str): address to listen on. By default, only this machine can connect.
+    """
+    def __init__(self, crawler, port, address='127.0.0.1'):
+        self.server = ThreadingHTTPServer((address, port), MetricsHandler)
+        self.server.crawler = crawler
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target = self.server.serve_forever, daemon = True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# 4. Writing them to a file.
+class MetricsFile(threading.Thread):
+    """
+    Thread that rewrites a file with the metrics of a crawler every 'interval' seconds, and once more on stop().
+    The file is written beside itself and then renamed over the old one - so a reader never sees half a file.
+    Inputs: crawler (Crawler)
+            path (str): eg '/var/lib/node_exporter/crawler.prom'.
+            interval (float): seconds.
+    """
+    def __init__(self, crawler, path, interval=15):
+        super().__init__(daemon = True)
+        self.crawler = crawler
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def write(self):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding = 'utf-8') as metrics_file:
+            metrics_file.write(render_metrics(self.crawler))
+        os.replace(temporary, self.path)
+
+    def run(self):
+        self.write()
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.write()
@@ -0,0 +1,117 @@
+# Answers to the crawler's questions, decided up front (used by crawler_f3.py and crawlerMainDraw.py).
+# The crawler asks the user about the comments of every robots file and the terms of every ToS page it reads. An unattended crawl
+# stops at the first question and waits - possibly for hours. A CrawlPolicy answers the questions it can from rules given before the crawl,
+# and only asks the user (if at all) about the rest.
+
+import json
+
+from crawler_urls import UrlCanonicalizer, split_url
+
+# 1. What to ask about. Used as 'kind' below.
+ROBOTS = 'robots'                                                           # The comments of a /robots.txt file
+TOS = 'tos'                                                                 # The relevant parts of a Terms of Service page
+
+# 2. The policy.
+class CrawlPolicy():
+    """
+    Rules that decide whether to continue with a site, instead of asking the user. Checked in this order - the first that applies decides:
+        (1) deny: sites never to crawl.          (2) allow: sites to crawl without asking.
+        (3) keyword rules for robots comments / ToS text, in the order given.    (4) default.
+    Sites in 'allow' or 'deny' are written either as an origin ('https://www.abcd.com' - the same scheme, host and port only, so not
+    'https://www.abcd.co' or 'http://www.abcd.com') or as a domain ('abcd.com' - which also covers 'www.abcd.com', 'shop.abcd.com', ... on any scheme or port).
+    Sites on the deny list are not sent any request at all (Crawler.is_no_go).
+    Inputs: allow (list of str), deny (list of str): see above.
+            robots_rules (list of (keyword, verdict)): eg [('do not crawl', 'N')]. Keywords are matched anywhere in the text, ignoring case.
+            tos_rules (list of (keyword, verdict)): the same, for ToS text.
+            default (str): 'Y', 'N' or 'ask'. 'ask' asks the user about anything the rules above don't decide (the old behaviour).
+    """
+    def __init__(self, allow=(), deny=(), robots_rules=(), tos_rules=(), default='ask'):
+        if default not in ('Y', 'N', 'ask'):
+            raise ValueError("The default verdict of a policy must be 'Y', 'N' or 'ask', not %r" % (default,))
+        self.allow = list(allow)
+        self.deny = list(deny)
+        self.rules = {ROBOTS: [(keyword.lower(), verdict) for keyword, verdict in robots_rules],
+                      TOS: [(keyword.lower(), verdict) for keyword, verdict in tos_rules]}
+        for rules in self.rules.values():
+            for keyword, verdict in rules:
+                if verdict not in ('Y', 'N'):
+                    raise ValueError("The verdict of the rule for %r must be 'Y' or 'N', not %r" % (keyword, verdict))
+        self.default = default
+
+    def matches_site(self, origin, sites):
+        # origin is eg 'https://www.abcd.com'. Returns the entry of 'sites' that covers it, or None.
+        if origin is None:
+            return None
+        scheme, host, port = origin_parts(origin)
+        for site in sites:
+            if '//' in site:
+                if origin_parts(site) == (scheme, host, port):
+                    return site
+            else:
+                domain = site.lower().rstrip('.')
+                if host == domain or host.endswith('.' + domain):
+                    return site
+        return None
+
+    def denies(self, origin):
+        # True if the site is on the deny list - checked before any request is made to it.
+        return bool(self.deny) and self.matches_site(origin, self.deny) is not None
+
+    def decide(self, kind, origin, text):
+        """
+        Function to decide whether to continue with a site.
+        Inputs: kind (str): ROBOTS or TOS - what the text is.
+                origin (str): root url of the site, eg 'https://www.abcd.com'.
+                text (str): the robots comments or ToS text that would be shown to the user.
+        Outputs: verdict (str): 'Y' or 'N'. None if the user should be asked.
+                 reason (str): which rule decided, for the log.
+        """
+        site = self.matches_site(origin, self.deny)
+        if site is not None:
+            return 'N', 'deny list: ' + site
+        site = self.matches_site(origin, self.allow)
+        if site is not None:
+            return 'Y', 'allow list: ' + site
+        lowered = (text or '').lower()
+        for keyword, verdict in self.rules.get(kind, ()):
+            if keyword in lowered:
+                return verdict, 'keyword: ' + keyword
+        if self.default == 'ask':
+            return None, 'ask'
+        return self.default, 'default'
+
+# 2.1. Comparing origins. Both sides are put in the canonical form of crawler_urls.py first: 'HTTPS://WWW.Abcd.com:443/' is 'https://www.abcd.com'.
+ORIGIN_CANONICALIZER = UrlCanonicalizer()
+
+def origin_parts(url):
+    """
+    Function to get the parts of a url that make up its origin.
+    Input: url (str): eg 'https://user@www.abcd.com:8443/a/b'.
+    Outputs: scheme (str), host (str), port (str): eg 'https', 'www.abcd.com', '8443'. The port is '' if it is the default one. The scheme
+             and host are in lower case. The user, path, query and fragment are ignored.
+    """
+    scheme, authority, path, query, fragment = split_url(ORIGIN_CANONICALIZER.canonical(url.strip()))
+    host_port = (authority or '').rpartition('@')[2]
+    colon = host_port.rfind(':')
+    if colon > host_port.rfind(']'):
+        return (scheme or '').lower(), host_port[:colon], host_port[colon + 1:]
+    return (scheme or '').lower(), host_port, ''
+
+# 3. Read a policy from a JSON file, eg:
+# {"allow": ["wikipedia.org"], "deny": ["https://www.example.com"],
+#  "robots_rules": [["do not crawl", "N"]], "tos_rules": [["automated access", "N"], ["scraping", "N"]],
+#  "default": "Y"}
+# Every key may be left out.
+def load_policy(path):
+    """
+    Function to read a CrawlPolicy from a JSON file.
+    Input: path (str)
+    Output: CrawlPolicy
+    """
+    with open(path) as policy_file:
+        fields = json.load(policy_file)
+    return CrawlPolicy(allow = fields.get('allow', ()),
+                       deny = fields.get('deny', ()),
+                       robots_rules = [tuple(rule) for rule in fields.get('robots_rules', ())],
+                       tos_rules = [tuple(rule) for rule in fields.get('tos_rules', ())],
+                       default = fields.get('default', 'ask'))
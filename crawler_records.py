@@ -0,0 +1,275 @@
+# The record of every attempt the crawler makes, kept on disk (used by crawler_f3.py and crawlerMainDraw.py, and by crawler_checkpoint.py).
+# sites_dict used to be a dictionary in memory: one dict of ten keys per attempt, including the full list of links found on the page.
+# It was kept for the whole run, so the memory used by a big crawl grew without limit.
+# Instead, each record is appended to a file as one line of JSON as soon as it is made. All that stays in memory is where each record starts
+# in the file - 8 bytes per record, in an array. Records are read back from the file when they are asked for.
+# Each record used to be a dict of ten string keys, built by hand in six places in Crawler.visit. It is now a CrawlRecord: five slots, with
+# the six yes/no answers packed into the bits of one int, made by one constructor.
+# Urls are stored as their ids in a url index (crawler_urls.py) - in memory and in the file. Each RecordLog has its own index, kept in an sqlite
+# file next to the records (DiskUrlIndex), so only the urls used most recently are held in memory.
+
+import json
+import os
+import threading
+from array import array
+
+from crawler_urls import DiskUrlIndex
+
+# 1. The record of one attempt.
+# Bits of CrawlRecord.flags.
+ROBOTS = 1                                                                  # Prohibited by the /robots.txt file
+TOS = 2                                                                     # Prohibited by the ToS
+REPEAT = 4                                                                  # A repeat of a site already visited
+NOGO = 8                                                                    # A no-go site
+WEIRD_URL = 16                                                              # The url we ended up at is different to the one we wanted to go to
+REDIRECT = 32                                                               # We were redirected
+REDIRECT_KNOWN = 64                                                         # Whether or not we were redirected is known (there was a successful request)
+
+# The keys of the old dictionary, and the flag each of the yes/no ones became.
+FLAG_KEYS = {'robots': ROBOTS, 'ToS': TOS, 'Repeat': REPEAT, 'nogo': NOGO, 'weird_url': WEIRD_URL}
+
+class CrawlRecord():
+    """
+    The outcome of one attempt on a site. __slots__: no dictionary per record - and the urls are kept as their ids in a url index
+    (crawler_urls.py), so a record of a page holds an int for each of its links, however long their urls are.
+    Inputs: index (UrlIndex or DiskUrlIndex): the index the urls are numbered in - the one of the sites_dict the record goes to (Crawler.url_index).
+            url (str): the url of this site.
+            links (list): the links from this site, if it was visited. Stored as an array of ids. None otherwise.
+            status (int): the HTTP status code, if a request was made.
+            redirect (Bool): whether or not we have been redirected. None if there was no successful request.
+            duration (float): seconds between making the request and receiving its contents.
+            robots, ToS, Repeat, nogo, weird_url (Bool): as in 'Format for sites_dict' in the crawler scripts. Packed into 'flags'.
+    record.url and record.links give the urls back. The old dictionary keys still work: record['url'], record.get('links'), ...
+    """
+    __slots__ = ('index', 'url_id', 'link_ids', 'status', 'duration', 'flags')
+
+    def __init__(self, index, url, links=None, status=None, redirect=None, duration=None,
+                 robots=False, ToS=False, Repeat=False, nogo=False, weird_url=False):
+        self.index = index
+        self.url_id = index.id(url)
+        self.link_ids = array('q', index.ids_of(links)) if links is not None else None
+        self.status = status
+        self.duration = duration
+        self.flags = ((ROBOTS if robots else 0) | (TOS if ToS else 0) | (REPEAT if Repeat else 0) | (NOGO if nogo else 0) |
+                      (WEIRD_URL if weird_url else 0) | (0 if redirect is None else REDIRECT_KNOWN | (REDIRECT if redirect else 0)))
+
+    # Urls are only looked up when they are asked for.
+    @property
+    def url(self):
+        return self.index.url(self.url_id)
+
+    @property
+    def links(self):
+        if self.link_ids is None:
+            return None
+        return tuple(self.index.urls_of(self.link_ids))
+
+    @property
+    def redirect(self):
+        if not self.flags & REDIRECT_KNOWN:
+            return None
+        return bool(self.flags & REDIRECT)
+
+    def get(self, key, default=None):
+        # The old dictionary interface, for anything that still reads records with the old keys.
+        if key in FLAG_KEYS:
+            return bool(self.flags & FLAG_KEYS[key])
+        if key in ('url', 'links', 'status', 'redirect', 'duration'):
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key):
+        if key not in FLAG_KEYS and key not in ('url', 'links', 'status', 'redirect', 'duration'):
+            raise KeyError(key)
+        return self.get(key)
+
+    def to_dict(self):
+        return {key: self.get(key) for key in ('url', 'links', 'status', 'redirect', 'duration', 'robots', 'ToS', 'Repeat', 'nogo', 'weird_url')}
+
+    def __eq__(self, other):
+        return isinstance(other, CrawlRecord) and self.index is other.index and self.pack() == other.pack()
+
+    def __repr__(self):
+        return 'CrawlRecord(%r)' % (self.to_dict(),)
+
+    # For the file: a short list rather than a dictionary - with ids, not urls.
+    def pack(self):
+        return [self.url_id, self.link_ids.tolist() if self.link_ids is not None else None, self.status, self.duration, self.flags]
+
+    @classmethod
+    def unpack(cls, packed, index):
+        record = cls.__new__(cls)
+        record.index = index
+        record.url_id = packed[0]
+        record.link_ids = array('q', packed[1]) if packed[1] is not None else None
+        record.status = packed[2]
+        record.duration = packed[3]
+        record.flags = packed[4]
+        return record
+
+# 2. The log.
+def urls_path(path):
+    # The file of the url index that goes with a file of records: 'crawl_records.jsonl' -> 'crawl_records.urls.sqlite'
+    return os.path.splitext(path)[0] + '.urls.sqlite'
+
+class RecordLog():
+    """
+    Append-only file of numbered CrawlRecords that can be used in place of the sites_dict dictionary:
+        records.update({n: entry}), records[n], records.get(n), len(records), 'n in records', and lazy keys()/values()/items().
+    Records are numbered 1, 2, 3, ... in the order they are added (as Crawler.record_attempt does). Updating an existing number appends
+    the new version, and the index then points to it - nothing in the file is ever rewritten.
+    The records hold url ids, so the log has its own url index (self.index, a DiskUrlIndex) in a second file alongside - see urls_path().
+    Inputs: path (str): file for the records.
+            keep_existing (Bool): True to carry on with the records already in the file (eg, resuming a crawl). False to start it again.
+    """
+    def __init__(self, path, keep_existing=False):
+        self.path = path
+        self.urls_path = urls_path(path)
+        self.index = DiskUrlIndex(self.urls_path, keep_existing = keep_existing)
+        self.offsets = array('q')                                           # offsets[n - 1] = position in the file of the line of record n
+        self.lock = threading.Lock()                                        # The AsyncCrawler adds records from several threads.
+        self.last = None                                                    # (n, entry) of the last record read - the same record is often read several times in a row
+        self.reader = None                                                  # File opened for reading, when the first record is read
+        if keep_existing and os.path.exists(path):
+            self.load_index()
+        # Records are written through a buffer. Anything still in the buffer is written out before a record is read.
+        self.file = open(path, 'ab' if keep_existing else 'wb')
+        self.end = self.file.tell()                                         # Where the next record will start
+
+    def load_index(self):
+        # Read through the file once for the positions of the records. A last line cut short by a crash is removed, so the next record starts on a line of its own.
+        position = 0
+        complete = 0
+        with open(self.path, 'rb') as records_file:
+            for line in records_file:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    number = json.loads(line)['n']
+                except ValueError:
+                    break
+                self.set_offset(number, position)
+                position += len(line)
+                complete = position
+        if complete < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as records_file:
+                records_file.truncate(complete)
+
+    def set_offset(self, number, position):
+        if number == len(self.offsets) + 1:
+            self.offsets.append(position)
+        elif 1 <= number <= len(self.offsets):
+            self.offsets[number - 1] = position
+        else:
+            raise KeyError('Records are numbered 1, 2, 3, ... in order - record %r can not be added after record %d' % (number, len(self.offsets)))
+
+    # 2.1. Writing
+    def update(self, records):
+        """
+        Function to add records, like dict.update.
+        Input: records (dict): {n: CrawlRecord}
+        Output: None
+        """
+        for number, entry in records.items():
+            self[number] = entry
+
+    def __setitem__(self, number, entry):
+        line = (json.dumps({'n': number, 'site': entry.pack()}, separators = (',', ':')) + '\n').encode('utf-8')
+        with self.lock:
+            self.set_offset(number, self.end)
+            self.file.write(line)
+            self.end += len(line)
+            if self.last is not None and self.last[0] == number:
+                self.last = None
+
+    def flush(self, sync=False):
+        """
+        Function to write out the buffer.
+        Input: sync (Bool): True to also wait until the operating system has the records on disk.
+        Output: None
+        """
+        # The index first: every id in a record on disk then has its url on disk too.
+        self.index.flush(sync = sync)
+        with self.lock:
+            self.file.flush()
+            if sync:
+                os.fsync(self.file.fileno())
+
+    def forget_after(self, num_records):
+        """
+        Function to forget every record numbered above num_records - eg, records written just before a crash, whose attempts the checkpoint
+        doesn't know about. Their lines stay in the file, but are replaced when those numbers are used again.
+        Input: num_records (int)
+        Output: None
+        """
+        with self.lock:
+            del self.offsets[num_records:]
+            self.last = None
+
+    def close(self):
+        # No more records can be added. They can still be read.
+        self.index.close()
+        with self.lock:
+            self.file.close()
+            if self.reader is not None:
+                self.reader.close()
+                self.reader = None
+
+    def flush_for_reading(self):
+        if not self.file.closed:
+            self.file.flush()
+
+    # 2.2. Reading
+    def __getitem__(self, number):
+        with self.lock:
+            if self.last is not None and self.last[0] == number:
+                return self.last[1]
+            if not (isinstance(number, int) and 1 <= number <= len(self.offsets)):
+                raise KeyError(number)
+            self.flush_for_reading()
+            if self.reader is None:
+                self.reader = open(self.path, 'rb')
+            self.reader.seek(self.offsets[number - 1])
+            entry = CrawlRecord.unpack(json.loads(self.reader.readline())['site'], self.index)
+            self.last = (number, entry)
+            return entry
+
+    def get(self, number, default=None):
+        try:
+            return self[number]
+        except KeyError:
+            return default
+
+    def __contains__(self, number):
+        return isinstance(number, int) and 1 <= number <= len(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def keys(self):
+        return range(1, len(self.offsets) + 1)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        """
+        Generator that reads the records back in the order they were written, in one pass through the file. Only one record is in memory at a time.
+        Output: yields (n, entry)
+        """
+        with self.lock:
+            self.flush_for_reading()
+            num_records = len(self.offsets)                                 # Records added while we read are not included.
+        position = 0
+        with open(self.path, 'rb') as records_file:
+            for line in records_file:
+                record = json.loads(line)
+                number = record['n']
+                # Lines that were replaced by a later version of the same record are skipped.
+                if number <= num_records and self.offsets[number - 1] == position:
+                    yield number, CrawlRecord.unpack(record['site'], self.index)
+                position += len(line)
+
+    def values(self):
+        for number, entry in self.items():
+            yield entry
@@ -0,0 +1,277 @@
+# Drawing the graph of a crawl (used by crawlerMainDraw.py).
+# crawler2networkx always laid the graph out with Graphviz 'dot' and drew it to myGraph.svg. 'dot' is a hierarchical layout: past a few
+# thousand nodes it takes hours, and every link that wasn't visited is a node of its own - most of the graph.
+# Instead, the way the graph is drawn depends on its size:
+#   'dot'   - as before. For small graphs.
+#   'sfdp'  - Graphviz's multilevel force-directed layout. Handles graphs of tens of thousands of nodes.
+#   'force' - a force-directed layout in NumPy (force_layout below), written straight to SVG. Doesn't need Graphviz at all.
+#   'raw'   - too big to draw: the edges are written to a file instead (write_edge_table).
+# The links that weren't visited can also be merged into one node per domain (aggregate_leaves), which usually shrinks the graph many times over.
+# The colours of the sites visited are worked out here too (domain_palette).
+
+import math
+import os
+from xml.sax.saxutils import escape, quoteattr
+
+import networkx as nx
+import numpy as np
+
+from crawler_urls import split_url
+
+LAYOUTS = ('auto', 'dot', 'sfdp', 'force')
+DOT_MAX_NODES = 1000                                                        # 'auto' uses 'dot' up to this many nodes, and 'sfdp' above
+
+# 1. Which way to draw.
+def choose_layout(num_nodes, layout='auto', max_draw_nodes=100000):
+    """
+    Function to decide how to draw a graph.
+    Inputs: num_nodes (int): nodes in the graph.
+            layout (str): one of LAYOUTS. 'auto' picks 'dot' for small graphs and 'sfdp' for the rest.
+            max_draw_nodes (int): above this, the graph isn't drawn at all.
+    Output: layout (str): 'dot', 'sfdp', 'force' or 'raw'.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError('The layout must be one of %s, not %r' % (', '.join(LAYOUTS), layout))
+    if num_nodes > max_draw_nodes:
+        return 'raw'
+    if layout == 'auto':
+        return 'dot' if num_nodes <= DOT_MAX_NODES else 'sfdp'
+    return layout
+
+# 2. Merging the links that weren't visited into one node per domain.
+def leaf_domain(url):
+    # 'https://www.abcd.com/x' -> 'www.abcd.com'. Links that aren't http(s) are grouped by what they are: 'None', '#', 'mailto:', ...
+    if url is None:
+        return 'None'
+    if url.startswith('#'):
+        return '#'
+    scheme, authority, path, query, fragment = split_url(url)
+    if authority:
+        return authority.lower()
+    return (scheme or '') + ':'
+
+def aggregate_leaves(G, keep, url_of):
+    """
+    Function to merge every node that wasn't visited into one node per domain. A site visited keeps its own node.
+    The edge from a site visited to a domain has the total weight of its links to that domain.
+    Inputs: G (networkx.DiGraph): from crawler2graph.
+            keep (set): nodes that are never merged - the url ids of the sites visited.
+            url_of (function): url id -> url, eg crawler.url_index.url.
+    Output: H (networkx.DiGraph): the merged graph. Domain nodes are named 'domain: <domain>'.
+    """
+    H = nx.DiGraph()
+    H.graph.update(G.graph)
+    merged_into = {}                                                        # node -> its domain node
+    num_urls = {}                                                           # domain node -> number of urls merged into it
+    for node, data in G.nodes(data = True):
+        if node in keep:
+            H.add_node(node, **data)
+        else:
+            domain = leaf_domain(url_of(node))
+            merged = 'domain: ' + domain
+            merged_into[node] = merged
+            num_urls[merged] = num_urls.get(merged, 0) + 1
+    # 2.1. Add up the weights of the edges into each domain. Colour of the edge: the colour of the site visited it comes from.
+    weights = {}
+    colours = {}
+    sources = {}                                                            # domain node -> the sites visited that link to it
+    for u, v, data in G.edges(data = True):
+        target = merged_into.get(v, v)
+        weights[(u, target)] = weights.get((u, target), 0) + data.get('weight', 1)
+        colours[(u, target)] = data.get('color')
+        if target in num_urls:
+            sources.setdefault(target, set()).add(u)
+    # 2.2. Domain nodes: white if linked from more than one site visited, otherwise the colour of the one site - as in crawler2graph.
+    for merged, count in num_urls.items():
+        linked_from = sources.get(merged, ())
+        if len(linked_from) == 1:
+            fill = G.nodes[next(iter(linked_from))].get('fillcolor', 'white')
+        else:
+            fill = 'white'
+        domain = merged[len('domain: '):]
+        shape = 'triangle' if domain == 'None' else 'diamond' if domain == '#' else 'circle'
+        font = G.nodes[next(iter(linked_from))].get('fontcolor', 'black') if len(linked_from) == 1 else 'black'
+        H.add_node(merged, style = 'filled', fillcolor = fill, fontcolor = font, shape = shape,
+                   label = '%s (%d)' % (domain, count), tooltip = '%s: %d links' % (domain, count))
+    for (u, target), weight in weights.items():
+        H.add_edge(u, target, tooltip = weight, weight = weight, color = colours[(u, target)])
+    return H
+
+# 3. Colours of the sites visited.
+# The colours used to be spread evenly over the integers 0x000000 to 0x777777 - dividing by (number of sites - 1), which fails for a crawl
+# of one site, and past a few hundred sites neighbouring colours can't be told apart (and most are muddy greys/greens).
+# Instead, each domain gets a hue, stepping round the colour wheel by the golden ratio - however many domains there are, each new hue lands
+# in the biggest gap left by the ones before, so domains met one after another are always far apart. Sites of the same domain share its hue,
+# and differ in saturation and brightness. All of it is worked out at once, in arrays, before the graph is built.
+GOLDEN_RATIO_STEP = 0.6180339887498949                                      # (sqrt(5) - 1) / 2, as a fraction of the colour wheel
+
+def hsv_to_rgb(hue, saturation, value):
+    # Arrays of hue, saturation and value (each 0 to 1) -> array of (red, green, blue), each 0 to 1.
+    sector = np.floor(hue * 6).astype(np.int64) % 6
+    fraction = hue * 6 - np.floor(hue * 6)
+    p = value * (1 - saturation)
+    q = value * (1 - saturation * fraction)
+    t = value * (1 - saturation * (1 - fraction))
+    choices = [np.stack(channels, axis = 1) for channels in
+               ((value, t, p), (q, value, p), (p, value, t), (p, q, value), (t, p, value), (value, p, q))]
+    return np.choose(sector[:, None], choices)
+
+def domain_palette(domains):
+    """
+    Function to give a colour to each site visited, clustered by domain (see above). Never white - white is kept for nodes linked from
+    more than one site visited.
+    Input: domains (iterable of str): the domain of each site visited, in order - eg leaf_domain(url).
+    Outputs: fill (list of str): '#rrggbb' for each site.
+             text (list of str): 'white' or 'black' for each site - whichever can be read on its fill.
+    """
+    codes = {}
+    domain_codes = np.array([codes.setdefault(domain, len(codes)) for domain in domains], dtype = np.int64)
+    if len(domain_codes) == 0:
+        return [], []
+    # Position of each site among the sites of its domain (0 for the first, 1 for the second, ...).
+    order = np.argsort(domain_codes, kind = 'stable')
+    sorted_codes = domain_codes[order]
+    first_of_domain = np.searchsorted(sorted_codes, sorted_codes)
+    rank = np.empty_like(domain_codes)
+    rank[order] = np.arange(len(domain_codes)) - first_of_domain
+    hue = (domain_codes * GOLDEN_RATIO_STEP) % 1.0
+    saturation = 0.45 + 0.5 * ((rank % 4) / 3.0)                            # 4 saturations, and
+    value = 0.95 - 0.4 * (((rank // 4) % 3) / 2.0)                          # 3 brightnesses: 12 shades of each hue before they repeat
+    rgb = np.rint(hsv_to_rgb(hue, saturation, value) * 255).astype(np.int64)
+    fill = ['#%02x%02x%02x' % (red, green, blue) for red, green, blue in rgb.tolist()]
+    # Perceived brightness (ITU-R BT.601 weights). Dark fills get white text.
+    brightness = rgb @ np.array([0.299, 0.587, 0.114])
+    text = np.where(brightness < 128, 'white', 'black').tolist()
+    return fill, text
+
+# 4. A force-directed layout in NumPy (Fruchterman-Reingold).
+# Every node pushes every other away, and every edge pulls its two ends together. Worked out pair by pair, the pushing is O(nodes^2) per step.
+# Here, the nodes are put into a grid of cells, and each node is only pushed away from the centre of each cell (weighted by the number of
+# nodes in it) - O(nodes x cells). The pulling is one vectorised pass over the edges.
+def force_layout(G, iterations=50, grid=16, seed=0):
+    """
+    Function to place the nodes of a graph.
+    Inputs: G (networkx graph)
+            iterations (int): steps of the simulation. The nodes move less at each step.
+            grid (int): the cells are a grid x grid square. More cells - more accurate, but slower.
+            seed (int): for the starting positions, so the same graph is always drawn the same way.
+    Output: positions (dict): node -> (x, y), both between 0 and 1.
+    """
+    nodes = list(G)
+    num_nodes = len(nodes)
+    if num_nodes == 0:
+        return {}
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = np.array([(index[u], index[v]) for u, v in G.edges() if u != v], dtype = np.int64).reshape(-1, 2)
+    rng = np.random.default_rng(seed)
+    pos = rng.random((num_nodes, 2))
+    k = 1.0 / math.sqrt(num_nodes)                                          # The ideal distance between two nodes
+    temperature = 0.1                                                       # The furthest a node may move in one step
+    cooling = temperature / (iterations + 1)
+    num_cells = grid * grid
+    for step in range(iterations):
+        # 4.1. Pushing: the centre of (and number of nodes in) each cell that isn't empty.
+        cell = np.minimum((pos * grid).astype(np.int64), grid - 1)
+        cell_id = cell[:, 0] * grid + cell[:, 1]
+        mass = np.bincount(cell_id, minlength = num_cells).astype(float)
+        occupied = np.nonzero(mass)[0]
+        mass = mass[occupied]
+        centres = np.stack([np.bincount(cell_id, pos[:, 0], num_cells)[occupied],
+                            np.bincount(cell_id, pos[:, 1], num_cells)[occupied]], axis = 1) / mass[:, None]
+        square_centres = (centres ** 2).sum(axis = 1)
+        displacement = np.empty((num_nodes, 2))
+        # A few rows at a time, so memory stays bounded (rows x cells). Each row i sums k^2 * mass_c * (pos_i - centre_c) / distance^2 over the cells c -
+        # written as matrix products, so the only big array is one rows x cells matrix of weights.
+        chunk = max(1, 1000000 // len(occupied))
+        for start in range(0, num_nodes, chunk):
+            rows = pos[start:start + chunk]
+            weight = rows @ centres.T
+            weight *= -2
+            weight += (rows ** 2).sum(axis = 1)[:, None]
+            weight += square_centres[None, :]                               # = distance^2 from each node to each centre
+            np.maximum(weight, k * k, out = weight)                         # No closer than k - a node's own cell would push it without limit
+            np.divide(mass[None, :], weight, out = weight)
+            displacement[start:start + chunk] = k * k * (rows * weight.sum(axis = 1)[:, None] - weight @ centres)
+        # 4.2. Pulling, along each edge (distance^2 / k).
+        if len(edges):
+            delta = pos[edges[:, 1]] - pos[edges[:, 0]]
+            pull = delta * (np.sqrt((delta ** 2).sum(axis = 1)) / k)[:, None]
+            for axis in (0, 1):
+                displacement[:, axis] += np.bincount(edges[:, 0], pull[:, axis], num_nodes) - np.bincount(edges[:, 1], pull[:, axis], num_nodes)
+        # 4.3. Move each node, by no more than the temperature. Then scale everything back into the unit square.
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis = 1)), 1e-12)
+        pos += displacement * (np.minimum(length, temperature) / length)[:, None]
+        pos -= pos.min(axis = 0)
+        pos /= max(pos.max(), 1e-12)
+        temperature -= cooling
+    return {node: (float(pos[i, 0]), float(pos[i, 1])) for i, node in enumerate(nodes)}
+
+# 5. Writing a drawing to SVG - nodes with the same colours, shapes and tooltips as the Graphviz drawing.
+def write_svg(G, positions, path, max_labels=5000):
+    """
+    Function to draw a graph that has been laid out (eg by force_layout) to an SVG file. Hovering over a node shows its tooltip.
+    Inputs: G (networkx graph): with the node/edge attributes of crawler2graph.
+            positions (dict): node -> (x, y), between 0 and 1.
+            path (str): the SVG file.
+            max_labels (int): labels are only written on the nodes of graphs up to this size - on bigger ones, they can't be read anyway.
+    Output: None
+    """
+    num_nodes = G.number_of_nodes()
+    size = max(800, int(math.sqrt(num_nodes) * 30))
+    radius = 8 if num_nodes <= max_labels else 3
+    title_lines = G.graph.get('label', '').replace('\t', '    ').split('\n')
+    top = 20 * len(title_lines) + 30
+    margin = 20
+    place = lambda node: (margin + positions[node][0] * size, top + positions[node][1] * size)
+    with open(path, 'w', encoding = 'utf-8') as svg:
+        svg.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        svg.write('<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" font-family="sans-serif">\n' % (size + 2 * margin, size + top + margin))
+        for i, line in enumerate(title_lines):
+            svg.write('<text x="%d" y="%d" font-size="14" xml:space="preserve">%s</text>\n' % (margin, 20 * (i + 1), escape(line)))
+        # 5.1. Edges first, so that nodes are drawn over them.
+        svg.write('<g stroke-opacity="0.4">\n')
+        for u, v, data in G.edges(data = True):
+            x1, y1 = place(u)
+            x2, y2 = place(v)
+            svg.write('<line x1="%.1f" y1="%.1f" x2="%.1f" y2="%.1f" stroke=%s><title>%s</title></line>\n'
+                      % (x1, y1, x2, y2, quoteattr(str(data.get('color', 'black'))), escape(str(data.get('tooltip', '')))))
+        svg.write('</g>\n<g stroke="black" stroke-width="0.5">\n')
+        # 5.2. Nodes.
+        for node, data in G.nodes(data = True):
+            x, y = place(node)
+            fill = quoteattr(str(data.get('fillcolor', 'white')))
+            title = '<title>%s</title>' % escape(str(data.get('tooltip', node)))
+            shape = data.get('shape', 'circle')
+            if shape == 'box':
+                svg.write('<rect x="%.1f" y="%.1f" width="%d" height="%d" fill=%s>%s</rect>\n' % (x - radius, y - radius, 2 * radius, 2 * radius, fill, title))
+            elif shape in ('triangle', 'diamond'):
+                if shape == 'triangle':
+                    points = [(x, y - radius), (x + radius, y + radius), (x - radius, y + radius)]
+                else:
+                    points = [(x, y - radius), (x + radius, y), (x, y + radius), (x - radius, y)]
+                svg.write('<polygon points="%s" fill=%s>%s</polygon>\n' % (' '.join('%.1f,%.1f' % point for point in points), fill, title))
+            else:
+                svg.write('<circle cx="%.1f" cy="%.1f" r="%d" fill=%s>%s</circle>\n' % (x, y, radius, fill, title))
+            if num_nodes <= max_labels and 'label' in data:
+                svg.write('<text x="%.1f" y="%.1f" font-size="9" text-anchor="middle" stroke="none" fill=%s>%s</text>\n'
+                          % (x, y + 3, quoteattr(str(data.get('fontcolor', 'black'))), escape(str(data['label']))))
+        svg.write('</g>\n</svg>\n')
+
+# 6. The fallback for graphs too big to draw: a table of edges, one per line, that can be loaded by anything.
+def write_edge_table(G, path, url_of):
+    """
+    Function to write the edges of a graph to a tab-separated file: source url, target url, weight.
+    Inputs: G (networkx.DiGraph): from crawler2graph (or aggregate_leaves).
+            path (str)
+            url_of (function): url id -> url, eg crawler.url_index.url. Nodes that aren't url ids (merged domains) are written as they are.
+    Output: None
+    """
+    name = lambda node: str(url_of(node)) if isinstance(node, int) else node
+    with open(path, 'w', encoding = 'utf-8') as table:
+        table.write('source\ttarget\tweight\n')
+        for u, v, data in G.edges(data = True):
+            table.write('%s\t%s\t%s\n' % (name(u), name(v), data.get('weight', 1)))
+
+def raw_path(path):
+    # 'myGraph.svg' -> 'myGraph.tsv'
+    return os.path.splitext(path)[0] + '.tsv'
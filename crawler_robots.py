@@ -0,0 +1,215 @@
+# Helpers for the /robots.txt side of the crawler (used by crawler_f3.py and crawlerMainDraw.py).
+# The Crawler used to download and parse /robots.txt again for every single URL it took from sites_to_visit.
+# Most URLs in a crawl share a host with many others, so we keep one parsed copy of each /robots.txt per origin (scheme + host).
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# 1. How long may a /robots.txt response be kept for?
+# https://www.rfc-editor.org/rfc/rfc9309.html#section-2.4 : the standard HTTP Cache-Control header may be used,
+# but a cached copy should not be used for more than 24 hours.
+MAX_ROBOTS_TTL = 24 * 60 * 60
+
+def robots_ttl(headers, default_ttl=MAX_ROBOTS_TTL):
+    """
+    Function to get the lifetime of a /robots.txt response from its Cache-Control header.
+    Inputs: headers (dict-like): headers of the /robots.txt response. May be None.
+            default_ttl (int): seconds to keep the entry for if the server does not say.
+    Output: ttl (int): seconds the entry may be kept for. 0 means it should not be kept at all.
+    """
+    cache_control = ''
+    if headers is not None:
+        cache_control = headers.get('Cache-Control', '') or ''
+    ttl = default_ttl
+    for directive in cache_control.split(','):
+        directive = directive.strip().lower()
+        # The server does not want the file to be re-used.
+        if directive in ('no-store', 'no-cache'):
+            return 0
+        if directive.startswith('max-age='):
+            try:
+                ttl = int(directive.split('=', 1)[1].strip(' "'))
+            except ValueError:
+                pass                                                        # Badly formed max-age. Keep the default.
+    return max(0, min(ttl, MAX_ROBOTS_TTL))
+
+# 2. The allow/disallow rules of a robots file, compiled once per site.
+# https://developers.google.com/search/reference/robots_txt : a rule matches a path if the path starts with it. '*' matches any string and a
+# trailing '$' marks the end of the path. The most specific (longest) matching rule decides - and in case of a tie, the least restrictive (Allow) is used.
+# If no rule matches, everything not explicitly disallowed is considered fair game (http://www.robotstxt.org/robotstxt.html).
+class RobotsMatcher():
+    """
+    Allow/disallow rules of a /robots.txt 'UA: *' record, built once and then checked against many paths.
+    Rules without a '*' go into a character trie - walking the path through it finds every matching prefix in a single pass.
+    The (usually few) rules with a '*' are compiled RegExps, checked longest first so we can stop at the first match that beats the trie.
+    Inputs: allow_list (list): targets of the 'Allow' commands, eg ['/collect/ok']
+            disallow_list (list): targets of the 'Disallow' commands, eg ['/collect/', '/*.pdf$']
+    """
+    def __init__(self, allow_list, disallow_list):
+        self.trie = {}                                                      # {char: {char: ...}}. The None key holds the rule ending at that node.
+        self.exact = {}                                                     # Rules ending in '$' without a '*': {path: rule}
+        self.wildcards = []                                                 # Rules with a '*': [(length, allowed, compiled RegExp)]
+        for pattern in disallow_list:
+            self.add(pattern, False)
+        for pattern in allow_list:
+            self.add(pattern, True)
+        # Longest first. For rules of equal length, Allow comes first (True > False).
+        self.wildcards.sort(key = lambda rule: (rule[0], rule[1]), reverse = True)
+
+    def add(self, pattern, allowed):
+        """
+        Function to add one rule.
+        Inputs: pattern (str): the target of the command, eg '/collect/'.
+                allowed (Bool): True for 'Allow', False for 'Disallow'.
+        Output: None
+        """
+        pattern = pattern.strip(' ')
+        # 'Disallow: ' disallows nothing and 'Allow: ' allows nothing - neither is a rule.
+        if pattern == '':
+            return
+        # A rule is ranked by the length of its path as written in the robots file.
+        rule = (len(pattern), allowed)
+        # A trailing '*' has no effect whatsoever: '/collect*' is the same as '/collect'.
+        pattern = pattern.rstrip('*')
+
+        anchored = pattern.endswith('$')
+        if anchored:
+            pattern = pattern[:-1]
+
+        # We strip trailing slashes from every URL we store, so https://www.site.com/ex/dir/ becomes https://www.site.com/ex/dir.
+        # We can't tell if it was 'dir/' before - so 'Disallow: /ex/dir/' (or '/ex/dir/$') also disallows '/ex/dir' itself. More restrictive, given the ambiguity.
+        # This is not extended to 'allows'.
+        if (not allowed) and len(pattern) > 1 and pattern.endswith('/'):
+            self.add_compiled(pattern[:-1], True, rule)
+        self.add_compiled(pattern, anchored, rule)
+
+    def add_compiled(self, pattern, anchored, rule):
+        """
+        Function to store a rule in the trie, the exact-match dictionary or the wildcard list.
+        Inputs: pattern (str): path of the rule with any trailing '$' removed.
+                anchored (Bool): True if the path must end here.
+                rule (tuple): (length, allowed) - used to rank matching rules.
+        Output: None
+        """
+        if '*' in pattern:
+            # Protect every RegEx metacharacter in the path, then let '*' match any string.
+            regex = '^' + '.*'.join(re.escape(piece) for piece in pattern.split('*'))
+            if anchored:
+                regex = regex + '$'
+            self.wildcards.append((rule[0], rule[1], re.compile(regex)))
+        elif anchored:
+            self.exact[pattern] = max(rule, self.exact.get(pattern, rule))
+        else:
+            node = self.trie
+            for char in pattern:
+                node = node.setdefault(char, {})
+            node[None] = max(rule, node.get(None, rule))
+
+    def allowed(self, path):
+        """
+        Function to check a path against the rules.
+        Inputs: path (str): the extension of the target URL, eg '/themain/site'. '/' for the root.
+        Output: Bool, True if we may crawl the path. False if it is disallowed.
+        """
+        # (length, allowed) of the best matching rule so far. A rule at the root of the trie (eg, 'Disallow: *') matches every path.
+        node = self.trie
+        best = node.get(None)
+        # Every prefix of the path that is a rule, in one walk.
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                break
+            rule = node.get(None)
+            if rule is not None and (best is None or rule > best):
+                best = rule
+        rule = self.exact.get(path)
+        if rule is not None and (best is None or rule > best):
+            best = rule
+        # Wildcards are sorted longest first - once a rule can't beat 'best', none of the rest can either.
+        for length, allowed, regex in self.wildcards:
+            if best is not None and (length, allowed) <= best:
+                break
+            if regex.match(path):
+                best = (length, allowed)
+                break
+        if best is None:
+            return True
+        return best[1]
+
+# 3. Everything the Crawler needs to know about one origin's /robots.txt
+class RobotsEntry():
+    """
+    Parsed /robots.txt for one origin.
+    Fields: status (int): HTTP status code of the /robots.txt request.
+            matcher (RobotsMatcher): the allow/disallow rules from the 'UA: *' record.
+            crawl_delay (int or None): crawl-delay from the 'UA: *' record, if one was given.
+            comments_ok (bool): the answer given after reading the comments of the file. Only asked once per origin.
+            expires (float): time.monotonic() value after which the entry is stale.
+    """
+    def __init__(self, status, matcher=None, crawl_delay=None, comments_ok=True):
+        self.status = status
+        self.matcher = matcher if matcher is not None else RobotsMatcher([], [])
+        self.crawl_delay = crawl_delay
+        self.comments_ok = comments_ok
+        self.expires = 0.0
+
+# 4. Cache of RobotsEntry objects, keyed on origin (eg, 'https://www.abcd.com').
+# An OrderedDict keeps the entries in order of last use, so the least recently used origin is dropped when we are full.
+# The AsyncCrawler looks origins up from several worker threads at once, so every change to the OrderedDict is made under a lock.
+class RobotsCache():
+    """
+    Per-origin cache of parsed /robots.txt files with expiry and least-recently-used eviction.
+    Inputs: max_entries (int): number of origins to keep before the least recently used one is dropped.
+            default_ttl (int): seconds to keep an entry for if the response has no Cache-Control max-age.
+    """
+    def __init__(self, max_entries=1000, default_ttl=MAX_ROBOTS_TTL):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.hits = 0                                                       # Number of lookups answered from the cache
+        self.misses = 0                                                     # Number of lookups that needed a download
+        self.lock = threading.Lock()
+
+    def get(self, origin):
+        """
+        Function to look up an origin.
+        Inputs: origin (str): scheme + host, eg 'https://www.abcd.com'. No trailing '/'.
+        Output: RobotsEntry, or None if we have no fresh entry for this origin.
+        """
+        with self.lock:
+            entry = self.entries.get(origin)
+            if entry is None:
+                self.misses += 1
+                return None
+            # Stale entries are dropped. The caller will fetch the file again.
+            if entry.expires <= time.monotonic():
+                del self.entries[origin]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(origin)
+            self.hits += 1
+            return entry
+
+    def put(self, origin, entry, headers=None):
+        """
+        Function to store the parsed /robots.txt of an origin.
+        Inputs: origin (str): scheme + host.
+                entry (RobotsEntry): the parsed file.
+                headers (dict-like): headers of the /robots.txt response, for Cache-Control.
+        Output: None. Entries the server asked us not to keep are not stored.
+        """
+        ttl = robots_ttl(headers, self.default_ttl)
+        if ttl <= 0:
+            return
+        entry.expires = time.monotonic() + ttl
+        with self.lock:
+            self.entries[origin] = entry
+            self.entries.move_to_end(origin)
+            # Evict the least recently used origins.
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
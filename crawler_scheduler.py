@@ -0,0 +1,174 @@
+# Politeness for the crawler (used by crawler_f3.py and crawlerMainDraw.py).
+# The crawler used to sleep for the crawl-delay after every site it took from sites_to_visit - even when the next request was to a
+# completely different host, and even for sites it skipped without making a request at all.
+# Instead, we remember when each host was last sent a request, and only wait if the next request is to that same host.
+
+import threading
+import time
+from collections import deque
+
+# 1. Per-host crawl-delays and request times.
+class HostScheduler():
+    """
+    Keeps each host (root url, eg 'https://www.abcd.com') to its crawl-delay.
+    The crawl-delay of a host is the one from its /robots.txt file if it gave one, otherwise default_delay.
+    The delay counts from the end of one request to the start of the next request to the same host.
+    Safe to use from several threads: each caller is given its own slot, so two requests to one host are never sent together.
+    Inputs: default_delay (float): seconds to wait between requests to a host whose robots file gives no crawl-delay.
+    """
+    def __init__(self, default_delay=15):
+        self.default_delay = default_delay
+        self.delays = {}                                                    # root url -> crawl-delay from its robots file
+        self.next_due = {}                                                  # root url -> time.monotonic() value after which it may be sent a request
+        self.lock = threading.Lock()
+
+    def set_delay(self, root_url, delay):
+        """
+        Function to store the crawl-delay given by the robots file of a host.
+        Inputs: root_url (str): root of the host.
+                delay (float): seconds. None if the robots file gave none.
+        Output: None
+        """
+        if delay is None:
+            return
+        with self.lock:
+            self.delays[root_url] = delay
+
+    def delay(self, root_url):
+        """
+        Function to get the crawl-delay of a host.
+        Input: root_url (str): root of the host.
+        Output: delay (float): seconds to wait between requests to this host.
+        """
+        return self.delays.get(root_url, self.default_delay)
+
+    def wait_time(self, root_url):
+        """
+        Function to see how long it is until a host may be sent a request. Doesn't reserve anything.
+        Input: root_url (str): root of the host.
+        Output: seconds (float): 0 if the host is due now.
+        """
+        return max(0.0, self.next_due.get(root_url, 0.0) - time.monotonic())
+
+    def wait(self, root_url):
+        """
+        Function to block until a host is due, just before a request is sent to it.
+        Reserves the slot straight away - anyone else waiting for this host is queued behind us.
+        Input: root_url (str): root of the host.
+        Output: waited (float): seconds slept.
+        """
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_due.get(root_url, 0.0))
+            # Anyone else waiting for this host is queued at least a crawl-delay behind us. finished() moves this on once our request is done.
+            self.next_due[root_url] = start + self.delay(root_url)
+        if start > now:
+            time.sleep(start - now)
+        return start - now
+
+    def finished(self, root_url):
+        """
+        Function to call once a request to a host has finished. The crawl-delay counts from here.
+        Input: root_url (str): root of the host.
+        Output: None
+        """
+        with self.lock:
+            due = time.monotonic() + self.delay(root_url)
+            if due > self.next_due.get(root_url, 0.0):
+                self.next_due[root_url] = due
+
+# 2. Choosing which targets to attempt next, when several are attempted at once (AsyncCrawler and ThreadedCrawler).
+# Both engines take targets from sites_to_visit in order, keep at most one attempt in flight per host, and hold the rest back until their host is free.
+class HostDispatcher():
+    """
+    The scheduling decisions of a crawl with several attempts in flight. The engine starts the attempts and waits for them - this says which to start.
+    Only targets that make a request hold up their host. Targets on a held-up host wait, in order, until it is free.
+    Inputs: frontier (Frontier): sites_to_visit. Only read under lock.
+            lock (threading.Lock): the lock of the crawler.
+            root_of (function): url -> root url of its host (getRootUrl).
+            makes_request (function): (target, root_url) -> Bool, whether an attempt on the target sends a request.
+            visited (list): sites_visited - every attempt in flight may add one to it.
+            num_to_visit (int): stop once this many sites have been visited.
+            max_in_flight (int): number of attempts (each on a different host) at the same time.
+            scheduler (HostScheduler): if given, a host is also held up until its crawl-delay has passed. Otherwise, the attempt waits for that itself.
+    """
+    def __init__(self, frontier, lock, root_of, makes_request, visited, num_to_visit, max_in_flight, scheduler=None):
+        self.frontier = frontier
+        self.lock = lock
+        self.root_of = root_of
+        self.makes_request = makes_request
+        self.visited = visited
+        # The same safety limit as the serial crawl - never more than 1000 visits in one run (visited may already hold visits from a resumed checkpoint).
+        self.max_visits = min(num_to_visit, len(visited) + 1000)
+        self.max_in_flight = max_in_flight
+        self.scheduler = scheduler
+        self.in_flight = {}                                                 # attempt (task or future) -> root url of its host, or None if it sends no request
+        self.busy_hosts = set()                                             # root urls with a request in flight
+        self.waiting = {}                                                   # root url -> deque of targets waiting for that host
+        self.num_waiting = 0
+        # Don't take too much from sites_to_visit while waiting for hosts (eg, if most links are on one host).
+        self.max_waiting = 100 * max_in_flight
+
+    def can_start(self):
+        # Visits still in flight count towards the limit, so that we don't overshoot num_to_visit.
+        return len(self.in_flight) < self.max_in_flight and len(self.visited) + len(self.in_flight) < self.max_visits
+
+    def held(self, root_url):
+        # Whether the next request to a host has to wait: one is in flight, or (with a scheduler) its crawl-delay hasn't passed.
+        if root_url in self.busy_hosts:
+            return True
+        return self.scheduler is not None and self.scheduler.wait_time(root_url) > 0
+
+    def start(self, target, root_url, start_attempt, sends_request=True):
+        self.in_flight[start_attempt(target, root_url)] = root_url if sends_request else None
+        if sends_request:
+            self.busy_hosts.add(root_url)
+
+    def dispatch(self, start_attempt):
+        """
+        Function to start every target that can be started now: first those waiting for a host that is no longer held up,
+        then new ones, in the order they were added to sites_to_visit.
+        Input: start_attempt (function): (target, root_url) -> the attempt started (an asyncio task or a future).
+        Output: None
+        """
+        for root_url in list(self.waiting):
+            if not self.can_start():
+                return
+            if not self.held(root_url):
+                self.start(self.waiting[root_url].popleft(), root_url, start_attempt)
+                self.num_waiting -= 1
+                if not self.waiting[root_url]:
+                    del self.waiting[root_url]
+        while self.can_start() and self.num_waiting < self.max_waiting:
+            with self.lock:
+                if not self.frontier:
+                    return
+                target = self.frontier.popleft()
+            root_url = self.root_of(target)
+            # No-go sites and repeats send no request - so they never wait, unless targets before them on the same host are waiting.
+            sends_request = self.makes_request(target, root_url)
+            if root_url in self.waiting or (sends_request and self.held(root_url)):
+                self.waiting.setdefault(root_url, deque()).append(target)
+                self.num_waiting += 1
+            else:
+                self.start(target, root_url, start_attempt, sends_request)
+
+    def finished(self, attempts):
+        """
+        Function to call with the attempts that have finished. Their hosts are free for the next target.
+        Input: attempts (iterable): tasks or futures, done.
+        Output: None. Any error in an attempt is raised here, and stops the crawl - as it would in the serial crawl.
+        """
+        for attempt in attempts:
+            self.busy_hosts.discard(self.in_flight.pop(attempt))
+            attempt.result()
+
+    def next_due(self):
+        """
+        Function to see how long it is until the first host with targets waiting (and no request in flight) is due.
+        Output: seconds (float). None if there is no such host.
+        """
+        if self.scheduler is None:
+            return None
+        waits = [self.scheduler.wait_time(root_url) for root_url in self.waiting if root_url not in self.busy_hosts]
+        return max(min(waits), 0) if waits else None
@@ -0,0 +1,187 @@
+# A compact store of the urls the crawler has seen (optional - used by the Frontier in crawler_frontier.py).
+# A Python set of full url strings costs well over 100 bytes per url. Once tens of millions of links have been found, that is gigabytes.
+# Instead we keep:
+#   (1) a scalable Bloom filter in memory - a few bits per url. It can say 'definitely not seen' or 'maybe seen'.
+#   (2) a table of hashed urls on disk (sqlite3) - only asked when the Bloom filter says 'maybe', to confirm.
+# https://en.wikipedia.org/wiki/Bloom_filter
+# http://gsd.di.uminho.pt/members/cbm/ps/dbloom.pdf : 'Scalable Bloom Filters' (Almeida et al., 2007)
+
+import hashlib
+import math
+import sqlite3
+
+# 1.1. Hash a url to a 64-bit number. The same number is the key in the table on disk and the input to the Bloom filter.
+def url_hash(url):
+    """
+    Function to hash a url.
+    Input: url (str): may be None - links without an 'href' are kept too.
+    Output: h (int): between 0 and 2^64 - 1.
+    """
+    if url is None:
+        data = b'\x00'                                                      # Can't collide with a real url: no url is a single NUL byte.
+    else:
+        data = url.encode('utf-8', 'surrogatepass')
+    return int.from_bytes(hashlib.blake2b(data, digest_size = 8).digest(), 'little')
+
+# 1.2. A second, independent-looking 64-bit number from the first (the 'splitmix64' finaliser). Used for double hashing in the Bloom filter.
+MASK64 = (1 << 64) - 1
+
+def remix(h):
+    h = ((h ^ (h >> 30)) * 0xbf58476d1ce4e5b9) & MASK64
+    h = ((h ^ (h >> 27)) * 0x94d049bb133111eb) & MASK64
+    return h ^ (h >> 31)
+
+# 2. A fixed-size Bloom filter.
+class BloomFilter():
+    """
+    Bloom filter sized for a number of items at a given false-positive rate.
+    Inputs: capacity (int): number of items it is sized for.
+            error_rate (float): chance that an item that was never added is reported as 'maybe seen', once 'capacity' items are in.
+    """
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Standard sizing: m = -n ln(p) / (ln 2)^2 bits and k = (m / n) ln 2 hash functions.
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def positions(self, h):
+        # Double hashing (Kirsch & Mitzenmacher): position i = h1 + i * h2. Only one hash of the url is needed.
+        h1 = h
+        h2 = remix(h) | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, h):
+        for position in self.positions(h):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, h):
+        for position in self.positions(h):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+# 3. A Bloom filter that grows. When the newest filter is full, a bigger one (with a tighter error rate) is added,
+# so the overall false-positive rate stays below error_rate however many urls are added.
+class ScalableBloomFilter():
+    """
+    Bloom filter that grows as items are added, keeping the overall false-positive rate below error_rate.
+    Inputs: initial_capacity (int): number of items the first filter is sized for.
+            error_rate (float): overall false-positive rate.
+            growth (int): each new filter holds this many times more items than the last.
+            tightening (float): each new filter has this times the error rate of the last. The rates sum to at most error_rate.
+    """
+    def __init__(self, initial_capacity=1000000, error_rate=0.001, growth=2, tightening=0.5):
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters = [BloomFilter(initial_capacity, error_rate * (1 - tightening))]
+
+    def add(self, h):
+        newest = self.filters[-1]
+        if newest.count >= newest.capacity:
+            newest = BloomFilter(newest.capacity * self.growth, newest.error_rate * self.tightening)
+            self.filters.append(newest)
+        newest.add(h)
+
+    def __contains__(self, h):
+        # Newest first - it holds the most items.
+        for bloom in reversed(self.filters):
+            if h in bloom:
+                return True
+        return False
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    def clear(self):
+        # Back to a single empty filter, of the first size.
+        first = self.filters[0]
+        self.filters = [BloomFilter(first.capacity, first.error_rate)]
+
+    def nbytes(self):
+        # Memory taken by the bit arrays.
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+# 4. The seen-url store: a Bloom filter in front of a table of hashed urls on disk.
+class SeenUrlStore():
+    """
+    Set-like store of seen urls with bounded memory. Supports 'url in store' and store.add(url), so it can replace the set in a Frontier.
+    A url is only looked up on disk when the Bloom filter says it may have been seen. The table on disk holds 64-bit hashes of the urls,
+    so two different urls are only confused if their hashes collide. For n urls the chance of any collision is about n^2 / 2^65 -
+    roughly 1 in 370,000 for ten million urls.
+    Inputs: path (str): file for the sqlite3 table. ':memory:' keeps it in memory (for testing).
+            initial_capacity (int), error_rate (float): see ScalableBloomFilter.
+            commit_every (int): number of new urls between commits to disk.
+            keep_existing (Bool): if the file already holds urls from an earlier run, True keeps them as seen. False empties the table.
+            cache_mb (int): memory sqlite may use to cache pages of the table. Hashes arrive in random order, so a tiny cache means a read from disk on most inserts.
+    """
+    def __init__(self, path, initial_capacity=1000000, error_rate=0.001, commit_every=10000, keep_existing=True, cache_mb=32):
+        self.bloom = ScalableBloomFilter(initial_capacity, error_rate)
+        # check_same_thread = False: the AsyncCrawler adds urls from its worker threads (always under Crawler.lock).
+        self.db = sqlite3.connect(path, check_same_thread = False)
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.execute('PRAGMA synchronous = NORMAL')
+        self.db.execute('PRAGMA cache_size = %d' % (-1024 * cache_mb))     # Negative: in KiB rather than pages
+        self.db.execute('CREATE TABLE IF NOT EXISTS seen (h INTEGER PRIMARY KEY)')
+        if not keep_existing:
+            self.db.execute('DELETE FROM seen')
+            self.db.commit()
+        self.commit_every = commit_every
+        self.uncommitted = 0
+        self.count = 0
+        self.disk_lookups = 0                                               # Number of times the Bloom filter said 'maybe'
+        # A table left by an earlier run is loaded into the Bloom filter, so those urls count as seen.
+        for (h,) in self.db.execute('SELECT h FROM seen'):
+            self.bloom.add(h & MASK64)
+            self.count += 1
+
+    def key(self, h):
+        # sqlite INTEGERs are signed 64-bit.
+        return h - (1 << 64) if h >= (1 << 63) else h
+
+    def __contains__(self, url):
+        h = url_hash(url)
+        if h not in self.bloom:
+            return False                                                    # Definitely not seen. No need to go to disk.
+        self.disk_lookups += 1
+        row = self.db.execute('SELECT 1 FROM seen WHERE h = ?', (self.key(h),)).fetchone()
+        return row is not None
+
+    def add(self, url):
+        """
+        Function to add a url.
+        Input: url (str)
+        Output: added (Bool): False if it had been seen before.
+        """
+        h = url_hash(url)
+        cursor = self.db.execute('INSERT OR IGNORE INTO seen (h) VALUES (?)', (self.key(h),))
+        if cursor.rowcount == 0:
+            return False
+        self.bloom.add(h)
+        self.count += 1
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.commit()
+        return True
+
+    def clear(self):
+        # Forget every url, in memory and on disk.
+        self.db.execute('DELETE FROM seen')
+        self.commit()
+        self.bloom.clear()
+        self.count = 0
+
+    def commit(self):
+        self.db.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,177 @@
+# Where the time of a crawl goes (used by crawler_f3.py and crawlerMainDraw.py).
+# A crawl of a few hundred sites can take hours, and nothing said whether that was the crawl-delays, slow servers, parsing or waiting for
+# the user to answer a question. Each phase of an attempt is now timed (time.perf_counter - a monotonic clock) and added to a histogram:
+# one for the whole crawl, and one per host. A span costs two clock reads and a lock - nothing is printed or stored per request.
+#   wait     - sleeping until a host is due (its crawl-delay)            robots  - the request for a robots.txt file
+#   tos      - the requests for a homepage and its ToS page               ask     - waiting for the user to answer a question
+#   get      - the request for a site we attempt, until its headers      parse   - reading the rest of that page and finding its links
+#   resolve  - making those links absolute and canonical (crawler_urls.py)
+# PhaseTimer.report() gives a table at the end of a crawl. StatsPrinter prints a line every few seconds while it runs.
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+
+PHASES = ('wait', 'robots', 'tos', 'ask', 'get', 'parse', 'resolve')
+
+# Upper bounds (seconds) of the buckets of a histogram: 0.1 ms to 500 s, in steps of 1-2-5. Anything longer goes in one last bucket.
+BUCKET_BOUNDS = tuple(round(step * 10.0 ** exponent, 6) for exponent in range(-4, 3) for step in (1, 2, 5))
+
+# 1. A histogram of durations.
+class Histogram():
+    """
+    Counts of durations, in buckets (BUCKET_BOUNDS) - so it takes the same memory however many durations are added.
+    Also keeps their number, total and the longest. Not locked - PhaseTimer adds to it under its own lock.
+    """
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = array('q', [0] * (len(BUCKET_BOUNDS) + 1))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        """
+        Function to estimate a percentile. The durations in the bucket it falls in are taken to be spread evenly across the bucket
+        (as Prometheus' histogram_quantile does) - and never more than the longest duration.
+        Input: fraction (float): eg 0.99 for the 99th percentile.
+        Output: seconds (float). 0 if the histogram is empty.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if bucket == len(BUCKET_BOUNDS):
+                    return self.max
+                lower = BUCKET_BOUNDS[bucket - 1] if bucket > 0 else 0.0
+                return min(lower + (BUCKET_BOUNDS[bucket] - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+# 2. The timer. Crawler.timing is one of these.
+class PhaseTimer():
+    """
+    Histograms of the time spent in each phase (PHASES) - for the whole crawl, and for each host (root url).
+    Safe to use from several threads. With several sites attempted at once, the times of different threads are added together.
+    """
+    def __init__(self):
+        self.phases = {phase: Histogram() for phase in PHASES}
+        self.hosts = {}                                                     # root url -> {phase: Histogram}, only for the phases that host has been in
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    def add(self, phase, seconds, root_url=None):
+        """
+        Function to add the duration of one span.
+        Inputs: phase (str): from PHASES.
+                seconds (float)
+                root_url (str): the host it was spent on. None to only add it to the whole crawl.
+        Output: None
+        """
+        with self.lock:
+            self.phases[phase].add(seconds)
+            if root_url is not None:
+                host = self.hosts.get(root_url)
+                if host is None:
+                    host = self.hosts[root_url] = {}
+                histogram = host.get(phase)
+                if histogram is None:
+                    histogram = host[phase] = Histogram()
+                histogram.add(seconds)
+
+    @contextmanager
+    def span(self, phase, root_url=None):
+        # with timer.span('robots', root_url): ... - times the block, even if it raises.
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start, root_url)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    # 2.1. Summaries.
+    def stats_line(self, num_attempts=None, num_visited=None):
+        """
+        Function to sum up the crawl so far in one line: how long it has run, how far it has got, and the share of the time in each phase.
+        Inputs: num_attempts (int), num_visited (int): progress of the crawl, if known.
+        Output: line (str)
+        """
+        elapsed = self.elapsed()
+        with self.lock:
+            totals = [(phase, self.phases[phase].total) for phase in PHASES]
+        line = '[%.0f s]' % elapsed
+        if num_attempts is not None:
+            line += ' %d attempts' % num_attempts
+        if num_visited is not None:
+            line += ', %d visited (%.2f/s)' % (num_visited, num_visited / elapsed if elapsed > 0 else 0.0)
+        spent = sum(total for phase, total in totals)
+        if spent > 0:
+            line += ' | ' + ' '.join('%s %.0f%%' % (phase, 100 * total / spent) for phase, total in totals if total > 0)
+        return line
+
+    def report(self, top_hosts=10):
+        """
+        Function to make a table of the time spent in each phase, for the whole crawl and for the hosts that took the longest.
+        Input: top_hosts (int): number of hosts to list.
+        Output: report (str)
+        """
+        elapsed = self.elapsed()
+        with self.lock:
+            spent = sum(histogram.total for histogram in self.phases.values())
+            lines = ['Time in each phase, over %.1f s of crawling (%.1f s in all - threads that ran at the same time are added together):' % (elapsed, spent),
+                     '%-8s %9s %10s %7s %9s %9s %9s %9s' % ('phase', 'count', 'total s', 'share', 'mean ms', 'p50 ms', 'p99 ms', 'max ms')]
+            for phase in PHASES:
+                histogram = self.phases[phase]
+                lines.append('%-8s %9d %10.2f %6.1f%% %9.1f %9.1f %9.1f %9.1f'
+                             % (phase, histogram.count, histogram.total, 100 * histogram.total / spent if spent > 0 else 0.0, 1000 * histogram.mean(),
+                                1000 * histogram.percentile(0.5), 1000 * histogram.percentile(0.99), 1000 * histogram.max))
+            # Hosts by the total time spent on them.
+            host_totals = sorted(((sum(histogram.total for histogram in host.values()), root_url) for root_url, host in self.hosts.items()), reverse = True)
+            if host_totals:
+                lines.append('Hosts that took the longest (seconds in each phase):')
+                lines.append('%-40s %8s ' % ('host', 'total') + ' '.join('%8s' % phase for phase in PHASES))
+                for total, root_url in host_totals[:top_hosts]:
+                    host = self.hosts[root_url]
+                    lines.append('%-40s %8.2f ' % (root_url[:40], total) +
+                                 ' '.join('%8.2f' % (host[phase].total if phase in host else 0.0) for phase in PHASES))
+        return '\n'.join(lines)
+
+# 3. A line of stats every few seconds, from a thread of its own - whichever loop the crawl is in.
+class StatsPrinter(threading.Thread):
+    """
+    Thread that prints timer.stats_line() every 'interval' seconds until stop().
+    Inputs: timer (PhaseTimer)
+            interval (float): seconds between lines.
+            progress (function): called with no arguments, gives (number of attempts, number of sites visited) for the line. May be None.
+    """
+    def __init__(self, timer, interval, progress=None):
+        super().__init__(daemon = True)
+        self.timer = timer
+        self.interval = interval
+        self.progress = progress
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            print(self.timer.stats_line(*(self.progress() if self.progress is not None else ())))
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
@@ -0,0 +1,89 @@
+# Helpers for the Terms of Service side of the crawler (used by crawler_f3.py and crawlerMainDraw.py).
+# Crawler.ToS_check used to download and parse the homepage, download the ToS page and ask the user about it - for every single URL.
+# The answer can't change within a run, so we keep one verdict per origin (scheme + host). It can also be saved to a JSON file
+# and loaded by the next run, so a site is only ever asked about once.
+
+import json
+import os
+import threading
+
+# 1. The outcome of checking the Terms of Service of one origin.
+class ToSVerdict():
+    """
+    Result of Crawler.ToS_check for one origin.
+    Fields: verdict (str): 'Y' if the terms allow crawling, 'N' if not.
+            status (int): status code of the request for the homepage or ToS page. 0 if no ToS page was found.
+            tos_url (str or None): absolute url of the ToS page, if one was found.
+    """
+    def __init__(self, verdict, status, tos_url=None):
+        self.verdict = verdict
+        self.status = status
+        self.tos_url = tos_url
+
+    def to_dict(self):
+        return {'verdict': self.verdict, 'status': self.status, 'tos_url': self.tos_url}
+
+# 2. Verdicts of every origin checked so far, keyed on origin (eg, 'https://www.abcd.com'). Unlike robots files, they are kept for the whole run.
+class ToSCache():
+    """
+    Per-origin cache of ToS verdicts, optionally kept in a JSON file between runs.
+    Inputs: path (str): JSON file to load verdicts from (if it exists) and save them to. None keeps them for this run only.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.verdicts = {}
+        self.hits = 0                                                       # Number of lookups answered from the cache
+        self.misses = 0                                                     # Number of lookups that needed the ToS to be checked
+        self.lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def get(self, origin):
+        """
+        Function to look up an origin.
+        Inputs: origin (str): scheme + host, eg 'https://www.abcd.com'. No trailing '/'.
+        Output: ToSVerdict, or None if this origin hasn't been checked.
+        """
+        with self.lock:
+            verdict = self.verdicts.get(origin)
+            if verdict is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return verdict
+
+    def put(self, origin, verdict):
+        """
+        Function to store the verdict of an origin.
+        Inputs: origin (str): scheme + host.
+                verdict (ToSVerdict)
+        Output: None. Verdicts caused by a server error (5xx) are not stored - the site may be working next time.
+        """
+        if str(verdict.status).startswith('5'):
+            return
+        with self.lock:
+            self.verdicts[origin] = verdict
+
+    def load(self):
+        with open(self.path) as cache_file:
+            stored = json.load(cache_file)
+        with self.lock:
+            for origin, fields in stored.items():
+                self.verdicts[origin] = ToSVerdict(fields['verdict'], fields['status'], fields.get('tos_url'))
+
+    def save(self):
+        """
+        Function to write every verdict to the JSON file (if there is one). Written to a temporary file first, so a crash can't leave half a file.
+        Output: None
+        """
+        if self.path is None:
+            return
+        with self.lock:
+            stored = {origin: verdict.to_dict() for origin, verdict in self.verdicts.items()}
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as cache_file:
+            json.dump(stored, cache_file, indent = 1, sort_keys = True)
+        os.replace(temp_path, self.path)
+
+    def __len__(self):
+        return len(self.verdicts)
@@ -0,0 +1,442 @@
+# Resolving and normalising the urls of links (used by crawler_f3.py and crawlerMainDraw.py).
+# getAbsUrl used to build absolute urls by splitting strings by hand - for every link, it split the url of the page again.
+# It didn't handle '../', './', '?query' or '' links, and the same page could be stored under several urls ('HTTPS://WWW.Abcd.com:443/a/./b#top'
+# and 'https://www.abcd.com/a/b'), so it was visited more than once.
+# Instead, links are resolved against the url of their page as RFC 3986 (section 5) says, and then normalised (section 6) so each page has one url.
+# https://www.rfc-editor.org/rfc/rfc3986
+# Each url is also given a number, once (UrlIndex, section 5), so that records and graphs can keep small ints instead of copies of the url.
+
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# 1. Splitting a url into its parts, in a single match. This RegExp is given in RFC 3986, Appendix B.
+# Groups: 2 scheme, 4 authority, 5 path, 7 query, 9 fragment. A group is None if the part (with its ':', '//', '?' or '#') is missing.
+URL_PARTS = re.compile(r'^(([^:/?#]+):)?(//([^/?#]*))?([^?#]*)(\?([^#]*))?(#(.*))?')
+
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+PERCENT_ENCODED = re.compile(r'%[0-9A-Fa-f]{2}')
+UNRESERVED = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+
+def split_url(url):
+    """
+    Function to split a url into (scheme, authority, path, query, fragment).
+    Input: url (str)
+    Output: tuple. Missing parts are None - except the path, which is always a string (maybe '').
+    """
+    match = URL_PARTS.match(url)
+    return match.group(2), match.group(4), match.group(5), match.group(7), match.group(9)
+
+# 2. RFC 3986, section 5.2.4: remove '.' and '..' segments from a path. eg '/a/b/../c/./d' -> '/a/c/d'
+def remove_dot_segments(path):
+    # Most paths have none - don't split them.
+    if '/.' not in path and not path.startswith('.'):
+        return path
+    segments = path.split('/')
+    output = []
+    for segment in segments:
+        if segment == '.':
+            continue
+        if segment == '..':
+            # Never remove the '' that starts an absolute path ('/..' is '/').
+            if len(output) > 1 or (output and output[0] != ''):
+                output.pop()
+            continue
+        output.append(segment)
+    # 'a/b/..' is the directory 'a/' - keep the trailing '/'.
+    if segments[-1] in ('.', '..'):
+        output.append('')
+    return '/'.join(output)
+
+# 3. RFC 3986, section 6.2.2.2: '%7e' and '%7E' and '~' are the same character. Hex digits in upper case, and unreserved characters not encoded at all.
+def normalise_percent(match):
+    character = chr(int(match.group(0)[1:], 16))
+    if character in UNRESERVED:
+        return character
+    return match.group(0).upper()
+
+# 4. The canonicaliser.
+class UrlCanonicalizer():
+    """
+    Resolves links against the url of the page they were found on, and normalises the result:
+        - scheme and host in lower case, and the default port (':80' for http, ':443' for https) removed,
+        - '.' and '..' segments removed from the path, percent-encodings normalised,
+        - the fragment ('#...') removed - it is part of the same page,
+        - optionally, the parameters of the query sorted by name ('?b=2&a=1' -> '?a=1&b=2'),
+        - and, as everywhere else in the crawler, a trailing '/' removed.
+    Links that aren't http(s) ('mailto:...', 'javascript:...'), links that are just a fragment ('#top') and None are returned unchanged.
+    The parts of each page url are worked out once and kept, along with the links already resolved against it - so the links of a page are
+    each resolved in one pass, and links that appear on every page of a site (menus) are only resolved once per page.
+    Inputs: sort_query (Bool): True to sort the parameters of queries. Pages that differ only in parameter order are then the same page.
+            max_bases (int): number of page urls to keep the parts (and resolved links) of.
+    """
+    def __init__(self, sort_query=False, max_bases=256):
+        self.sort_query = sort_query
+        self.max_bases = max_bases
+        self.bases = OrderedDict()                                          # page url -> ((scheme, authority, path, query), {link: resolved link})
+        self.lock = threading.Lock()                                        # The AsyncCrawler resolves links from several threads.
+
+    def base(self, base_url):
+        # Parts of a page url, and the links resolved against it so far. Least recently used pages are dropped.
+        with self.lock:
+            entry = self.bases.get(base_url)
+            if entry is not None:
+                self.bases.move_to_end(base_url)
+                return entry
+        scheme, authority, path, query, fragment = split_url(base_url)
+        entry = ((scheme.lower() if scheme else scheme, authority, remove_dot_segments(path), query), {})
+        with self.lock:
+            self.bases[base_url] = entry
+            while len(self.bases) > self.max_bases:
+                self.bases.popitem(last = False)
+        return entry
+
+    def resolve(self, link, base_url):
+        """
+        Function to get the canonical absolute url of a link.
+        Inputs: link (str): the 'href' of the link, as written on the page. May be None.
+                base_url (str): the url of the page the link is on - the final one, after any redirects (response.url).
+                                A page that is a directory ends with '/', and its relative links are beneath it.
+        Output: url (str): canonical absolute url. Or the link unchanged - see above.
+        """
+        if link is None:
+            return None
+        parts, resolved = self.base(base_url)
+        url = resolved.get(link)
+        if url is None:
+            url = self.resolve_parts(link, parts)
+            resolved[link] = url
+        return url
+
+    def canonical(self, url):
+        """
+        Function to get the canonical form of an absolute url, eg the starting site typed in by the user.
+        Input: url (str)
+        Output: url (str)
+        """
+        if url is None:
+            return None
+        return self.resolve_parts(url, (None, None, '', None))
+
+    def resolve_parts(self, link, base_parts):
+        # Leading and trailing spaces/newlines are ignored by browsers.
+        stripped = link.strip(' \t\n\r\f')
+        if stripped.startswith('#'):
+            return link
+        scheme, authority, path, query, fragment = split_url(stripped)
+        base_scheme, base_authority, base_path, base_query = base_parts
+
+        # 4.1. RFC 3986, section 5.2.2: transform the link into an absolute url.
+        if scheme is not None:
+            scheme = scheme.lower()
+            path = remove_dot_segments(path)
+        else:
+            if authority is not None:
+                path = remove_dot_segments(path)
+            else:
+                if path == '':
+                    path = base_path
+                    if query is None:
+                        query = base_query
+                else:
+                    if not path.startswith('/'):
+                        # Section 5.2.3: merge with the 'directory' of the page url.
+                        if base_authority is not None and base_path == '':
+                            path = '/' + path
+                        else:
+                            path = base_path[:base_path.rfind('/') + 1] + path
+                    path = remove_dot_segments(path)
+                authority = base_authority
+            scheme = base_scheme
+
+        # Only http(s) urls are normalised - anything else is left for is_no_go to skip.
+        if scheme not in DEFAULT_PORTS or authority is None:
+            return link
+
+        # 4.2. Section 6: normalise.
+        authority = self.normalise_authority(scheme, authority)
+        if path == '':
+            path = '/'
+        if '%' in path:
+            path = PERCENT_ENCODED.sub(normalise_percent, path)
+        url = scheme + '://' + authority + path
+        if query is not None:
+            if '%' in query:
+                query = PERCENT_ENCODED.sub(normalise_percent, query)
+            if self.sort_query and '&' in query:
+                # sorted() is stable, so repeated parameters keep their order.
+                query = '&'.join(sorted(query.split('&'), key = lambda parameter: parameter.split('=', 1)[0]))
+            url = url + '?' + query
+        # As a rule, strip the trailing '/'
+        if url.endswith('/'):
+            url = url[:-1]
+        return url
+
+    def normalise_authority(self, scheme, authority):
+        # '[user@]host[:port]'. Only the host is case-insensitive.
+        userinfo, at, host_port = authority.rpartition('@')
+        # The ':' of an IPv6 address ('[::1]:8080') is not the start of the port.
+        colon = host_port.rfind(':')
+        if colon > host_port.rfind(']'):
+            host, port = host_port[:colon], host_port[colon + 1:]
+        else:
+            host, port = host_port, ''
+        host = host.lower()
+        if port != '' and port != DEFAULT_PORTS[scheme]:
+            host = host + ':' + port
+        return userinfo + at + host
+
+# 5. The url index. Every url the crawler meets is given a number, once - 0, 1, 2, ... in the order they are first seen.
+# The records of attempts (crawler_records.py), the checkpoint and crawler2networkx keep these numbers instead of the urls themselves: a record
+# of a page with 300 links holds 300 ints, and sets/dicts of urls hash small ints instead of long strings.
+# Each index is owned by what it numbers the urls of - a RecordLog has its own, in a file beside its records - so two crawls in one process
+# don't share ids. There are two kinds, with the same methods:
+#   UrlIndex      - in memory: every url ever met is held, once, in a dict and a list. This grows with the crawl, as a set of the urls
+#                   would - it is only used when sites_dict is a plain dictionary, which holds everything in memory anyway.
+#   DiskUrlIndex  - in an sqlite file: memory stays bounded (the most recently used urls, up to cache_size), and lookups of the rest go to disk.
+class UrlIndex():
+    """
+    Two-way map between urls and dense integer ids, in memory: index.id(url) gives the id of a url (adding it if it is new), index.url(url_id)
+    gives the url back. None (a link without an 'href') is given an id like any other url.
+    Memory grows with the number of urls - see DiskUrlIndex for an index with bounded memory.
+    """
+    def __init__(self):
+        self.ids = {}                                                       # url -> id
+        self.urls = []                                                      # id -> url
+        self.lock = threading.Lock()                                        # The AsyncCrawler adds urls from several threads.
+
+    def id(self, url):
+        """
+        Function to get the id of a url. A url not seen before is given the next id.
+        Input: url (str): may be None.
+        Output: url_id (int)
+        """
+        url_id = self.ids.get(url)
+        if url_id is None:
+            with self.lock:
+                url_id = self.ids.get(url)
+                if url_id is None:
+                    url_id = len(self.urls)
+                    self.urls.append(url)
+                    self.ids[url] = url_id
+        return url_id
+
+    def ids_of(self, urls):
+        return [self.id(url) for url in urls]
+
+    def url(self, url_id):
+        return self.urls[url_id]
+
+    def urls_of(self, url_ids):
+        urls = self.urls
+        return [urls[url_id] for url_id in url_ids]
+
+    def get(self, url):
+        # The id of a url, or None if it hasn't been seen - without adding it.
+        return self.ids.get(url)
+
+    def __contains__(self, url):
+        return url in self.ids
+
+    def __len__(self):
+        return len(self.urls)
+
+    def __iter__(self):
+        # The urls, in id order.
+        return iter(self.urls)
+
+    def flush(self, sync=False):
+        # Nothing to write - for the same methods as DiskUrlIndex.
+        pass
+
+    def close(self):
+        pass
+
+# 5.1. The url index on disk.
+class DiskUrlIndex():
+    """
+    The same map as UrlIndex, kept in an sqlite3 table (id, url) with an index on the url - so it can be read back by a later run (eg, resuming a crawl).
+    Only the cache_size most recently used urls (each way) are kept in memory. New urls are committed every commit_every urls and on flush(),
+    so adding a url is rarely slowed down by the disk.
+    Inputs: path (str): file for the table.
+            keep_existing (Bool): True to carry on with the urls already in the file. False to empty it.
+            cache_size (int): number of urls to keep in memory, for each direction.
+            commit_every (int): number of new urls between commits to disk.
+    """
+    def __init__(self, path, keep_existing=False, cache_size=100000, commit_every=10000):
+        self.path = path
+        self.cache_size = cache_size
+        self.commit_every = commit_every
+        self.uncommitted = 0
+        self.recent_ids = OrderedDict()                                     # url -> id, least recently used first
+        self.recent_urls = OrderedDict()                                    # id -> url, least recently used first
+        self.lock = threading.Lock()                                        # The AsyncCrawler adds urls from several threads.
+        self.db = self.connect()
+        self.db.execute('CREATE TABLE IF NOT EXISTS urls (id INTEGER PRIMARY KEY, url TEXT UNIQUE)')
+        if not keep_existing:
+            self.db.execute('DELETE FROM urls')
+        self.db.commit()
+        self.count = self.db.execute('SELECT COUNT(*) FROM urls').fetchone()[0]
+        self.closed = False
+
+    def connect(self):
+        # check_same_thread = False: urls are added from several threads (always under self.lock).
+        db = sqlite3.connect(self.path, check_same_thread = False)
+        db.execute('PRAGMA journal_mode = WAL')
+        db.execute('PRAGMA synchronous = NORMAL')
+        return db
+
+    def remember(self, url, url_id):
+        # Keep a url in both caches. Least recently used urls are dropped.
+        self.recent_ids[url] = url_id
+        self.recent_urls[url_id] = url
+        if len(self.recent_ids) > self.cache_size:
+            self.recent_ids.popitem(last = False)
+        if len(self.recent_urls) > self.cache_size:
+            self.recent_urls.popitem(last = False)
+
+    def lookup_locked(self, url):
+        # The id of a url, from the cache or the table. None if it isn't in the index.
+        url_id = self.recent_ids.get(url)
+        if url_id is not None:
+            self.recent_ids.move_to_end(url)
+            return url_id
+        if url is None:
+            row = self.db.execute('SELECT id FROM urls WHERE url IS NULL').fetchone()
+        else:
+            row = self.db.execute('SELECT id FROM urls WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        self.remember(url, row[0])
+        return row[0]
+
+    def id_locked(self, url):
+        url_id = self.lookup_locked(url)
+        if url_id is None:
+            if self.closed:
+                raise ValueError('The url index in %s is closed - %r can not be added' % (self.path, url))
+            url_id = self.count
+            self.db.execute('INSERT INTO urls (id, url) VALUES (?, ?)', (url_id, url))
+            self.count += 1
+            self.remember(url, url_id)
+            self.uncommitted += 1
+            if self.uncommitted >= self.commit_every:
+                self.commit_locked()
+        return url_id
+
+    def id(self, url):
+        """
+        Function to get the id of a url. A url not seen before is given the next id.
+        Input: url (str): may be None.
+        Output: url_id (int)
+        """
+        with self.lock:
+            return self.id_locked(url)
+
+    def ids_of(self, urls):
+        with self.lock:
+            return [self.id_locked(url) for url in urls]
+
+    def url_locked(self, url_id):
+        url = self.recent_urls.get(url_id, self)                            # self: a default that no url can be (None is a url)
+        if url is not self:
+            self.recent_urls.move_to_end(url_id)
+            return url
+        row = self.db.execute('SELECT url FROM urls WHERE id = ?', (url_id,)).fetchone()
+        if row is None:
+            raise IndexError('url id %r is not in the index' % (url_id,))
+        self.remember(row[0], url_id)
+        return row[0]
+
+    def url(self, url_id):
+        with self.lock:
+            return self.url_locked(url_id)
+
+    def urls_of(self, url_ids):
+        with self.lock:
+            return [self.url_locked(url_id) for url_id in url_ids]
+
+    def get(self, url):
+        # The id of a url, or None if it hasn't been seen - without adding it.
+        with self.lock:
+            return self.lookup_locked(url)
+
+    def __contains__(self, url):
+        return self.get(url) is not None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """
+        Generator that reads the urls back in id order, from their own connection - so the index can still be used while they are read.
+        Only urls committed when it starts are included (flush() first).
+        """
+        reader = sqlite3.connect(self.path)
+        try:
+            for (url,) in reader.execute('SELECT url FROM urls ORDER BY id'):
+                yield url
+        finally:
+            reader.close()
+
+    # 5.1.1. Writing to disk.
+    def commit_locked(self):
+        self.db.commit()
+        self.uncommitted = 0
+
+    def flush(self, sync=False):
+        """
+        Function to commit the urls added since the last flush.
+        Input: sync (Bool): True to also wait until the operating system has them on disk.
+        Output: None
+        """
+        with self.lock:
+            self.commit_locked()
+            if sync:
+                # The commit is in the write-ahead log. Copy it into the table file, syncing both.
+                self.db.execute('PRAGMA wal_checkpoint(FULL)')
+
+    def close(self):
+        # No more urls can be added. The urls already in the index can still be looked up.
+        with self.lock:
+            self.commit_locked()
+            self.closed = True
+
+# 6. A set of urls kept as their ids - the seen set of sites_to_visit and the set of sites visited. It holds small ints rather than the urls,
+# which the url index already has (on disk, for a RecordLog).
+class UrlIdSet():
+    """
+    Set of urls, kept as their ids in a url index. Supports 'url in s', s.add(url), s.clear() and len(s) - so it can be the seen set of a Frontier.
+    Input: index_of (function): gives the index to number the urls in (eg, Crawler.url_index). If that changes (sites_dict replaced by a RecordLog),
+                                the urls already in the set are numbered again in the new index.
+    """
+    def __init__(self, index_of):
+        self.index_of = index_of
+        self.index = None                                                   # The index the ids are in
+        self.ids = set()
+
+    def current(self):
+        index = self.index_of()
+        if index is not self.index:
+            if self.ids:
+                self.ids = set(index.ids_of(self.index.urls_of(self.ids)))
+            self.index = index
+        return index
+
+    def __contains__(self, url):
+        url_id = self.current().get(url)
+        return url_id is not None and url_id in self.ids
+
+    def add(self, url):
+        self.ids.add(self.current().id(url))
+
+    def clear(self):
+        self.ids.clear()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        # The urls, in no particular order.
+        return iter(self.current().urls_of(self.ids))
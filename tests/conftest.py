@@ -0,0 +1,7 @@
+# The tests import local_site (in this folder) and the crawler modules (in the folder above).
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
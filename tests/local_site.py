@@ -0,0 +1,81 @@
+# A small site served on this machine for the tests - each test says what every path sends back, and how slowly.
+# Like benchmarks/synthetic_web.py, but with the pages written out by hand.
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+ROBOTS_ALLOW = 'User-agent: *\nDisallow: /private/\n'
+
+class Page():
+    """
+    What the site sends back for one path.
+    Inputs: body (str)
+            status (int)
+            delay (float): seconds to wait before the headers.
+            body_delay (float): seconds to wait after the headers, before the body.
+    """
+    def __init__(self, body, status=200, delay=0.0, body_delay=0.0):
+        self.body = body
+        self.status = status
+        self.delay = delay
+        self.body_delay = body_delay
+
+class LocalHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        page = self.server.pages.get(self.path, Page('Not found', status = 404))
+        time.sleep(page.delay)
+        body = page.body.encode('utf-8')
+        self.send_response(page.status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8' if self.path.endswith('.txt') else 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.flush()
+        time.sleep(page.body_delay)
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class LocalServer(ThreadingHTTPServer):
+
+    def handle_error(self, request, client_address):
+        # The crawler gives up on a slow page and closes the connection - that is what the tests want.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class LocalSite():
+    """
+    A site served from a thread of this process, until close().
+    Input: pages (dict): {path: Page or str}. A str is a page with status 200.
+    self.origin is eg 'http://127.0.0.1:8123', and self.requests the paths asked for, in order.
+    """
+    def __init__(self, pages):
+        self.server = LocalServer(('127.0.0.1', 0), LocalHandler)
+        self.server.pages = {path: page if isinstance(page, Page) else Page(page) for path, page in pages.items()}
+        self.server.requests = []
+        self.server.daemon_threads = True
+        self.origin = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.requests = self.server.requests
+        threading.Thread(target = self.server.serve_forever, daemon = True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def quiet_crawler(crawler_class, start_site, num_to_visit, **kwargs):
+    # A crawler for the tests: no crawl-delay, every question answered 'Y', short timeouts.
+    from crawler_policy import CrawlPolicy
+    from crawler_scheduler import HostScheduler
+    crawler = crawler_class(start_site, num_to_visit, True, [], **kwargs)
+    crawler.scheduler = HostScheduler(default_delay = 0)
+    crawler.policy = CrawlPolicy(default = 'Y')
+    crawler.timeout = (1, 0.3)
+    return crawler
@@ -0,0 +1,80 @@
+# Checkpoints of a crawl (crawler_checkpoint.py) after a crash.
+
+import os
+import tempfile
+import unittest
+
+import crawler_checkpoint
+from crawler_checkpoint import CrawlCheckpoint, EVENTS_FILE, read_events, trim_partial_line
+from crawler_frontier import Frontier
+from crawler_seen import SeenUrlStore
+from crawlerMainDraw import Crawler
+
+class PartialLineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_event_after_crash(self):
+        checkpoint = CrawlCheckpoint(self.folder.name)
+        checkpoint.start('https://a.com', 10, True, [], 1)
+        checkpoint.attempt(1)
+        checkpoint.close()
+        # The process died half way through writing an event.
+        with open(os.path.join(self.folder.name, EVENTS_FILE), 'a', encoding = 'utf-8') as events_file:
+            events_file.write('{"e":"attempt","n":')
+        # The next run appends to the same file. Its first event must not be lost.
+        checkpoint = CrawlCheckpoint(self.folder.name)
+        checkpoint.attempt(2)
+        checkpoint.close()
+        self.assertEqual([event['e'] for event in read_events(self.folder.name)], ['start', 'attempt', 'attempt'])
+        self.assertEqual([event['n'] for event in read_events(self.folder.name) if event['e'] == 'attempt'], [1, 2])
+
+    def test_trim(self):
+        path = os.path.join(self.folder.name, 'lines')
+        for content, kept in ((b'', b''), (b'cut', b''), (b'a\n', b'a\n'), (b'a\nb\ncut', b'a\nb\n'), (b'a\n' + b'x' * 100, b'a\n')):
+            with open(path, 'wb') as lines:
+                lines.write(content)
+            trim_partial_line(path, chunk_size = 7)
+            with open(path, 'rb') as lines:
+                self.assertEqual(lines.read(), kept)
+
+class ResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def start(self, urls):
+        # A checkpoint of a crawl that had found 'urls', but died before its first attempt.
+        crawler = Crawler(urls[0], 10, True, [])
+        checkpoint = CrawlCheckpoint(self.folder.name)
+        checkpoint.attach(crawler)
+        checkpoint.start(urls[0], 10, True, [], 1)
+        checkpoint.enqueue(urls)
+        checkpoint.close()
+
+    def test_before_first_attempt(self):
+        self.start(['https://a.com'])
+        crawler = Crawler('https://a.com', 10, True, [])
+        crawler_checkpoint.restore(crawler, CrawlCheckpoint(self.folder.name))
+        self.assertEqual(list(crawler.sites_to_visit), ['https://a.com'])
+        self.assertEqual(crawler.counter_attempts, 0)
+        crawler.checkpoint.close()
+
+    def test_seen_store(self):
+        self.start(['https://a.com', 'https://a.com/b'])
+        crawler = Crawler('https://a.com', 10, True, [])
+        crawler.sites_to_visit = Frontier(['https://a.com'], seen = SeenUrlStore(':memory:', initial_capacity = 100))
+        crawler_checkpoint.restore(crawler, CrawlCheckpoint(self.folder.name))
+        self.assertEqual(list(crawler.sites_to_visit), ['https://a.com', 'https://a.com/b'])
+        self.assertFalse(crawler.sites_to_visit.append('https://a.com/b'))
+        crawler.checkpoint.close()
+
+if __name__ == '__main__':
+    unittest.main()
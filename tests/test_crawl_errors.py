@@ -0,0 +1,69 @@
+# A request that times out, or a connection that is reset, is stored as a failed attempt - the crawl goes on.
+
+import asyncio
+import contextlib
+import io
+import unittest
+
+from local_site import LocalSite, Page, ROBOTS_ALLOW, quiet_crawler
+from crawlerMainDraw import Crawler, AsyncCrawler, ThreadedCrawler
+
+HOMEPAGE = '<a href="/terms">Terms</a> <a href="/slow-headers">1</a> <a href="/slow-body">2</a> <a href="/fast">3</a>'
+
+class SlowPageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.site = LocalSite({'/robots.txt': ROBOTS_ALLOW,
+                               '/': HOMEPAGE,
+                               '/terms': 'Crawlers are welcome.',
+                               '/slow-headers': Page('<a href="/never">x</a>', delay = 1.5),
+                               '/slow-body': Page('<a href="/never">x</a>', body_delay = 1.5),
+                               '/fast': '<a href="/">home</a>'})
+
+    def tearDown(self):
+        self.site.close()
+
+    def crawl(self, crawler):
+        with contextlib.redirect_stdout(io.StringIO()):
+            if isinstance(crawler, AsyncCrawler):
+                asyncio.run(crawler.crawl_async())
+            else:
+                crawler.crawl()
+        return {record.url: record for record in crawler.sites_dict.values()}
+
+    def check(self, crawler):
+        origin = self.site.origin
+        records = self.crawl(crawler)
+        # Every link of the homepage was attempted, and the crawl finished.
+        self.assertEqual(set(crawler.sites_visited), {origin, origin + '/terms', origin + '/fast'})
+        for path in ('/slow-headers', '/slow-body'):
+            record = records[origin + path]
+            self.assertIsNone(record.status)
+            self.assertIsNone(record.links)
+            self.assertFalse(record.flags)
+        self.assertEqual(records[origin + '/fast'].status, 200)
+
+    def test_serial(self):
+        self.check(quiet_crawler(Crawler, self.site.origin, 10))
+
+    def test_async(self):
+        self.check(quiet_crawler(AsyncCrawler, self.site.origin, 10, max_in_flight = 4))
+
+    def test_threads(self):
+        self.check(quiet_crawler(ThreadedCrawler, self.site.origin, 10, fetch_workers = 4))
+
+class RefusedConnectionTest(unittest.TestCase):
+
+    def test_refused(self):
+        # Nothing listens on the port any more - robots.txt can't be requested.
+        site = LocalSite({})
+        origin = site.origin
+        site.close()
+        crawler = quiet_crawler(Crawler, origin + '/page', 10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            crawler.crawl()
+        self.assertEqual(crawler.counter_attempts, 1)
+        self.assertIsNone(crawler.sites_dict[1].status)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+# The links found by crawler_links.py are the same as those BeautifulSoup (with lxml) found, as the crawler used to.
+
+import unittest
+
+from bs4 import BeautifulSoup
+
+from crawler_links import LinkExtractor
+
+PAGES = [
+    '<a href="/s?q=1&sect=2">x</a>',
+    '<a href="/s?a&reg=1&not=2&para=3&times=4&copy=5">all of them</a>',
+    '<a href="/x?a=&copy">end</a> <a href="/x?a=&copy b">space</a> <a href="/x?a=&copy;b">semicolon</a>',
+    '<a href="/x?&amp;a=1&ampb">amp</a> <a href="/x?&lt=1">lt</a> <a href="/x?&copyx">copyx</a>',
+    '<a href="/x?&#38;1&#x26;2&#38a">numbers</a> <a href="&notin;&notit;">notin</a>',
+    "<a href='/single?a=1&amp;b=2'>single quotes</a> <a href=/bare?x=1&y=2>no quotes</a> <A HREF=\"/UPPER\">upper</A>",
+    '<a>no href</a> <a href>empty</a> <a href="/first" href="/second">twice</a> <a name="x" href="/late">late</a>',
+    '<title>Page <a href="/in-title">t</a></title><a href="/after-title">after</a>',
+    '<textarea><a href="/in-textarea"></textarea><a href="/after-textarea">',
+    '<script>var s = \'<a href="/in-script">\';</script><style>a{}</style><a href="/after-script">',
+    '<xmp><a href="/in-xmp"></xmp><iframe><a href="/in-iframe"></iframe><noembed><a href="/in-noembed"></noembed><a href="/after">',
+    '<noscript><a href="/in-noscript">ns</a></noscript>',
+    '<html><head><title>T</title></head><body><p>Text &amp; more</p><a href="https://www.abc.com/a b">space</a>'
+    '<a href="mailto:x@y.com">mail</a><a href="#top">top</a><a href="../up">up</a></body></html>',
+]
+
+def bs4_links(page):
+    return [link.get('href') for link in BeautifulSoup(page, 'lxml').find_all('a')]
+
+def extractor_links(page, chunk_size=None):
+    parser = LinkExtractor()
+    links = []
+    chunk_size = chunk_size or len(page)
+    for start in range(0, len(page), chunk_size):
+        parser.feed(page[start:start + chunk_size])
+        links.extend(parser.take_links())
+    parser.close()
+    return links + parser.take_links()
+
+class ParityTest(unittest.TestCase):
+
+    def test_same_as_bs4(self):
+        for page in PAGES:
+            self.assertEqual(extractor_links(page), bs4_links(page), page)
+
+    def test_in_pieces(self):
+        # The page arrives a few characters at a time.
+        for page in PAGES:
+            self.assertEqual(extractor_links(page, chunk_size = 3), bs4_links(page), page)
+
+if __name__ == '__main__':
+    unittest.main()
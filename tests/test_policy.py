@@ -0,0 +1,56 @@
+# Allow and deny lists of a CrawlPolicy (crawler_policy.py).
+
+import contextlib
+import io
+import unittest
+
+from local_site import LocalSite, ROBOTS_ALLOW, quiet_crawler
+from crawler_policy import CrawlPolicy, ROBOTS
+from crawlerMainDraw import Crawler
+
+class MatchSiteTest(unittest.TestCase):
+
+    def test_origin_is_not_a_prefix(self):
+        policy = CrawlPolicy(deny = ['https://www.abc.com'])
+        self.assertTrue(policy.denies('https://www.abc.com'))
+        self.assertTrue(policy.denies('HTTPS://WWW.ABC.COM:443'))
+        for origin in ('https://www.abc.co', 'https://www.abc.community', 'https://www.abc.com.evil.net', 'http://www.abc.com', 'https://www.abc.com:8443'):
+            self.assertFalse(policy.denies(origin), origin)
+
+    def test_origin_with_port(self):
+        policy = CrawlPolicy(allow = ['http://127.0.0.1:8080/'])
+        self.assertEqual(policy.decide(ROBOTS, 'http://127.0.0.1:8080', '')[0], 'Y')
+        self.assertEqual(policy.decide(ROBOTS, 'http://127.0.0.1:80', '')[0], None)
+
+    def test_domain(self):
+        policy = CrawlPolicy(deny = ['abc.com'])
+        for origin in ('https://abc.com', 'http://www.abc.com:8080', 'https://shop.ABC.com'):
+            self.assertTrue(policy.denies(origin), origin)
+        for origin in ('https://xabc.com', 'https://abc.co', 'https://abc.com.evil.net'):
+            self.assertFalse(policy.denies(origin), origin)
+
+class DeniedSiteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.denied = LocalSite({'/robots.txt': ROBOTS_ALLOW, '/': '<a href="/page">page</a>', '/page': 'Hello'})
+        self.start = LocalSite({'/robots.txt': ROBOTS_ALLOW,
+                                '/': '<a href="%s/page">there</a> <a href="/here">here</a>' % self.denied.origin,
+                                '/here': 'Hello'})
+
+    def tearDown(self):
+        self.start.close()
+        self.denied.close()
+
+    def test_no_request(self):
+        crawler = quiet_crawler(Crawler, self.start.origin, 10)
+        crawler.policy = CrawlPolicy(deny = [self.denied.origin], default = 'Y')
+        with contextlib.redirect_stdout(io.StringIO()):
+            crawler.crawl()
+        # Not even robots.txt or the homepage of the denied site was asked for.
+        self.assertEqual(self.denied.requests, [])
+        self.assertEqual(crawler.sites_visited, [self.start.origin, self.start.origin + '/here'])
+        records = {record.url: record for record in crawler.sites_dict.values()}
+        self.assertTrue(records[self.denied.origin + '/page']['nogo'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# The records of a crawl (crawler_records.py) and the url index each RecordLog keeps beside them (crawler_urls.py).
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from local_site import LocalSite
+from crawler_records import CrawlRecord, RecordLog
+from crawler_urls import DiskUrlIndex
+
+REPOSITORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+class UrlIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.folder.name, name)
+
+    def test_logs_have_their_own_index(self):
+        first = RecordLog(self.path('first.jsonl'))
+        second = RecordLog(self.path('second.jsonl'))
+        first[1] = CrawlRecord(first.index, 'https://a.com', links = ['https://a.com/x', 'https://b.com'], status = 200)
+        second[1] = CrawlRecord(second.index, 'https://b.com', links = ['https://b.com/y'], status = 200)
+        # Both start from id 0, and neither holds the urls of the other.
+        self.assertEqual((first[1].url_id, second[1].url_id), (0, 0))
+        self.assertEqual(len(first.index), 3)
+        self.assertEqual(len(second.index), 2)
+        self.assertNotIn('https://b.com/y', first.index)
+        self.assertEqual(second[1].links, ('https://b.com/y',))
+        first.close()
+        second.close()
+
+    def test_reopened(self):
+        log = RecordLog(self.path('records.jsonl'))
+        log[1] = CrawlRecord(log.index, 'https://a.com', links = ['https://a.com/x', None, 'https://a.com/x'], status = 200)
+        log[2] = CrawlRecord(log.index, None, nogo = True)
+        log.close()
+        # Records can still be read once the log is closed - but no new url can be added.
+        self.assertEqual(log[1].links, ('https://a.com/x', None, 'https://a.com/x'))
+        with self.assertRaises(ValueError):
+            log.index.id('https://new.com')
+
+        reopened = RecordLog(self.path('records.jsonl'), keep_existing = True)
+        self.assertEqual([record.to_dict() for record in reopened.values()], [log[1].to_dict(), log[2].to_dict()])
+        self.assertEqual(reopened.index.id('https://new.com'), 3)
+        reopened.close()
+
+    def test_bounded_cache(self):
+        # Only two urls are kept in memory each way - the rest are looked up on disk, with the same ids.
+        index = DiskUrlIndex(self.path('urls.sqlite'), cache_size = 2, commit_every = 3)
+        urls = ['https://a.com/%d' % number for number in range(20)]
+        self.assertEqual(index.ids_of(urls), list(range(20)))
+        self.assertEqual(index.ids_of(reversed(urls)), list(reversed(range(20))))
+        self.assertEqual(index.urls_of([5, 0, 19]), [urls[5], urls[0], urls[19]])
+        self.assertLessEqual(len(index.recent_ids), 2)
+        self.assertLessEqual(len(index.recent_urls), 2)
+        self.assertIsNone(index.get('https://b.com'))
+        index.flush()
+        self.assertEqual(list(index), urls)
+        index.close()
+
+class RecordsAfterRunTest(unittest.TestCase):
+
+    def setUp(self):
+        self.site = LocalSite({'/robots.txt': 'User-agent: *\nCrawl-delay: 0\n',
+                               '/': '<a href="/terms">Terms</a> <a href="/a">a</a> <a href="/b">b</a>',
+                               '/terms': 'Crawlers are welcome.',
+                               '/a': '<a href="/b">b</a>',
+                               '/b': '<a href="/a">a</a>'})
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.site.close()
+        self.folder.cleanup()
+
+    def test_plain_run(self):
+        # No --checkpoint: the records go to --records only.
+        policy = os.path.join(self.folder.name, 'policy.json')
+        with open(policy, 'w') as policy_file:
+            json.dump({'default': 'Y'}, policy_file)
+        records = os.path.join(self.folder.name, 'records.jsonl')
+        # The answers to the questions: start site, sites to avoid, sites to visit, http too, all links.
+        answers = '\n'.join([self.site.origin, '', '3', 'True', '1']) + '\n'
+        subprocess.run([sys.executable, os.path.join(REPOSITORY, 'crawler_f3.py'), '--policy', policy, '--records', records],
+                       input = answers, stdout = subprocess.DEVNULL, check = True, timeout = 60, universal_newlines = True, cwd = self.folder.name)
+
+        log = RecordLog(records, keep_existing = True)
+        try:
+            visited = [record.url for record in log.values() if record.status == 200]
+            self.assertEqual(len(visited), 3)
+            self.assertEqual(visited[0], self.site.origin)
+            home = log[1]
+            self.assertEqual(set(home.links), {self.site.origin + path for path in ('/terms', '/a', '/b')})
+        finally:
+            log.close()
+
+if __name__ == '__main__':
+    unittest.main()
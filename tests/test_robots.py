@@ -0,0 +1,53 @@
+# The allow/disallow rules of a robots file (RobotsMatcher, crawler_robots.py).
+
+import unittest
+
+from crawler_robots import RobotsMatcher
+
+class MatcherTest(unittest.TestCase):
+
+    def check(self, allow_list, disallow_list, expected):
+        matcher = RobotsMatcher(allow_list, disallow_list)
+        for path, allowed in expected.items():
+            self.assertEqual(matcher.allowed(path), allowed, path)
+
+    def test_prefix(self):
+        self.check([], ['/private'], {'/private': False, '/private/x': False, '/privateer': False, '/': True, '/public': True})
+
+    def test_no_rules(self):
+        self.check([], [''], {'/': True, '/x': True})
+
+    def test_wildcard(self):
+        self.check([], ['/*.pdf', '/a*/b'], {'/x.pdf': False, '/dir/x.pdf?v=1': False, '/x.html': True,
+                                             '/abc/b': False, '/a/b/c': False, '/b/a/b': True})
+        # A trailing '*' has no effect.
+        self.check([], ['/collect*'], {'/collect': False, '/collection': False, '/other': True})
+        self.check([], ['*'], {'/': False, '/x': False})
+
+    def test_end_anchor(self):
+        self.check([], ['/*.pdf$', '/exact$'], {'/x.pdf': False, '/x.pdf?v=1': True, '/x.pdfs': True,
+                                                '/exact': False, '/exact/more': True, '/exactly': True})
+
+    def test_longest_match(self):
+        self.check(['/folder/ok'], ['/folder'], {'/folder': False, '/folder/x': False, '/folder/ok': True, '/folder/ok/x': True})
+        self.check(['/folder'], ['/folder/secret'], {'/folder/x': True, '/folder/secret': False})
+        # A wildcard rule that is longer beats a plain one, and the other way round.
+        self.check(['/shop/*/view'], ['/shop/'], {'/shop/item/view': True, '/shop/item/edit': False})
+        self.check(['/*.html'], ['/archive/old/'], {'/archive/old/a.html': False, '/b.html': True})
+
+    def test_tie(self):
+        # Rules of the same length: the Allow wins.
+        self.check(['/page'], ['/page'], {'/page': True, '/page/x': True})
+        self.check(['/*.gif'], ['/a.gif'], {'/a.gif': True})
+        self.check(['/page$'], ['/page$'], {'/page': True})
+
+    def test_trailing_slash(self):
+        # The crawler strips the trailing '/' from every url, so 'Disallow: /dir/' also disallows '/dir'.
+        self.check([], ['/dir/'], {'/dir': False, '/dir/x': False, '/directory': True, '/': True})
+        self.check([], ['/dir/$'], {'/dir': False, '/dir/': False, '/dir/x': True})
+        self.check([], ['/'], {'/': False, '/x': False})
+        # Not for Allow.
+        self.check(['/dir/'], ['/'], {'/dir': False, '/dir/x': True})
+
+if __name__ == '__main__':
+    unittest.main()
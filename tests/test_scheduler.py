@@ -0,0 +1,64 @@
+# The scheduling decisions shared by the AsyncCrawler and the ThreadedCrawler (HostDispatcher, crawler_scheduler.py).
+
+import threading
+import unittest
+from concurrent.futures import Future
+
+from crawler_frontier import Frontier
+from crawler_scheduler import HostDispatcher, HostScheduler
+
+def root_of(url):
+    return url.split('/')[0]
+
+class DispatcherTest(unittest.TestCase):
+
+    def make(self, urls, visited, num_to_visit=100, max_in_flight=2, scheduler=None):
+        self.started = []
+        return HostDispatcher(Frontier(urls), threading.Lock(), root_of, lambda target, root_url: not target.endswith('skip'),
+                              visited, num_to_visit, max_in_flight, scheduler = scheduler)
+
+    def start(self, target, root_url):
+        future = Future()
+        future.target = target
+        self.started.append(target)
+        return future
+
+    def finish(self, dispatcher, target):
+        future = [attempt for attempt in dispatcher.in_flight if attempt.target == target][0]
+        future.set_result(True)
+        dispatcher.finished([future])
+
+    def test_one_request_per_host(self):
+        dispatcher = self.make(['a/1', 'a/2', 'a/skip', 'b/1', 'c/1'], [])
+        dispatcher.dispatch(self.start)
+        # a/2 waits for a/1. a/skip sends no request, but stays behind a/2 on its host.
+        self.assertEqual(self.started, ['a/1', 'b/1'])
+        self.finish(dispatcher, 'a/1')
+        dispatcher.dispatch(self.start)
+        self.assertEqual(self.started, ['a/1', 'b/1', 'a/2'])
+        self.finish(dispatcher, 'b/1')
+        dispatcher.dispatch(self.start)
+        self.assertEqual(self.started, ['a/1', 'b/1', 'a/2', 'c/1'])
+
+    def test_no_request_never_waits(self):
+        dispatcher = self.make(['a/1', 'b/skip', 'b/1'], [], max_in_flight = 3)
+        dispatcher.dispatch(self.start)
+        self.assertEqual(self.started, ['a/1', 'b/skip', 'b/1'])
+
+    def test_visit_limit(self):
+        # Attempts in flight count towards num_to_visit.
+        dispatcher = self.make(['a/1', 'b/1', 'c/1'], ['x'] * 9, num_to_visit = 10)
+        dispatcher.dispatch(self.start)
+        self.assertEqual(self.started, ['a/1'])
+        self.assertFalse(dispatcher.can_start())
+
+    def test_crawl_delay(self):
+        scheduler = HostScheduler(default_delay = 60)
+        scheduler.finished('a')
+        dispatcher = self.make(['a/1', 'b/1'], [], scheduler = scheduler)
+        dispatcher.dispatch(self.start)
+        self.assertEqual(self.started, ['b/1'])
+        self.assertGreater(dispatcher.next_due(), 50)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# Resolving and normalising the urls of links (UrlCanonicalizer, crawler_urls.py).
+
+import os
+import tempfile
+import unittest
+from urllib.parse import urljoin
+
+from crawler_urls import DiskUrlIndex, UrlCanonicalizer, UrlIdSet, UrlIndex
+
+# RFC 3986, section 5.4: links resolved against this page url.
+BASE = 'http://a/b/c/d;p?q'
+NORMAL_EXAMPLES = {
+    'g': 'http://a/b/c/g', './g': 'http://a/b/c/g', 'g/': 'http://a/b/c/g/', '/g': 'http://a/g', '//g': 'http://g',
+    '?y': 'http://a/b/c/d;p?y', 'g?y': 'http://a/b/c/g?y', 'g#s': 'http://a/b/c/g#s', 'g?y#s': 'http://a/b/c/g?y#s',
+    ';x': 'http://a/b/c/;x', 'g;x': 'http://a/b/c/g;x', 'g;x?y#s': 'http://a/b/c/g;x?y#s', '': 'http://a/b/c/d;p?q',
+    '.': 'http://a/b/c/', './': 'http://a/b/c/', '..': 'http://a/b/', '../': 'http://a/b/', '../g': 'http://a/b/g',
+    '../..': 'http://a/', '../../': 'http://a/', '../../g': 'http://a/g',
+}
+ABNORMAL_EXAMPLES = {
+    '../../../g': 'http://a/g', '../../../../g': 'http://a/g', '/./g': 'http://a/g', '/../g': 'http://a/g',
+    'g.': 'http://a/b/c/g.', '.g': 'http://a/b/c/.g', 'g..': 'http://a/b/c/g..', '..g': 'http://a/b/c/..g',
+    './../g': 'http://a/b/g', './g/.': 'http://a/b/c/g/', 'g/./h': 'http://a/b/c/g/h', 'g/../h': 'http://a/b/c/h',
+    'g;x=1/./y': 'http://a/b/c/g;x=1/y', 'g;x=1/../y': 'http://a/b/c/y',
+    'g?y/./x': 'http://a/b/c/g?y/./x', 'g?y/../x': 'http://a/b/c/g?y/../x', 'g#s/./x': 'http://a/b/c/g#s/./x', 'g#s/../x': 'http://a/b/c/g#s/../x',
+}
+
+def crawler_form(url):
+    # The crawler drops the fragment and, as a rule, the trailing '/'.
+    url = url.split('#')[0]
+    return url[:-1] if url.endswith('/') else url
+
+class ResolveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.urls = UrlCanonicalizer()
+
+    def test_rfc_examples(self):
+        for examples in (NORMAL_EXAMPLES, ABNORMAL_EXAMPLES):
+            for link, expected in examples.items():
+                self.assertEqual(self.urls.resolve(link, BASE), crawler_form(expected), link)
+
+    def test_left_unchanged(self):
+        # Other schemes, links to a fragment of the same page, 'http:g' (an RFC 'strict' parser keeps it) and None.
+        for link in ('g:h', 'mailto:x@y.com', 'javascript:void(0)', '#s', 'http:g', 'ftp://a/b'):
+            self.assertEqual(self.urls.resolve(link, BASE), link)
+        self.assertIsNone(self.urls.resolve(None, BASE))
+
+    def test_same_as_urljoin(self):
+        # For ordinary links, the crawler used urljoin.
+        base = 'https://www.abc.com/dir/page.html?x=1'
+        for link in ('other.html', '/top', 'sub/', '../up/a', '?q=2', 'https://www.xyz.com/a/b', '//cdn.abc.com/lib.js', 'a.html#part', './b'):
+            self.assertEqual(self.urls.resolve(link, base), crawler_form(urljoin(base, link)), link)
+
+    def test_whitespace(self):
+        self.assertEqual(self.urls.resolve('  /g\n', BASE), 'http://a/g')
+
+class NormaliseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.urls = UrlCanonicalizer()
+
+    def test_default_port(self):
+        self.assertEqual(self.urls.canonical('http://a.com:80/x'), 'http://a.com/x')
+        self.assertEqual(self.urls.canonical('https://a.com:443/x'), 'https://a.com/x')
+        self.assertEqual(self.urls.canonical('http://a.com:443/x'), 'http://a.com:443/x')
+        self.assertEqual(self.urls.canonical('https://a.com:8443/x'), 'https://a.com:8443/x')
+        self.assertEqual(self.urls.canonical('http://a.com:/x'), 'http://a.com/x')
+
+    def test_percent_encoding(self):
+        # Hex digits in upper case. Unreserved characters are not encoded at all.
+        self.assertEqual(self.urls.canonical('http://a.com/%7euser/%2fx%3Ay'), 'http://a.com/~user/%2Fx%3Ay')
+        self.assertEqual(self.urls.canonical('http://a.com/%41%2D%5F%2E?q=%7E%26'), 'http://a.com/A-_.?q=~%26')
+
+    def test_case(self):
+        # Scheme and host in lower case - not the path or query.
+        self.assertEqual(self.urls.canonical('HTTPS://WWW.Abcd.COM/Path?Q=A'), 'https://www.abcd.com/Path?Q=A')
+        self.assertEqual(self.urls.canonical('http://User@A.COM/'), 'http://User@a.com')
+
+    def test_ipv6(self):
+        self.assertEqual(self.urls.canonical('http://[2001:DB8::1]/x'), 'http://[2001:db8::1]/x')
+        self.assertEqual(self.urls.canonical('http://[::1]:80/x'), 'http://[::1]/x')
+        self.assertEqual(self.urls.canonical('http://[::1]:8080/x'), 'http://[::1]:8080/x')
+
+    def test_empty_path(self):
+        # '' becomes '/', which is then stripped like every trailing '/'.
+        self.assertEqual(self.urls.canonical('http://a.com'), 'http://a.com')
+        self.assertEqual(self.urls.canonical('http://a.com?q=1'), 'http://a.com/?q=1')
+
+    def test_fragment(self):
+        self.assertEqual(self.urls.canonical('http://a.com/x#top'), 'http://a.com/x')
+        self.assertEqual(self.urls.canonical('http://a.com/x?q=1#top'), 'http://a.com/x?q=1')
+        self.assertEqual(self.urls.canonical('HTTPS://WWW.Abcd.com:443/a/./b#top'), 'https://www.abcd.com/a/b')
+
+    def test_sort_query(self):
+        urls = UrlCanonicalizer(sort_query = True)
+        self.assertEqual(urls.canonical('http://a.com/x?b=2&a=1&b=1'), 'http://a.com/x?a=1&b=2&b=1')
+
+class UrlIdSetTest(unittest.TestCase):
+
+    def test_new_index(self):
+        # The set follows the index it is given - eg when sites_dict is replaced by a RecordLog, with its own index on disk.
+        indexes = [UrlIndex()]
+        seen = UrlIdSet(lambda: indexes[-1])
+        seen.add('https://a.com')
+        seen.add(None)
+        self.assertIn('https://a.com', seen)
+        self.assertNotIn('https://b.com', seen)
+        with tempfile.TemporaryDirectory() as folder:
+            indexes.append(DiskUrlIndex(os.path.join(folder, 'urls.sqlite')))
+            indexes[-1].id('https://other.com')
+            self.assertIn('https://a.com', seen)
+            self.assertIn(None, seen)
+            self.assertNotIn('https://other.com', seen)
+            seen.add('https://b.com')
+            self.assertEqual(len(seen), 3)
+            self.assertEqual(seen.ids, {1, 2, 3})
+            indexes[-1].close()
+            indexes[-1].db.close()
+
+if __name__ == '__main__':
+    unittest.main()